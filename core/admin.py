@@ -1,19 +1,56 @@
 from django.contrib import admin
+from django.db.models import Q
 from django.utils.safestring import mark_safe # Importação necessária para renderizar HTML no Admin
+from django.utils import timezone
 from .models import (
     CustomUser, PlatformSettings, Level, BankDetails, Deposit, 
     Withdrawal, Task, Roulette, RouletteSettings, UserLevel, PlatformBankDetails,
-    DailyRewardCode, UserRewardClaim # NOVOS MODELOS
+    DailyRewardCode, UserRewardClaim, # NOVOS MODELOS
+    Job, ReferralCommission, SettlementWatermark,
+    TaskArchive, RouletteArchive, UserMonthlyActivity, GrantCampaign, Announcement,
 )
+from .campaigns import pause_campaign, preview_count, start_campaign
+from .phones import SEARCH_LOOKUPS, search_strategy
 
 # ---
 
+class PhoneSearchMixin:
+    """
+    Pesquisa pelo telefone com índice em vez de icontains (ver core/phones.py):
+    número completo por igualdade, início do número por prefixo, '*dígitos'
+    por qualquer parte. Os campos de exact_search_fields comparam-se por
+    igualdade; os restantes search_fields só com texto que não é um número.
+    """
+    phone_search_field = 'user__phone_number'
+    exact_search_fields = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        query = Q()
+        for field in self.exact_search_fields:
+            query |= Q(**{field: search_term})
+        strategy, value = search_strategy(search_term)
+        if strategy:
+            query |= Q(**{f'{self.phone_search_field}{SEARCH_LOOKUPS[strategy]}': value})
+        else:
+            for field in self.get_search_fields(request):
+                if field != self.phone_search_field and field not in self.exact_search_fields:
+                    query |= Q(**{f'{field}__icontains': search_term})
+        if not query:
+            return queryset.none(), False
+        # Só relações para um objeto (user, level...): sem linhas duplicadas
+        return queryset.filter(query), False
+
 # Registrando os modelos com classes ModelAdmin personalizadas
 
 @admin.register(CustomUser)
-class CustomUserAdmin(admin.ModelAdmin):
+class CustomUserAdmin(PhoneSearchMixin, admin.ModelAdmin):
     list_display = ('phone_number', 'available_balance', 'subsidy_balance', 'is_staff', 'is_active', 'date_joined', 'roulette_spins')
     search_fields = ('phone_number', 'invite_code')
+    phone_search_field = 'phone_number'
+    exact_search_fields = ('invite_code',)
     list_filter = ('is_staff', 'is_active', 'level_active')
 
 @admin.register(PlatformSettings)
@@ -27,7 +64,7 @@ class LevelAdmin(admin.ModelAdmin):
     search_fields = ('name',)
 
 @admin.register(BankDetails)
-class BankDetailsAdmin(admin.ModelAdmin):
+class BankDetailsAdmin(PhoneSearchMixin, admin.ModelAdmin):
     list_display = ('user', 'bank_name', 'account_holder_name')
     search_fields = ('user__phone_number', 'bank_name', 'account_holder_name')
 
@@ -37,9 +74,9 @@ class PlatformBankDetailsAdmin(admin.ModelAdmin):
     search_fields = ('bank_name', 'account_holder_name')
 
 @admin.register(Deposit)
-class DepositAdmin(admin.ModelAdmin):
+class DepositAdmin(PhoneSearchMixin, admin.ModelAdmin):
     # Adicionamos 'proof_link' para mostrar o link na lista de depósitos
-    list_display = ('user', 'amount', 'is_approved', 'created_at', 'proof_link') 
+    list_display = ('user', 'amount', 'is_approved', 'created_at', 'proof_thumbnail_display', 'proof_link') 
     search_fields = ('user__phone_number',)
     list_filter = ('is_approved',)
     
@@ -51,45 +88,83 @@ class DepositAdmin(admin.ModelAdmin):
         if obj.proof_of_payment:
             # obj.proof_of_payment.url usa o Cloudinary Storage para obter o URL completo.
             return mark_safe(f'<a href="{obj.proof_of_payment.url}" target="_blank">Ver Comprovativo</a>')
+        if obj.proof_staged_name:
+            return "A enviar..."
         return "Nenhum"
         
     proof_link.short_description = 'Comprovativo'
 
+    # Miniatura gerada no envio (core/uploads.py), evita carregar o original na lista
+    def proof_thumbnail_display(self, obj):
+        if obj.proof_thumbnail:
+            return mark_safe(f'<img src="{obj.proof_thumbnail.url}" style="max-width:60px; height:auto;" loading="lazy" />')
+        return "-"
+
+    proof_thumbnail_display.short_description = 'Miniatura'
+
     # Método para exibir a imagem/link na PÁGINA DE EDIÇÃO/MODIFICAÇÃO
     def current_proof_display(self, obj):
         if obj.proof_of_payment:
-            # Exibe a imagem diretamente e fornece um link para visualização
+            # Exibe a miniatura (ou o original, para depósitos antigos) e um link para o tamanho real
+            preview = obj.proof_thumbnail or obj.proof_of_payment
             return mark_safe(f'''
                 <a href="{obj.proof_of_payment.url}" target="_blank">Ver Imagem em Tamanho Real</a><br/>
-                <img src="{obj.proof_of_payment.url}" style="max-width:300px; height:auto; margin-top: 10px;" />
+                <img src="{preview.url}" style="max-width:300px; height:auto; margin-top: 10px;" />
             ''')
+        if obj.proof_staged_name:
+            return "Comprovativo recebido, envio em curso."
         return "Nenhum Comprovativo Carregado"
     
     current_proof_display.short_description = 'Comprovativo Atual'
 
 @admin.register(Withdrawal)
-class WithdrawalAdmin(admin.ModelAdmin):
+class WithdrawalAdmin(PhoneSearchMixin, admin.ModelAdmin):
     list_display = ('user', 'amount', 'status', 'created_at')
     search_fields = ('user__phone_number',)
     list_filter = ('status',)
 
 @admin.register(Task)
-class TaskAdmin(admin.ModelAdmin):
+class TaskAdmin(PhoneSearchMixin, admin.ModelAdmin):
     list_display = ('user', 'earnings', 'completed_at')
     search_fields = ('user__phone_number',)
 
 @admin.register(Roulette)
-class RouletteAdmin(admin.ModelAdmin):
+class RouletteAdmin(PhoneSearchMixin, admin.ModelAdmin):
     list_display = ('user', 'prize', 'is_approved', 'spin_date')
     search_fields = ('user__phone_number',)
     list_filter = ('is_approved',)
 
+# --- ADMIN DO HISTÓRICO ARQUIVADO (apenas leitura, ver core/archive.py) ---
+
+class ReadOnlyAdmin(admin.ModelAdmin):
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(TaskArchive)
+class TaskArchiveAdmin(PhoneSearchMixin, ReadOnlyAdmin):
+    list_display = ('user', 'earnings', 'completed_at')
+    search_fields = ('user__phone_number',)
+
+@admin.register(RouletteArchive)
+class RouletteArchiveAdmin(PhoneSearchMixin, ReadOnlyAdmin):
+    list_display = ('user', 'prize', 'is_approved', 'spin_date')
+    search_fields = ('user__phone_number',)
+
+@admin.register(UserMonthlyActivity)
+class UserMonthlyActivityAdmin(PhoneSearchMixin, ReadOnlyAdmin):
+    list_display = ('user', 'month', 'task_count', 'task_earnings', 'roulette_count', 'roulette_prizes')
+    search_fields = ('user__phone_number',)
+    list_filter = ('month',)
+
 @admin.register(RouletteSettings)
 class RouletteSettingsAdmin(admin.ModelAdmin):
     list_display = ('id', 'prizes')
 
 @admin.register(UserLevel)
-class UserLevelAdmin(admin.ModelAdmin):
+class UserLevelAdmin(PhoneSearchMixin, admin.ModelAdmin):
     list_display = ('user', 'level', 'purchase_date', 'is_active')
     search_fields = ('user__phone_number', 'level__name')
     list_filter = ('is_active',)
@@ -105,9 +180,90 @@ class DailyRewardCodeAdmin(admin.ModelAdmin):
     readonly_fields = ('created_date',)
     
 @admin.register(UserRewardClaim)
-class UserRewardClaimAdmin(admin.ModelAdmin):
+class UserRewardClaimAdmin(PhoneSearchMixin, admin.ModelAdmin):
     list_display = ('user', 'reward_code', 'claim_date', 'claimed_at')
     search_fields = ('user__phone_number', 'reward_code__code')
     list_filter = ('claim_date', 'reward_code__code')
     readonly_fields = ('user', 'reward_code', 'claim_date', 'claimed_at') # Não deve ser editável após o resgate
-    
\ No newline at end of file
+    
+
+# --- ADMIN DAS COMISSÕES DE CONVITE ---
+
+@admin.register(ReferralCommission)
+class ReferralCommissionAdmin(PhoneSearchMixin, admin.ModelAdmin):
+    list_display = ('beneficiary', 'tier', 'amount', 'user_level', 'created_at')
+    search_fields = ('beneficiary__phone_number',)
+    phone_search_field = 'beneficiary__phone_number'
+    list_filter = ('tier',)
+    list_select_related = ('beneficiary', 'user_level__user', 'user_level__level')
+    readonly_fields = ('user_level', 'beneficiary', 'tier', 'amount', 'created_at') # Registo contabilístico
+
+@admin.register(SettlementWatermark)
+class SettlementWatermarkAdmin(admin.ModelAdmin):
+    list_display = ('name', 'last_id', 'updated_at')
+
+# --- ADMIN DOS AVISOS (ver core/announcements.py) ---
+
+@admin.register(Announcement)
+class AnnouncementAdmin(admin.ModelAdmin):
+    list_display = ('title', 'audience', 'is_active', 'created_at')
+    search_fields = ('title',)
+    list_filter = ('audience', 'is_active')
+    readonly_fields = ('created_at',)
+
+# --- ADMIN DAS CAMPANHAS DE OFERTAS (ver core/campaigns.py) ---
+
+@admin.register(GrantCampaign)
+class GrantCampaignAdmin(admin.ModelAdmin):
+    list_display = ('name', 'grant_type', 'amount', 'status', 'target_count', 'granted_count', 'progress_display', 'started_at', 'finished_at')
+    search_fields = ('name',)
+    list_filter = ('status', 'grant_type')
+    list_select_related = ('level',)
+    readonly_fields = ('status', 'target_count', 'granted_count', 'max_user_id', 'last_user_id', 'started_at', 'finished_at')
+    actions = ['preview_segments', 'start_campaigns', 'pause_campaigns']
+
+    def get_readonly_fields(self, request, obj=None):
+        # A oferta e o segmento ficam fixos depois do início
+        if obj and obj.status != GrantCampaign.STATUS_DRAFT:
+            return [field.name for field in GrantCampaign._meta.fields if field.name != 'id']
+        return self.readonly_fields
+
+    def progress_display(self, obj):
+        # Posição no intervalo de ids percorrido
+        if not obj.max_user_id:
+            return "-"
+        return f"{min(obj.last_user_id, obj.max_user_id) * 100 // obj.max_user_id}%"
+
+    progress_display.short_description = 'Progresso'
+
+    @admin.action(description='Pré-visualizar o tamanho dos segmentos')
+    def preview_segments(self, request, queryset):
+        for campaign in queryset:
+            self.message_user(request, f'{campaign.name}: {preview_count(campaign)} usuário(s) no segmento.')
+
+    @admin.action(description='Iniciar ou retomar as campanhas selecionadas')
+    def start_campaigns(self, request, queryset):
+        started = sum(start_campaign(campaign) for campaign in queryset)
+        self.message_user(request, f'{started} campanha(s) enfileirada(s).')
+
+    @admin.action(description='Pausar as campanhas selecionadas')
+    def pause_campaigns(self, request, queryset):
+        paused = sum(pause_campaign(campaign) for campaign in queryset)
+        self.message_user(request, f'{paused} campanha(s) pausada(s).')
+
+# --- ADMIN DA FILA DE TAREFAS ---
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'run_at', 'attempts', 'max_attempts', 'locked_by', 'finished_at')
+    search_fields = ('name', 'unique_key')
+    list_filter = ('status', 'name')
+    readonly_fields = ('locked_by', 'locked_at', 'last_error', 'created_at', 'finished_at')
+    actions = ['retry_jobs']
+
+    @admin.action(description='Repetir as tarefas selecionadas')
+    def retry_jobs(self, request, queryset):
+        updated = queryset.exclude(status=Job.STATUS_RUNNING).update(
+            status=Job.STATUS_PENDING, run_at=timezone.now(), attempts=0,
+        )
+        self.message_user(request, f'{updated} tarefa(s) enfileirada(s) novamente.')
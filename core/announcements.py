@@ -0,0 +1,47 @@
+"""
+Avisos do staff para todos os usuários ou para um público (Announcement),
+distribuídos na leitura.
+
+Publicar um aviso é um único INSERT, qualquer que seja o número de
+usuários. O estado de leitura de cada usuário é um só número na sua linha,
+CustomUser.last_read_announcement_id: os avisos ativos do seu público com
+id maior estão por ler. O contador do menu é uma comparação id > marca no
+índice (audience, id), limitada a UNREAD_BADGE_MAX + 1 linhas; abrir a
+página 'avisos' avança a marca.
+"""
+from .models import Announcement, CustomUser
+
+# Acima disto o contador mostra '9+'
+UNREAD_BADGE_MAX = 9
+ANNOUNCEMENTS_PAGE_SIZE = 20
+
+
+def audiences_for(user):
+    """Públicos a que o usuário pertence, a partir da linha já carregada."""
+    segment = Announcement.AUDIENCE_INVESTED if user.level_active else Announcement.AUDIENCE_NOT_INVESTED
+    return [Announcement.AUDIENCE_ALL, segment]
+
+
+def visible_announcements(user):
+    return Announcement.objects.filter(is_active=True, audience__in=audiences_for(user))
+
+
+def unread_count(user):
+    """Avisos por ler, no máximo UNREAD_BADGE_MAX + 1."""
+    unread = visible_announcements(user).filter(pk__gt=user.last_read_announcement_id).order_by()
+    return unread.values('pk')[:UNREAD_BADGE_MAX + 1].count()
+
+
+def badge_label(count):
+    return f'{UNREAD_BADGE_MAX}+' if count > UNREAD_BADGE_MAX else str(count)
+
+
+def mark_read(user, announcement_id):
+    """Avança a marca de leitura (nunca a recua, mesmo com pedidos simultâneos)."""
+    if announcement_id <= user.last_read_announcement_id:
+        return False
+    CustomUser.objects.filter(pk=user.pk, last_read_announcement_id__lt=announcement_id).update(
+        last_read_announcement_id=announcement_id,
+    )
+    user.last_read_announcement_id = announcement_id
+    return True
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # Liga os sinais que renovam os carimbos de versão das páginas
+        from . import signals  # noqa: F401
+        # Regista as tarefas da fila (core/jobs.py)
+        from . import tasks  # noqa: F401
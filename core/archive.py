@@ -0,0 +1,171 @@
+"""
+Arquivo do histórico de Task e Roulette.
+
+As linhas de meses anteriores a ARCHIVE_AFTER_MONTHS são movidas, em lotes,
+para TaskArchive/RouletteArchive (com o mesmo id) e somadas a
+UserMonthlyActivity, o total mensal por usuário. Assim as tabelas quentes
+(e os seus índices) só guardam os meses recentes.
+
+Os totais mostrados aos usuários somam as duas partes (ver
+user_task_earnings): a movimentação de cada lote é uma única transação, por
+isso uma linha está sempre ou na tabela quente ou no arquivo e no total
+mensal, nunca nos dois nem em nenhum.
+
+No PostgreSQL as tabelas de arquivo são particionadas por mês (migração
+0016); ensure_month_partitions cria as partições que faltam antes de mover.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import Roulette, RouletteArchive, SettlementWatermark, Task, TaskArchive, UserMonthlyActivity
+
+ARCHIVE_CHUNK_SIZE = 5000
+
+
+@dataclass(frozen=True)
+class ArchiveSpec:
+    model: type
+    archive_model: type
+    date_field: str
+    amount_field: str
+    extra_fields: tuple
+    # Campos de UserMonthlyActivity
+    count_field: str
+    total_field: str
+
+    @property
+    def watermark(self):
+        return f'archive:{self.model._meta.model_name}'
+
+
+ARCHIVES = {
+    'task': ArchiveSpec(Task, TaskArchive, 'completed_at', 'earnings', (), 'task_count', 'task_earnings'),
+    'roulette': ArchiveSpec(Roulette, RouletteArchive, 'spin_date', 'prize', ('is_approved',), 'roulette_count', 'roulette_prizes'),
+}
+
+
+def archive_after_months():
+    return getattr(settings, 'ARCHIVE_AFTER_MONTHS', 3)
+
+
+def month_start(value):
+    """Primeiro dia do mês (hora local) de uma data/hora."""
+    return timezone.localtime(value).date().replace(day=1)
+
+
+def add_months(day, months):
+    index = day.year * 12 + day.month - 1 + months
+    return day.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def month_bounds(month):
+    start = timezone.make_aware(datetime.combine(month, time.min))
+    return start, timezone.make_aware(datetime.combine(add_months(month, 1), time.min))
+
+
+def archive_cutoff(now=None, months=None):
+    """Início do mês mais antigo que fica nas tabelas quentes."""
+    months = archive_after_months() if months is None else months
+    return month_bounds(add_months(month_start(now or timezone.now()), -months))[0]
+
+
+def ensure_month_partitions(spec, months):
+    """Cria as partições mensais do arquivo (apenas PostgreSQL)."""
+    if connection.vendor != 'postgresql':
+        return
+    table = spec.archive_model._meta.db_table
+    with connection.cursor() as cursor:
+        for month in sorted(months):
+            start, end = month_bounds(month)
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {table}_{month:%Y_%m} PARTITION OF {table} '
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+
+
+def archive_chunk(spec, cutoff, chunk_size=ARCHIVE_CHUNK_SIZE):
+    """
+    Move um lote de linhas anteriores a 'cutoff' para o arquivo e atualiza os
+    totais mensais. Devolve o número de linhas movidas (0 quando terminou).
+    Cada lote é independente: interromper o processo não perde nem duplica nada.
+    """
+    fields = ['id', 'user_id', spec.amount_field, spec.date_field, *spec.extra_fields]
+    with transaction.atomic():
+        # A marca serve de trinco (um só processo a mover cada tabela) e de progresso
+        watermark, _ = SettlementWatermark.objects.select_for_update().get_or_create(name=spec.watermark)
+        rows = list(
+            spec.model.objects.filter(**{f'{spec.date_field}__lt': cutoff})
+            .order_by('id').values(*fields)[:chunk_size]
+        )
+        if not rows:
+            return 0
+
+        totals = defaultdict(lambda: [0, Decimal('0')])
+        for row in rows:
+            key = (row['user_id'], month_start(row[spec.date_field]))
+            totals[key][0] += 1
+            totals[key][1] += row[spec.amount_field]
+
+        ensure_month_partitions(spec, {month for _, month in totals})
+        spec.archive_model.objects.bulk_create(spec.archive_model(**row) for row in rows)
+        add_monthly_totals(spec, totals)
+        spec.model.objects.filter(id__in=[row['id'] for row in rows]).delete()
+
+        watermark.last_id = rows[-1]['id']
+        watermark.save(update_fields=['last_id', 'updated_at'])
+    return len(rows)
+
+
+def add_monthly_totals(spec, totals):
+    """Soma {(user_id, mês): [contagem, valor]} a UserMonthlyActivity."""
+    existing = set(
+        UserMonthlyActivity.objects.filter(
+            user_id__in={user_id for user_id, _ in totals},
+            month__in={month for _, month in totals},
+        ).values_list('user_id', 'month')
+    )
+    UserMonthlyActivity.objects.bulk_create(
+        UserMonthlyActivity(user_id=user_id, month=month, **{spec.count_field: count, spec.total_field: amount})
+        for (user_id, month), (count, amount) in totals.items() if (user_id, month) not in existing
+    )
+    for (user_id, month), (count, amount) in totals.items():
+        if (user_id, month) in existing:
+            UserMonthlyActivity.objects.filter(user_id=user_id, month=month).update(**{
+                spec.count_field: F(spec.count_field) + count,
+                spec.total_field: F(spec.total_field) + amount,
+            })
+
+
+def archive_history(name, now=None, months=None, chunk_size=ARCHIVE_CHUNK_SIZE, progress=None):
+    """Arquiva tudo o que é anterior ao corte. Devolve o total de linhas movidas."""
+    spec = ARCHIVES[name]
+    cutoff = archive_cutoff(now, months)
+    total = 0
+    while True:
+        moved = archive_chunk(spec, cutoff, chunk_size)
+        total += moved
+        if moved and progress:
+            progress(name, total)
+        if moved < chunk_size:
+            return total
+
+
+def pending_count(name, now=None, months=None):
+    spec = ARCHIVES[name]
+    return spec.model.objects.filter(**{f'{spec.date_field}__lt': archive_cutoff(now, months)}).count()
+
+
+# --- TOTAIS (TABELA QUENTE + ARQUIVO) ---
+
+def user_task_earnings(user):
+    """Ganhos de tarefas de sempre: linhas recentes + totais mensais arquivados."""
+    recent = Task.objects.filter(user=user).aggregate(total=Sum('earnings'))['total'] or 0
+    archived = UserMonthlyActivity.objects.filter(user=user).aggregate(total=Sum('task_earnings'))['total'] or 0
+    return recent + archived
@@ -0,0 +1,78 @@
+"""
+Créditos e débitos de saldo.
+
+Em vez de carregar e gravar cada usuário (user.save()), os créditos de um
+lote são aplicados com poucos UPDATE ... SET campo = campo + valor, que
+não perdem alterações feitas em paralelo por outras views. Os usuários com
+o mesmo valor a receber (o caso comum: poucos preços de nível) partilham
+a mesma instrução. As views usam credit_user e debit_user para o usuário
+do pedido: gravar o objeto carregado no início do pedido apagaria o que
+outros pedidos, a liquidação das comissões ou as campanhas escreveram
+entretanto.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, Value
+
+from .versions import bump_version, user_version_name
+
+# Usuários por instrução UPDATE
+CREDIT_CHUNK_SIZE = 1000
+
+BALANCE_FIELD = DecimalField(max_digits=10, decimal_places=2)
+
+# Bónus de boas-vindas do cadastro: saldo inicial de cada usuário (core/reconcile.py)
+WELCOME_BONUS = Decimal('750')
+
+
+def credit_balances(credits, fields=('subsidy_balance', 'available_balance')):
+    """
+    Soma credits[user_id] a cada um dos campos indicados do usuário.
+    Os carimbos de versão dos usuários são renovados depois do commit.
+    """
+    from .models import CustomUser
+
+    by_amount = defaultdict(list)
+    for user_id, amount in credits.items():
+        if amount:
+            by_amount[amount].append(user_id)
+
+    for amount, user_ids in by_amount.items():
+        increment = Value(amount, output_field=BALANCE_FIELD)
+        for start in range(0, len(user_ids), CREDIT_CHUNK_SIZE):
+            CustomUser.objects.filter(pk__in=user_ids[start:start + CREDIT_CHUNK_SIZE]).update(
+                **{field: F(field) + increment for field in fields}
+            )
+
+    user_ids = [user_id for user_ids in by_amount.values() for user_id in user_ids]
+    if user_ids:
+        transaction.on_commit(lambda: bump_version(*map(user_version_name, user_ids)))
+    return len(user_ids)
+
+
+def credit_user(user, amount, fields=('subsidy_balance', 'available_balance')):
+    """
+    Credita um só usuário (ver credit_balances) e acerta os campos do objeto
+    em memória, para a resposta da view.
+    """
+    credit_balances({user.pk: amount}, fields=fields)
+    for field in fields:
+        setattr(user, field, getattr(user, field) + amount)
+
+
+def debit_user(user, amount, field='available_balance'):
+    """
+    Desconta amount do saldo com um UPDATE condicional. Devolve False, sem
+    alterar nada, se o saldo na base de dados não chega, mesmo que o objeto
+    em memória (carregado no início do pedido) diga o contrário.
+    """
+    from .models import CustomUser
+
+    decrement = Value(amount, output_field=BALANCE_FIELD)
+    if not CustomUser.objects.filter(pk=user.pk, **{f'{field}__gte': amount}).update(**{field: F(field) - decrement}):
+        return False
+    setattr(user, field, getattr(user, field) - amount)
+    transaction.on_commit(lambda: bump_version(user_version_name(user.pk)))
+    return True
@@ -0,0 +1,276 @@
+"""
+Benchmark de ponta a ponta em processo: vários clientes concorrentes (um
+django.test.Client por thread, cada um com a sua ligação à base de dados)
+percorrem as views principais com sessões de usuários reais e medem
+latência (p50/p95/p99) e pedidos por segundo por endpoint.
+
+Usado por manage.py benchmark, normalmente sobre os dados de
+manage.py generate_data (core/synthetic.py).
+
+SQLiteContentionBenchmark (manage.py benchmark_sqlite) compara o SQLite
+por omissão com o modo afinado de settings.SQLITE_PRAGMAS sob escritas
+concorrentes: débito e percentagem de erros 'database is locked'.
+"""
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+BENCHMARK_HOST = 'benchmark.local'
+
+# nome -> (método, nome da rota, dados)
+ENDPOINTS = {
+    'menu': ('get', 'menu', None),
+    'tarefa': ('get', 'tarefa', None),
+    'nivel': ('get', 'nivel', None),
+    'equipa': ('get', 'equipa', None),
+    'renda': ('get', 'renda', None),
+    'saque': ('get', 'saque', None),
+    'perfil': ('get', 'perfil', None),
+    'deposito': ('get', 'deposito', None),
+    'premios_subsidios': ('get', 'premios_subsidios', None),
+    'roleta': ('get', 'roleta', None),
+    'process_task': ('post', 'process_task', {}),
+    'spin_roulette': ('post', 'spin_roulette', {}),
+}
+DEFAULT_ENDPOINTS = ['menu', 'tarefa', 'nivel', 'equipa', 'renda', 'saque', 'perfil', 'premios_subsidios']
+
+
+def percentile(values, fraction):
+    """Percentil pelo método do posto mais próximo (values ordenados)."""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+class EndpointResult:
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.statuses = {}
+        self.wall_time = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, latency, status):
+        with self.lock:
+            self.latencies.append(latency)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        return {
+            'endpoint': self.name,
+            'requests': count,
+            'errors': sum(total for status, total in self.statuses.items() if status >= 500),
+            'rps': count / self.wall_time if self.wall_time else 0.0,
+            'mean_ms': sum(latencies) / count * 1000 if count else 0.0,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'max_ms': latencies[-1] * 1000 if count else 0.0,
+            'statuses': dict(sorted(self.statuses.items())),
+        }
+
+
+class BenchmarkRunner:
+    """
+    Para cada endpoint, 'concurrency' clientes fazem 'requests' pedidos no
+    total, cada cliente com a sessão de um dos 'users' (rotativamente).
+    Com concurrency=1 os pedidos correm na thread atual.
+    """
+
+    def __init__(self, users, concurrency=8, requests=200, warmup=5):
+        if not users:
+            raise ValueError('O benchmark precisa de pelo menos um usuário.')
+        self.users = list(users)
+        self.concurrency = concurrency
+        self.requests = requests
+        self.warmup = warmup
+
+    def make_client(self, index):
+        # Erros da view (ex.: 'database is locked') contam como respostas 500
+        client = Client(SERVER_NAME=BENCHMARK_HOST, raise_request_exception=False)
+        client.force_login(self.users[index % len(self.users)])
+        return client
+
+    def run(self, endpoint_names):
+        clients = [self.make_client(index) for index in range(self.concurrency)]
+        return [self.run_endpoint(name, clients) for name in endpoint_names]
+
+    def run_endpoint(self, name, clients):
+        method, route, data = ENDPOINTS[name]
+        url = reverse(route)
+        result = EndpointResult(name)
+
+        # Aquecimento (templates, caches) fora da medição
+        for _ in range(self.warmup):
+            getattr(clients[0], method)(url, data)
+
+        def worker(client, count):
+            try:
+                for _ in range(count):
+                    started = time.perf_counter()
+                    response = getattr(client, method)(url, data)
+                    result.record(time.perf_counter() - started, response.status_code)
+            finally:
+                if threading.current_thread() is not threading.main_thread():
+                    connections.close_all()
+
+        # Reparte os pedidos pelos clientes
+        shares = [self.requests // len(clients) + (index < self.requests % len(clients)) for index in range(len(clients))]
+        started = time.perf_counter()
+        if len(clients) == 1:
+            worker(clients[0], shares[0])
+        else:
+            with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+                for future in [executor.submit(worker, client, share) for client, share in zip(clients, shares)]:
+                    future.result()
+        result.wall_time = time.perf_counter() - started
+        return result.summary()
+
+
+def format_report(summaries):
+    header = f"{'endpoint':<20}{'pedidos':>8}{'erros':>7}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+    lines = [header, '-' * len(header)]
+    for row in summaries:
+        lines.append(
+            f"{row['endpoint']:<20}{row['requests']:>8}{row['errors']:>7}{row['rps']:>9.1f}"
+            f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['max_ms']:>9.1f}"
+        )
+    return '\n'.join(lines)
+
+
+# --- CONTENÇÃO DE ESCRITA NO SQLITE ---
+
+def sqlite_modes():
+    """modo -> (PRAGMAs, instrução de início das transações)."""
+    return {
+        # Journal de rollback e BEGIN DEFERRED: o comportamento do Django sem OPTIONS
+        'default': ({}, 'BEGIN'),
+        'tuned': (getattr(settings, 'SQLITE_PRAGMAS', {}), 'BEGIN IMMEDIATE'),
+    }
+
+
+def is_lock_error(error):
+    return isinstance(error, sqlite3.OperationalError) and 'locked' in str(error)
+
+
+class SQLiteContentionBenchmark:
+    """
+    'threads' ligações ao mesmo ficheiro SQLite fazem 'operations' operações
+    cada: leituras de uma página (saldo e últimas tarefas) e, com
+    probabilidade write_ratio, a escrita de process_task (lê o saldo, insere
+    a tarefa e soma os ganhos, numa transação). Um erro de bloqueio não é
+    repetido, como numa view.
+    """
+
+    def __init__(self, path, threads=8, operations=200, write_ratio=0.3, users=100, seed=0):
+        self.path = path
+        self.threads = threads
+        self.operations = operations
+        self.write_ratio = write_ratio
+        self.users = users
+        self.seed = seed
+
+    def connect(self, mode):
+        pragmas, _ = sqlite_modes()[mode]
+        # O timeout de 5 s é o do Django por omissão (sqlite3.connect)
+        connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        for name, value in pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def create_database(self, mode):
+        # Ficheiro novo por modo: journal_mode=WAL fica gravado no ficheiro
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+        connection = self.connect(mode)
+        connection.executescript("""
+            CREATE TABLE user (id INTEGER PRIMARY KEY, balance NUMERIC NOT NULL);
+            CREATE TABLE task (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, earnings NUMERIC NOT NULL);
+            CREATE INDEX task_user_idx ON task (user_id);
+        """)
+        connection.execute('BEGIN')
+        connection.executemany('INSERT INTO user (id, balance) VALUES (?, 0)', [(i,) for i in range(1, self.users + 1)])
+        connection.execute('COMMIT')
+        connection.close()
+
+    def run(self, mode):
+        _, begin = sqlite_modes()[mode]
+        self.create_database(mode)
+        reads, writes = EndpointResult('read'), EndpointResult('write')
+
+        def worker(index):
+            rng = random.Random(self.seed * 1000 + index)
+            connection = self.connect(mode)
+            try:
+                for _ in range(self.operations):
+                    user_id = rng.randint(1, self.users)
+                    write = rng.random() < self.write_ratio
+                    started = time.perf_counter()
+                    try:
+                        if write:
+                            connection.execute(begin)
+                            connection.execute('SELECT balance FROM user WHERE id = ?', (user_id,)).fetchone()
+                            connection.execute('INSERT INTO task (user_id, earnings) VALUES (?, 200)', (user_id,))
+                            connection.execute('UPDATE user SET balance = balance + 200 WHERE id = ?', (user_id,))
+                            connection.execute('COMMIT')
+                        else:
+                            connection.execute('SELECT balance FROM user WHERE id = ?', (user_id,)).fetchone()
+                            connection.execute(
+                                'SELECT earnings FROM task WHERE user_id = ? ORDER BY id DESC LIMIT 10', (user_id,),
+                            ).fetchall()
+                        status = 200
+                    except sqlite3.OperationalError as error:
+                        if not is_lock_error(error):
+                            raise
+                        if connection.in_transaction:
+                            connection.execute('ROLLBACK')
+                        status = 503
+                    (writes if write else reads).record(time.perf_counter() - started, status)
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            for future in [executor.submit(worker, index) for index in range(self.threads)]:
+                future.result()
+        wall_time = time.perf_counter() - started
+
+        summary = {'mode': mode, 'threads': self.threads, 'wall_s': wall_time}
+        for kind, result in (('read', reads), ('write', writes)):
+            total = len(result.latencies)
+            errors = result.statuses.get(503, 0)
+            latencies = sorted(result.latencies)
+            summary[kind] = {
+                'operations': total,
+                'lock_errors': errors,
+                'error_rate': errors / total if total else 0.0,
+                'ok_per_s': (total - errors) / wall_time if wall_time else 0.0,
+                'p50_ms': percentile(latencies, 0.50) * 1000,
+                'p99_ms': percentile(latencies, 0.99) * 1000,
+            }
+        return summary
+
+
+def format_sqlite_report(summaries):
+    header = f"{'modo':<10}{'tipo':<7}{'ops':>7}{'bloqueios':>11}{'% erro':>8}{'ok/s':>9}{'p50 ms':>9}{'p99 ms':>9}"
+    lines = [header, '-' * len(header)]
+    for summary in summaries:
+        for kind in ('read', 'write'):
+            row = summary[kind]
+            lines.append(
+                f"{summary['mode']:<10}{kind:<7}{row['operations']:>7}{row['lock_errors']:>11}"
+                f"{row['error_rate'] * 100:>7.1f}%{row['ok_per_s']:>9.1f}{row['p50_ms']:>9.1f}{row['p99_ms']:>9.1f}"
+            )
+    return '\n'.join(lines)
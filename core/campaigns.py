@@ -0,0 +1,140 @@
+"""
+Campanhas de ofertas em massa: giros da roleta ou bónus no saldo
+disponível para um segmento de usuários (GrantCampaign).
+
+- segment_users() devolve o segmento como queryset: nível atual, data de
+  cadastro (índice em date_joined), número de convidados e total de
+  depósitos aprovados. O número de convidados vem do ranking 'team_size'
+  de sempre (core/leaderboards.py, índice por pontuação), sem contar os
+  convidados de cada usuário. preview_count() conta o segmento sem
+  carregar usuários.
+- start_campaign() fixa o maior id de usuário abrangido (os cadastros
+  posteriores ficam de fora) e enfileira run_grant_campaign.
+- Cada lote de GRANT_CHUNK_SIZE usuários, por ordem de id, corre numa
+  transação com a campanha bloqueada: regista os CampaignGrant, aplica um
+  UPDATE ... SET campo = campo + n aos usuários do lote e avança
+  last_user_id. Uma execução interrompida (worker terminado, pausa no
+  admin) continua no lote seguinte ao último confirmado, sem repetir ofertas.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Exists, F, Max, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from .balances import credit_balances
+from .jobs import enqueue, task
+from .leaderboards import ALL_TIME
+from .models import CampaignGrant, CustomUser, Deposit, GrantCampaign, LeaderboardScore
+from .versions import bump_version, user_version_name
+
+# Usuários por lote (e por transação)
+GRANT_CHUNK_SIZE = 1000
+
+
+def _local_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def segment_users(campaign):
+    """Usuários (exceto staff e contas inativas) que cumprem os critérios preenchidos da campanha."""
+    users = CustomUser.objects.filter(is_staff=False, is_active=True)
+    if campaign.level_id:
+        users = users.filter(current_level_id=campaign.level_id)
+    if campaign.joined_from:
+        users = users.filter(date_joined__gte=_local_start(campaign.joined_from))
+    if campaign.joined_until:
+        users = users.filter(date_joined__lt=_local_start(campaign.joined_until + timedelta(days=1)))
+    if campaign.min_team_size:
+        users = users.filter(pk__in=LeaderboardScore.objects.filter(
+            board=LeaderboardScore.BOARD_TEAM_SIZE, period=ALL_TIME, score__gte=campaign.min_team_size,
+        ).values('user'))
+    if campaign.min_deposit_total or campaign.deposits_from:
+        deposits = Deposit.objects.filter(user=OuterRef('pk'), is_approved=True)
+        if campaign.deposits_from:
+            deposits = deposits.filter(created_at__gte=_local_start(campaign.deposits_from))
+        if campaign.min_deposit_total:
+            totals = deposits.order_by().values('user').annotate(total=Sum('amount')).values('total')
+            users = users.annotate(deposit_total=Subquery(totals)).filter(deposit_total__gte=campaign.min_deposit_total)
+        else:
+            users = users.filter(Exists(deposits))
+    return users
+
+
+def preview_count(campaign):
+    """Tamanho do segmento; numa campanha já iniciada, só até ao último usuário abrangido."""
+    users = segment_users(campaign)
+    if campaign.max_user_id is not None:
+        users = users.filter(pk__lte=campaign.max_user_id)
+    return users.count()
+
+
+def start_campaign(campaign):
+    """
+    Inicia (ou retoma, se estiver pausada) a campanha e enfileira a
+    execução. Devolve False se já estiver em execução ou concluída.
+    """
+    with transaction.atomic():
+        campaign = GrantCampaign.objects.select_for_update().get(pk=campaign.pk)
+        if campaign.status in (GrantCampaign.STATUS_RUNNING, GrantCampaign.STATUS_DONE):
+            return False
+        if campaign.max_user_id is None:
+            campaign.max_user_id = CustomUser.objects.aggregate(last=Max('pk'))['last'] or 0
+            campaign.target_count = preview_count(campaign)
+            campaign.started_at = timezone.now()
+        campaign.status = GrantCampaign.STATUS_RUNNING
+        campaign.save(update_fields=['status', 'max_user_id', 'target_count', 'started_at'])
+        enqueue(run_grant_campaign, campaign.pk)
+    return True
+
+
+def pause_campaign(campaign):
+    """O lote em curso termina; os seguintes esperam por start_campaign()."""
+    return GrantCampaign.objects.filter(pk=campaign.pk, status=GrantCampaign.STATUS_RUNNING).update(
+        status=GrantCampaign.STATUS_PAUSED,
+    )
+
+
+def grant_next_chunk(campaign_id, chunk_size=GRANT_CHUNK_SIZE):
+    """
+    Aplica a oferta ao lote seguinte. Devolve o número de usuários
+    contemplados, ou 0 quando a campanha terminou ou não está em execução.
+    """
+    with transaction.atomic():
+        campaign = GrantCampaign.objects.select_for_update().get(pk=campaign_id)
+        if campaign.status != GrantCampaign.STATUS_RUNNING:
+            return 0
+        user_ids = list(
+            segment_users(campaign)
+            .filter(pk__gt=campaign.last_user_id, pk__lte=campaign.max_user_id)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:chunk_size]
+        )
+        if not user_ids:
+            campaign.status = GrantCampaign.STATUS_DONE
+            campaign.finished_at = timezone.now()
+            campaign.save(update_fields=['status', 'finished_at'])
+            return 0
+
+        CampaignGrant.objects.bulk_create(
+            [CampaignGrant(campaign=campaign, user_id=user_id) for user_id in user_ids],
+        )
+        if campaign.grant_type == GrantCampaign.GRANT_BONUS:
+            credit_balances(dict.fromkeys(user_ids, campaign.amount), fields=('available_balance',))
+        else:
+            CustomUser.objects.filter(pk__in=user_ids).update(roulette_spins=F('roulette_spins') + int(campaign.amount))
+            transaction.on_commit(lambda: bump_version(*map(user_version_name, user_ids)))
+
+        campaign.last_user_id = user_ids[-1]
+        campaign.granted_count = F('granted_count') + len(user_ids)
+        campaign.save(update_fields=['last_user_id', 'granted_count'])
+    return len(user_ids)
+
+
+@task
+def run_grant_campaign(campaign_id, chunk_size=GRANT_CHUNK_SIZE):
+    """Aplica a campanha lote a lote até ao fim (ou até ser pausada). Devolve os usuários contemplados."""
+    granted = 0
+    while chunk := grant_next_chunk(campaign_id, chunk_size):
+        granted += chunk
+    return granted
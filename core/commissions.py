@@ -0,0 +1,175 @@
+"""
+Liquidação em lote das comissões de convite.
+
+Percorre as compras de nível (UserLevel) posteriores a uma marca de
+processamento, sobe a cadeia invited_by até len(REFERRAL_COMMISSION_RATES)
+gerações e credita todos os beneficiários de uma vez (core/balances.py).
+
+Cada lote corre numa transação com a marca bloqueada, por isso cada
+compra é liquidada uma única vez; a restrição única (compra, geração) em
+ReferralCommission é a segunda garantia.
+
+Uma compra cujo commit chega depois de a marca passar o seu id (uma
+transação que demorou mais do que SETTLEMENT_LAG) é apanhada por
+settle_late_purchases, que revê as compras dos últimos SETTLEMENT_LOOKBACK
+abaixo da marca ainda sem comissão.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, Min, OuterRef
+from django.utils import timezone
+
+from .balances import credit_balances
+from .models import CustomUser, ReferralCommission, SettlementWatermark, UserLevel
+
+COMMISSION_WATERMARK = 'referral_commissions'
+COMMISSION_BATCH_SIZE = 2000
+# Só liquida compras com alguns segundos: uma compra com id menor ainda por
+# fazer commit não fica para trás da marca
+SETTLEMENT_LAG = timedelta(seconds=5)
+# Compras abaixo da marca revistas por settle_late_purchases: maior do que
+# a duração de qualquer transação que cria um UserLevel
+SETTLEMENT_LOOKBACK = timedelta(hours=1)
+
+
+def commission_rates():
+    """Percentagem por geração: [convidante direto, convidante do convidante, ...]."""
+    return [Decimal(str(rate)) for rate in getattr(settings, 'REFERRAL_COMMISSION_RATES', ['0.15'])]
+
+
+def first_purchase_only():
+    return getattr(settings, 'REFERRAL_COMMISSION_FIRST_PURCHASE_ONLY', True)
+
+
+def invite_chains(user_ids, depth):
+    """
+    Devolve {user_id: [convidante, convidante do convidante, ...]} até 'depth'
+    gerações, com uma consulta por geração (independente do tamanho do lote).
+    """
+    chains = {user_id: [] for user_id in user_ids}
+    heads = {user_id: user_id for user_id in user_ids}
+    for _ in range(depth):
+        parents = dict(
+            CustomUser.objects.filter(pk__in=set(heads.values()), invited_by__isnull=False)
+            .values_list('pk', 'invited_by_id')
+        )
+        next_heads = {}
+        for origin, head in heads.items():
+            parent = parents.get(head)
+            # Ignora ciclos (dados corrompidos) em vez de pagar duas vezes
+            if parent and parent != origin and parent not in chains[origin]:
+                chains[origin].append(parent)
+                next_heads[origin] = parent
+        heads = next_heads
+        if not heads:
+            break
+    return chains
+
+
+def _pay(purchases):
+    """
+    Paga as comissões das compras [(id, user_id, valor do nível)], na
+    transação de quem chama (com a marca bloqueada).
+    """
+    rates = commission_rates()
+    eligible = purchases
+    if first_purchase_only():
+        buyer_ids = {user_id for _, user_id, _ in purchases}
+        first_purchase = dict(
+            UserLevel.objects.filter(user_id__in=buyer_ids)
+            .values('user_id').annotate(first_id=Min('id')).values_list('user_id', 'first_id')
+        )
+        # Convidados já pagos pela lógica antiga da view 'nivel'
+        already_paid = set(
+            CustomUser.objects.filter(pk__in=buyer_ids, first_level_invested_paid_to_inviter=True)
+            .values_list('pk', flat=True)
+        )
+        eligible = [
+            purchase for purchase in purchases
+            if first_purchase[purchase[1]] == purchase[0] and purchase[1] not in already_paid
+        ]
+
+    chains = invite_chains({user_id for _, user_id, _ in eligible}, len(rates))
+    commissions = []
+    credits = defaultdict(Decimal)
+    paid_buyers = set()
+    for user_level_id, user_id, deposit_value in eligible:
+        for tier, (beneficiary_id, rate) in enumerate(zip(chains[user_id], rates), start=1):
+            amount = (deposit_value * rate).quantize(Decimal('0.01'))
+            if amount <= 0:
+                continue
+            commissions.append(ReferralCommission(
+                user_level_id=user_level_id, beneficiary_id=beneficiary_id, tier=tier, amount=amount,
+            ))
+            credits[beneficiary_id] += amount
+            paid_buyers.add(user_id)
+
+    ReferralCommission.objects.bulk_create(commissions, batch_size=1000)
+    credit_balances(credits)
+    if first_purchase_only() and paid_buyers:
+        CustomUser.objects.filter(pk__in=paid_buyers).update(first_level_invested_paid_to_inviter=True)
+
+
+def settle_commissions(batch_size=COMMISSION_BATCH_SIZE, now=None):
+    """
+    Liquida um lote de compras. Devolve o número de compras processadas
+    (0 quando não há nada novo).
+    """
+    now = now or timezone.now()
+
+    with transaction.atomic():
+        watermark, _ = SettlementWatermark.objects.select_for_update().get_or_create(name=COMMISSION_WATERMARK)
+        purchases = list(
+            UserLevel.objects.filter(id__gt=watermark.last_id, purchase_date__lt=now - SETTLEMENT_LAG)
+            .order_by('id')
+            .values_list('id', 'user_id', 'level__deposit_value')[:batch_size]
+        )
+        if not purchases:
+            return 0
+
+        _pay(purchases)
+        watermark.last_id = purchases[-1][0]
+        watermark.save(update_fields=['last_id', 'updated_at'])
+
+    return len(purchases)
+
+
+def settle_late_purchases(batch_size=COMMISSION_BATCH_SIZE, now=None):
+    """
+    Liquida as compras abaixo da marca, dos últimos SETTLEMENT_LOOKBACK, que
+    deviam ter pago comissão e não pagaram (commit depois de a marca as
+    passar). Devolve o número de compras encontradas.
+    """
+    now = now or timezone.now()
+    total = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            watermark, _ = SettlementWatermark.objects.select_for_update().get_or_create(name=COMMISSION_WATERMARK)
+            late = UserLevel.objects.filter(
+                id__gt=last_id, id__lte=watermark.last_id, purchase_date__gte=now - SETTLEMENT_LOOKBACK,
+                user__invited_by__isnull=False,
+            ).exclude(Exists(ReferralCommission.objects.filter(user_level=OuterRef('pk'))))
+            if first_purchase_only():
+                late = late.exclude(user__first_level_invested_paid_to_inviter=True)
+            purchases = list(late.order_by('id').values_list('id', 'user_id', 'level__deposit_value')[:batch_size])
+            if purchases:
+                _pay(purchases)
+        total += len(purchases)
+        if len(purchases) < batch_size:
+            return total
+        last_id = purchases[-1][0]
+
+
+def settle_all(batch_size=COMMISSION_BATCH_SIZE, now=None):
+    """Liquida lotes até não haver compras pendentes. Devolve o total processado."""
+    total = settle_late_purchases(batch_size=batch_size, now=now)
+    while True:
+        processed = settle_commissions(batch_size=batch_size, now=now)
+        total += processed
+        if processed < batch_size:
+            return total
@@ -0,0 +1,285 @@
+"""
+Benchmark de contenção nas views que alteram saldos: spin_roulette,
+claim_daily_reward e a compra de nível em 'nivel' (com o subsídio de
+convite creditado ao convidante por core/commissions.py).
+
+Cenários (o mesmo pedido por cliente nos dois):
+- shared: todos os clientes escrevem na mesma linha de CustomUser. Um
+  convidante popular gira a roleta e resgata o prémio diário em todos os
+  clientes ao mesmo tempo, os seus convidados compram níveis e a
+  liquidação das comissões, numa thread à parte, credita-lhe os subsídios;
+- disjoint: cada cliente tem o seu usuário, sem convidante: a referência
+  sem contenção entre linhas.
+
+Mede pedidos por segundo e latência por endpoint, o tempo em espera de
+bloqueios (no PostgreSQL: amostras de pg_stat_activity com
+wait_event_type = 'Lock', em segundos-sessão) e as atualizações perdidas:
+- saldos: a diferença entre o saldo e o histórico de movimentos
+  (core/reconcile.py) de cada usuário no fim, menos a que tinha no início;
+- giros: roulette_spins no fim menos os giros iniciais descontados dos
+  registos de Roulette criados.
+Os desvios são saldo menos histórico: negativo é um crédito perdido,
+positivo um débito perdido (ex.: a compra de nível apagada por um giro).
+
+Os usuários do benchmark (telefone com CONTENTION_PHONE_PREFIX) são
+criados para cada cenário e apagados no fim. Usado por
+manage.py benchmark_contention, numa cópia da base de dados.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import connection, connections
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from .benchmark import BENCHMARK_HOST, EndpointResult
+from .commissions import settle_all
+from .models import CustomUser, DailyRewardCode, Roulette, RouletteSettings
+from .reconcile import reconcile_users
+from .synthetic import ensure_levels
+
+CONTENTION_PHONE_PREFIX = '81'
+CONTENTION_REWARD_CODE = 'CONTENCAO'
+SCENARIOS = ['shared', 'disjoint']
+# Pesos das operações de cada pedido
+OPERATION_WEIGHTS = {'spin_roulette': 6, 'nivel': 3, 'claim_daily_reward': 1}
+INITIAL_BALANCE = 10 ** 7
+INITIAL_SPINS = 10 ** 6
+# Intervalo entre amostras de pg_stat_activity (segundos)
+LOCK_SAMPLE_INTERVAL = 0.01
+
+
+def contention_users():
+    return CustomUser.objects.filter(phone_number__startswith=CONTENTION_PHONE_PREFIX, invite_code__startswith='b')
+
+
+def delete_contention_users():
+    """Apaga os usuários e o código diário do benchmark (os históricos seguem por CASCADE)."""
+    DailyRewardCode.objects.filter(code=CONTENTION_REWARD_CODE).delete()
+    return contention_users().delete()[0]
+
+
+class LockWaitSampler(threading.Thread):
+    """
+    Soma o número de sessões à espera de um bloqueio na base de dados,
+    multiplicado pelo intervalo entre amostras. Só no PostgreSQL.
+    """
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.stop_event = threading.Event()
+        self.waiting_seconds = 0.0
+        self.max_waiting = 0
+
+    def run(self):
+        try:
+            with connection.cursor() as cursor:
+                last = time.perf_counter()
+                while not self.stop_event.wait(LOCK_SAMPLE_INTERVAL):
+                    cursor.execute(
+                        "SELECT count(*) FROM pg_stat_activity "
+                        "WHERE datname = current_database() AND wait_event_type = 'Lock'"
+                    )
+                    waiting = cursor.fetchone()[0]
+                    now = time.perf_counter()
+                    self.waiting_seconds += waiting * (now - last)
+                    self.max_waiting = max(self.max_waiting, waiting)
+                    last = now
+        finally:
+            connections.close_all()
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+
+class ContentionBenchmark:
+    """
+    'clients' clientes fazem 'requests' pedidos no total por cenário, com a
+    mistura de OPERATION_WEIGHTS. Com clients=1 os pedidos correm na thread
+    atual e a liquidação só no fim.
+    """
+
+    def __init__(self, clients=8, requests=400, seed=0):
+        self.clients = clients
+        self.requests = requests
+        self.seed = seed
+
+    # --- PREPARAÇÃO ---
+
+    def create_user(self, index, invited_by=None):
+        user = CustomUser(
+            phone_number=f'{CONTENTION_PHONE_PREFIX}{index:07d}', invite_code=f'b{index:07d}',
+            invited_by=invited_by, available_balance=INITIAL_BALANCE, roulette_spins=INITIAL_SPINS,
+        )
+        user.set_unusable_password()
+        user.save()
+        return user
+
+    def prepare(self, scenario):
+        """
+        Devolve, por cliente, (usuário da roleta e do prémio diário,
+        usuário das compras de nível).
+        """
+        delete_contention_users()
+        ensure_levels()
+        DailyRewardCode.objects.update_or_create(
+            code=CONTENTION_REWARD_CODE, defaults={'reward_amount': 100, 'is_active': True},
+        )
+        if scenario == 'shared':
+            inviter = self.create_user(0)
+            return [(inviter, self.create_user(index + 1, invited_by=inviter)) for index in range(self.clients)]
+        users = [self.create_user(index + 1) for index in range(self.clients)]
+        return [(user, user) for user in users]
+
+    def requests_for(self, client_index):
+        rng = random.Random(self.seed * 1000 + client_index)
+        share = self.requests // self.clients + (client_index < self.requests % self.clients)
+        names, weights = zip(*OPERATION_WEIGHTS.items())
+        return rng.choices(names, weights, k=share)
+
+    # --- MEDIÇÃO DAS ATUALIZAÇÕES PERDIDAS ---
+
+    @staticmethod
+    def balance_drift(user_ids):
+        """{user_id: (diferença no saldo disponível, diferença no saldo de subsídios)}."""
+        _, mismatches = reconcile_users(user_ids=user_ids, include_staff=True)
+        return {mismatch.user_id: (mismatch.available_diff, mismatch.subsidy_diff) for mismatch in mismatches}
+
+    @staticmethod
+    def spin_drift(user_ids):
+        spins = dict(CustomUser.objects.filter(pk__in=user_ids).values_list('pk', 'roulette_spins'))
+        used = dict(
+            Roulette.objects.filter(user_id__in=user_ids).order_by().values('user')
+            .annotate(total=Count('pk')).values_list('user', 'total')
+        )
+        return {user_id: spins[user_id] - (INITIAL_SPINS - used.get(user_id, 0)) for user_id in user_ids}
+
+    # --- EXECUÇÃO ---
+
+    def run(self, scenarios=SCENARIOS):
+        # spin_roulette sem configuração da roleta responde 500; cria uma só durante o benchmark
+        created_settings = None if RouletteSettings.objects.exists() else RouletteSettings.objects.create()
+        try:
+            return [self.run_scenario(scenario) for scenario in scenarios]
+        finally:
+            delete_contention_users()
+            if created_settings:
+                created_settings.delete()
+
+    def run_scenario(self, scenario):
+        pairs = self.prepare(scenario)
+        user_ids = sorted({user.pk for pair in pairs for user in pair})
+        before = self.balance_drift(user_ids)
+        results = {name: EndpointResult(name) for name in OPERATION_WEIGHTS}
+        urls = {name: reverse(name) for name in OPERATION_WEIGHTS}
+        level_ids = [level.pk for level in ensure_levels()]
+
+        def worker(client_index):
+            spinner, buyer = pairs[client_index]
+            clients = {}
+            for user in {spinner, buyer}:
+                # Erros da view (ex.: 'database is locked') contam como respostas 500
+                clients[user.pk] = Client(SERVER_NAME=BENCHMARK_HOST, raise_request_exception=False)
+                clients[user.pk].force_login(user)
+            rng = random.Random(self.seed * 1000 + client_index + 500)
+            try:
+                for name in self.requests_for(client_index):
+                    if name == 'nivel':
+                        client, data = clients[buyer.pk], {'level_id': rng.choice(level_ids)}
+                    elif name == 'claim_daily_reward':
+                        client, data = clients[spinner.pk], {'reward_code': CONTENTION_REWARD_CODE}
+                    else:
+                        client, data = clients[spinner.pk], {}
+                    started = time.perf_counter()
+                    response = client.post(urls[name], data)
+                    results[name].record(time.perf_counter() - started, response.status_code)
+            finally:
+                if threading.current_thread() is not threading.main_thread():
+                    connections.close_all()
+
+        stop_settling = threading.Event()
+
+        def settler():
+            # Credita as comissões enquanto os clientes escrevem (sem esperar SETTLEMENT_LAG)
+            try:
+                while not stop_settling.wait(0.05):
+                    settle_all(now=timezone.now() + timedelta(minutes=1))
+            finally:
+                connections.close_all()
+
+        sampler = LockWaitSampler() if connection.vendor == 'postgresql' else None
+        started = time.perf_counter()
+        if self.clients == 1:
+            worker(0)
+        else:
+            if sampler:
+                sampler.start()
+            settling = threading.Thread(target=settler, daemon=True)
+            settling.start()
+            with ThreadPoolExecutor(max_workers=self.clients) as executor:
+                for future in [executor.submit(worker, index) for index in range(self.clients)]:
+                    future.result()
+            stop_settling.set()
+            settling.join()
+            if sampler:
+                sampler.stop()
+        wall_time = time.perf_counter() - started
+        settle_all(now=timezone.now() + timedelta(minutes=1))
+
+        after = self.balance_drift(user_ids)
+        zero = (0, 0)
+        lost = {
+            user_id: tuple(a - b for a, b in zip(after.get(user_id, zero), before.get(user_id, zero)))
+            for user_id in user_ids
+        }
+        spins = self.spin_drift(user_ids)
+        summaries = []
+        for result in results.values():
+            result.wall_time = wall_time
+            summaries.append(result.summary())
+        return {
+            'scenario': scenario,
+            'clients': self.clients,
+            'requests': sum(summary['requests'] for summary in summaries),
+            'wall_s': wall_time,
+            'rps': sum(summary['requests'] for summary in summaries) / wall_time if wall_time else 0.0,
+            'lock_wait_s': sampler.waiting_seconds if sampler else None,
+            'max_lock_waiters': sampler.max_waiting if sampler else None,
+            'users_with_lost_updates': sum(
+                1 for user_id in user_ids if any(lost[user_id]) or spins[user_id]
+            ),
+            'available_drift': sum(available for available, _ in lost.values()),
+            'subsidy_drift': sum(subsidy for _, subsidy in lost.values()),
+            'spin_drift': sum(spins.values()),
+            'endpoints': summaries,
+        }
+
+
+def format_contention_report(reports):
+    lines = []
+    for report in reports:
+        lock_wait = 'n/d (só PostgreSQL)' if report['lock_wait_s'] is None else (
+            f"{report['lock_wait_s']:.2f} s-sessão (máx. {report['max_lock_waiters']} em espera)"
+        )
+        lines += [
+            f"== {report['scenario']}: {report['clients']} clientes, {report['requests']} pedidos, "
+            f"{report['rps']:.1f} pedidos/s",
+            f"   espera por bloqueios: {lock_wait}",
+            f"   atualizações perdidas: {report['users_with_lost_updates']} usuário(s); desvio do saldo "
+            f"disponível {report['available_drift']:.2f} Kz, dos subsídios {report['subsidy_drift']:.2f} Kz, "
+            f"dos giros {report['spin_drift']}",
+        ]
+        header = f"   {'endpoint':<20}{'pedidos':>8}{'erros':>7}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        lines += [header, '   ' + '-' * (len(header) - 3)]
+        for row in report['endpoints']:
+            lines.append(
+                f"   {row['endpoint']:<20}{row['requests']:>8}{row['errors']:>7}{row['rps']:>9.1f}"
+                f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}"
+            )
+    return '\n'.join(lines)
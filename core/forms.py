@@ -45,6 +45,11 @@ class DepositForm(forms.ModelForm):
         model = Deposit
         fields = ['amount', 'proof_of_payment']
 
+class ProofUploadInitForm(forms.Form):
+    """Início de um envio em partes do comprovativo (ver core/uploads.py)."""
+    amount = forms.DecimalField(max_digits=10, decimal_places=2, label="Valor do Depósito")
+    size = forms.IntegerField(min_value=1, label="Tamanho do Comprovativo (bytes)")
+
 class WithdrawalForm(forms.Form):
     amount = forms.DecimalField(max_digits=10, decimal_places=2, label="Valor a Sacar")
 
@@ -0,0 +1,140 @@
+"""
+Pipeline de imagens responsivas baseado em Pillow.
+
+Gera variantes em várias larguras (WebP e, quando o Pillow suporta, AVIF)
+para as imagens estáticas do carrossel e para as imagens dos Níveis, de
+forma que os templates possam emitir <picture>/srcset e os telemóveis
+descarreguem apenas a largura de que precisam.
+"""
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+# Larguras geradas por omissão (nunca maiores do que a imagem original)
+RESPONSIVE_IMAGE_WIDTHS = getattr(settings, 'RESPONSIVE_IMAGE_WIDTHS', (320, 480, 640, 800))
+# As imagens dos Níveis aparecem como miniaturas nos cartões de 'nivel'
+LEVEL_IMAGE_WIDTHS = getattr(settings, 'LEVEL_IMAGE_WIDTHS', (96, 192, 480))
+RESPONSIVE_IMAGE_QUALITY = getattr(settings, 'RESPONSIVE_IMAGE_QUALITY', {
+    # A escala de qualidade do AVIF é diferente: 50 equivale visualmente a ~70 em WebP
+    'avif': 50,
+    'webp': 70,
+    'jpeg': 75,
+})
+
+# Extensões que o pós-processador do collectstatic converte
+RESPONSIVE_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Ficheiro (em STATIC_ROOT) com o mapa imagem original -> variantes
+RESPONSIVE_IMAGES_MANIFEST = 'responsive-images.json'
+
+# Erros de um ficheiro em falta, truncado ou que o Pillow não reconhece
+UNREADABLE_IMAGE_ERRORS = (OSError, ValueError, SyntaxError, Image.DecompressionBombError)
+
+MIME_TYPES = {
+    'avif': 'image/avif',
+    'webp': 'image/webp',
+}
+
+
+def available_formats():
+    """
+    Formatos modernos suportados por este Pillow, do mais eficiente para o menos.
+    A ordem é a mesma das <source> no <picture>.
+    """
+    formats = []
+    if features.check('avif'):
+        formats.append('avif')
+    if features.check('webp'):
+        formats.append('webp')
+    return formats
+
+
+def is_responsive_candidate(name):
+    return os.path.splitext(name)[1].lower() in RESPONSIVE_IMAGE_EXTENSIONS
+
+
+def variant_name(name, width, fmt):
+    """'ddb/images/image1.jpg' -> 'ddb/images/image1.w480.webp'"""
+    root, _ = os.path.splitext(name)
+    return f'{root}.w{width}.{fmt}'
+
+
+def open_normalized(fileobj):
+    """
+    Abre a imagem, aplica a orientação EXIF e converte para um modo que
+    os codificadores WebP/AVIF/JPEG aceitam.
+    """
+    image = Image.open(fileobj)
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    return image
+
+
+def resize_to_width(image, width):
+    if width >= image.width:
+        return image
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def encode(image, fmt, quality=None):
+    fmt = 'jpeg' if fmt == 'jpg' else fmt
+    buffer = io.BytesIO()
+    options = {'quality': quality or RESPONSIVE_IMAGE_QUALITY[fmt]}
+    if fmt == 'webp':
+        options['method'] = 6
+    elif fmt == 'jpeg':
+        options.update(optimize=True, progressive=True)
+        if image.mode == 'RGBA':
+            image = image.convert('RGB')
+    image.save(buffer, fmt.upper(), **options)
+    return buffer.getvalue()
+
+
+def build_variants(fileobj, name, widths=None, formats=None):
+    """
+    Gera as variantes de uma imagem em memória.
+    Devolve uma lista de (metadados, bytes), onde metadados é
+    {'name': ..., 'width': ..., 'format': ...}.
+    """
+    widths = widths or RESPONSIVE_IMAGE_WIDTHS
+    formats = formats if formats is not None else available_formats()
+
+    with open_normalized(fileobj) as image:
+        # Apenas larguras menores que a original; a largura original só é
+        # acrescentada quando é bem maior do que a maior largura configurada
+        target_widths = sorted(w for w in set(widths) if w < image.width)
+        if not target_widths or image.width > target_widths[-1] * 1.1:
+            target_widths.append(image.width)
+        variants = []
+        for width in target_widths:
+            resized = resize_to_width(image, width)
+            for fmt in formats:
+                meta = {'name': variant_name(name, width, fmt), 'width': width, 'format': fmt}
+                variants.append((meta, encode(resized, fmt)))
+    return variants
+
+
+def save_variants(storage, fileobj, name, **kwargs):
+    """
+    Gera e grava as variantes no storage indicado, substituindo versões
+    anteriores com o mesmo nome. Devolve apenas os metadados.
+    """
+    saved = []
+    for meta, content in build_variants(fileobj, name, **kwargs):
+        if storage.exists(meta['name']):
+            storage.delete(meta['name'])
+        meta['name'] = storage.save(meta['name'], ContentFile(content))
+        saved.append(meta)
+    return saved
+
+
+def srcset(variants, fmt, url):
+    """Monta o atributo srcset de um formato a partir dos metadados."""
+    return ', '.join(
+        f"{url(v['name'])} {v['width']}w" for v in variants if v['format'] == fmt
+    )
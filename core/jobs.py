@@ -0,0 +1,342 @@
+"""
+Fila de tarefas em segundo plano guardada na própria base de dados.
+
+- @task regista uma função que pode ser enfileirada com enqueue().
+- settings.PERIODIC_JOBS associa tarefas registadas a expressões cron
+  (hora local, TIME_ZONE), por exemplo {'expire_level_cycles': '0 * * * *'}.
+- O worker (manage.py run_jobs) reserva tarefas com
+  SELECT ... FOR UPDATE SKIP LOCKED no Postgres. No SQLite, que não tem
+  bloqueio por linha, a reserva é feita por um UPDATE condicional.
+- Uma tarefa que falha é repetida com backoff exponencial até max_attempts.
+- Enquanto corre um lote, o worker renova locked_at das suas tarefas a cada
+  JOB_HEARTBEAT_INTERVAL; só as tarefas sem batimento há JOB_LOCK_TIMEOUT
+  voltam para a fila.
+
+Não é preciso Redis nem Celery.
+"""
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+JOB_BACKOFF_BASE = getattr(settings, 'JOB_BACKOFF_BASE', 30)  # segundos
+JOB_BACKOFF_MAX = getattr(settings, 'JOB_BACKOFF_MAX', 60 * 60)
+# O worker renova locked_at das tarefas reservadas a este intervalo
+JOB_HEARTBEAT_INTERVAL = getattr(settings, 'JOB_HEARTBEAT_INTERVAL', 60)
+# Tarefas "em execução" sem batimento há mais tempo do que isto são
+# consideradas abandonadas (worker terminado a meio) e voltam para a fila
+JOB_LOCK_TIMEOUT = getattr(settings, 'JOB_LOCK_TIMEOUT', 15 * 60)
+
+_registry = {}
+
+
+# ---
+# REGISTO DE TAREFAS
+# ---
+
+def task(func=None, *, name=None, max_attempts=5, atomic=False):
+    """
+    Regista uma função como tarefa. O nome por omissão é o nome da função.
+    Com atomic=True a tarefa e a marcação como concluída correm na mesma
+    transação: uma tarefa que só altera a base de dados é aplicada uma única vez.
+    """
+    def decorator(func):
+        func.job_name = name or func.__name__
+        func.max_attempts = max_attempts
+        func.atomic = atomic
+        _registry[func.job_name] = func
+        return func
+    return decorator(func) if func else decorator
+
+
+def get_task(name):
+    return _registry[name]
+
+
+def enqueue(func_or_name, *args, run_at=None, unique_key=None, **kwargs):
+    """
+    Enfileira uma tarefa. Dentro de uma transação, a tarefa só fica visível
+    para os workers depois do commit.
+    Com unique_key, uma tarefa já existente com a mesma chave não é duplicada.
+    """
+    from .models import Job
+
+    name = getattr(func_or_name, 'job_name', func_or_name)
+    func = _registry.get(name)
+    job = Job(
+        name=name,
+        payload={'args': list(args), 'kwargs': kwargs},
+        run_at=run_at or timezone.now(),
+        max_attempts=getattr(func, 'max_attempts', 5),
+        unique_key=unique_key,
+    )
+    if unique_key:
+        Job.objects.bulk_create([job], ignore_conflicts=True)
+    else:
+        job.save()
+    return job
+
+
+# ---
+# AGENDAMENTO ESTILO CRON
+# ---
+
+class CronSchedule:
+    """
+    Expressão cron de 5 campos (minuto hora dia-do-mês mês dia-da-semana).
+    Suporta '*', '*/n', 'a-b', 'a-b/n' e listas separadas por vírgula.
+    Dia da semana: 0 = domingo.
+    """
+    RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f'Expressão cron inválida: {expression!r}')
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse(field, low, high) for field, (low, high) in zip(fields, self.RANGES)
+        )
+
+    @staticmethod
+    def _parse(field, low, high):
+        values = set()
+        for part in field.split(','):
+            step = 1
+            if '/' in part:
+                part, step = part.split('/')
+                step = int(step)
+            if part == '*':
+                start, end = low, high
+            elif '-' in part:
+                start, end = map(int, part.split('-'))
+            else:
+                start = end = int(part)
+            if start < low or end > high:
+                raise ValueError(f'Valor fora do intervalo {low}-{high}: {field!r}')
+            values.update(range(start, end + 1, step))
+        return values
+
+    def matches(self, moment):
+        return (
+            moment.minute in self.minutes
+            and moment.hour in self.hours
+            and moment.day in self.days
+            and moment.month in self.months
+            and (moment.weekday() + 1) % 7 in self.weekdays
+        )
+
+    def next_after(self, moment):
+        """Próxima ocorrência estritamente depois de 'moment' (hora local)."""
+        candidate = timezone.localtime(moment).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Um ano de minutos cobre qualquer expressão válida
+        for _ in range(366 * 24 * 60):
+            if candidate.month in self.months and candidate.day in self.days:
+                if self.matches(candidate):
+                    return candidate
+                candidate += timedelta(minutes=1)
+            else:
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+        raise ValueError(f'A expressão cron nunca ocorre: {self.expression!r}')
+
+
+def periodic_schedules():
+    return {
+        name: CronSchedule(expression)
+        for name, expression in getattr(settings, 'PERIODIC_JOBS', {}).items()
+    }
+
+
+def schedule_periodic_jobs(now=None):
+    """
+    Garante que cada tarefa periódica tem a próxima ocorrência na fila.
+    A chave única torna a chamada idempotente entre vários workers; se o
+    worker esteve parado, as ocorrências perdidas correm uma só vez.
+    """
+    now = now or timezone.now()
+    for name, schedule in periodic_schedules().items():
+        run_at = schedule.next_after(now)
+        enqueue(name, run_at=run_at, unique_key=f'periodic:{name}:{run_at.isoformat()}')
+
+
+# ---
+# WORKER
+# ---
+
+class LostJobLock(Exception):
+    """A tarefa foi devolvida à fila (e talvez reservada por outro worker) durante a execução."""
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def heartbeat(worker, now=None):
+    """Renova locked_at de todas as tarefas em execução reservadas por 'worker'."""
+    from .models import Job
+
+    return Job.objects.filter(status=Job.STATUS_RUNNING, locked_by=worker).update(
+        locked_at=now or timezone.now(),
+    )
+
+
+class Heartbeat:
+    """
+    Thread que chama heartbeat() a cada JOB_HEARTBEAT_INTERVAL enquanto o
+    lote corre, para que uma tarefa longa não pareça abandonada.
+    Usa a sua própria ligação à base de dados, fechada no fim.
+    """
+
+    def __init__(self, worker, interval=None):
+        self.worker = worker
+        self.interval = interval or JOB_HEARTBEAT_INTERVAL
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name=f'heartbeat-{worker}', daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                try:
+                    heartbeat(self.worker)
+                except Exception:
+                    logger.exception('Falha ao renovar as tarefas do worker %s', self.worker)
+        finally:
+            connection.close()
+
+
+def release_stale_jobs(now=None):
+    """Devolve à fila as tarefas cujo worker deixou de dar sinal de vida."""
+    from .models import Job
+
+    now = now or timezone.now()
+    return Job.objects.filter(
+        status=Job.STATUS_RUNNING,
+        locked_at__lt=now - timedelta(seconds=JOB_LOCK_TIMEOUT),
+    ).update(status=Job.STATUS_PENDING, locked_by='', locked_at=None)
+
+
+def claim_jobs(limit=10, worker=None, now=None):
+    """
+    Reserva até 'limit' tarefas prontas a correr e marca-as como em execução.
+    """
+    from .models import Job
+
+    now = now or timezone.now()
+    worker = worker or worker_id()
+    with transaction.atomic():
+        candidates = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.STATUS_PENDING, run_at__lte=now)
+            .order_by('run_at', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        claimed = []
+        for job_id in candidates:
+            # UPDATE condicional: no SQLite é o que impede dois workers de
+            # reservarem a mesma tarefa
+            if Job.objects.filter(id=job_id, status=Job.STATUS_PENDING).update(
+                status=Job.STATUS_RUNNING, locked_by=worker, locked_at=now,
+            ):
+                claimed.append(job_id)
+    return list(Job.objects.filter(id__in=claimed).order_by('run_at', 'id'))
+
+
+def backoff_delay(attempts):
+    return min(JOB_BACKOFF_BASE * 2 ** (attempts - 1), JOB_BACKOFF_MAX)
+
+
+def run_job(job):
+    """
+    Executa uma tarefa reservada e regista o resultado. Se entretanto a
+    tarefa foi devolvida à fila, o resultado é descartado (e, com
+    atomic=True, os efeitos da tarefa são revertidos).
+    """
+    try:
+        return _run_job(job)
+    except LostJobLock:
+        logger.warning('Tarefa %s (%s) deixou de pertencer a este worker; resultado descartado', job.name, job.pk)
+        return False
+
+
+def _run_job(job):
+    from .models import Job
+
+    job.attempts += 1
+    try:
+        func = get_task(job.name)
+        args, kwargs = job.payload.get('args', []), job.payload.get('kwargs', {})
+        if func.atomic:
+            with transaction.atomic():
+                func(*args, **kwargs)
+                _mark_done(job)
+            return True
+        func(*args, **kwargs)
+    except LostJobLock:
+        raise
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.STATUS_PENDING
+            job.run_at = timezone.now() + timedelta(seconds=backoff_delay(job.attempts))
+        else:
+            job.status = Job.STATUS_FAILED
+            job.finished_at = timezone.now()
+        logger.exception('Tarefa %s (%s) falhou na tentativa %s', job.name, job.pk, job.attempts)
+    else:
+        _mark_done(job)
+        return True
+    _save_result(job)
+    return False
+
+
+def _mark_done(job):
+    from .models import Job
+
+    job.status = Job.STATUS_DONE
+    job.finished_at = timezone.now()
+    job.last_error = ''
+    _save_result(job)
+
+
+def _save_result(job):
+    """Grava o resultado só se a tarefa ainda estiver reservada por este worker."""
+    from .models import Job
+
+    worker = job.locked_by
+    job.locked_by = ''
+    job.locked_at = None
+    fields = ['attempts', 'status', 'run_at', 'finished_at', 'last_error', 'locked_by', 'locked_at']
+    updated = Job.objects.filter(pk=job.pk, status=Job.STATUS_RUNNING, locked_by=worker).update(
+        **{field: getattr(job, field) for field in fields},
+    )
+    if not updated:
+        raise LostJobLock(job.pk)
+
+
+def run_pending(limit=10, worker=None):
+    """Uma volta do worker: agenda periódicas, recupera abandonadas e corre um lote."""
+    schedule_periodic_jobs()
+    release_stale_jobs()
+    worker = worker or worker_id()
+    jobs = claim_jobs(limit=limit, worker=worker)
+    if jobs:
+        with Heartbeat(worker):
+            for job in jobs:
+                run_job(job)
+    return len(jobs)
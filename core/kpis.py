@@ -0,0 +1,254 @@
+"""
+Indicadores diários da plataforma (depósitos, saques, novos usuários, compras
+de nível, tarefas, roletas e resgates) e contadores de pendentes, mantidos
+incrementalmente pelos sinais em core/signals.py.
+
+Cada linha guardada contribui com um conjunto de valores por dia (e, para
+depósitos e saques pendentes, para os contadores); ao gravar ou apagar uma
+linha aplica-se a diferença entre a contribuição nova e a anterior, na
+mesma transação da escrita.
+
+Para não serializar todas as escritas do dia numa única linha, cada dia (e
+cada contador) tem KPI_SLOTS linhas e cada escrita soma numa delas ao acaso;
+as leituras somam as linhas do dia. rebuild_kpis recalcula tudo a partir
+das tabelas de origem (incluindo o arquivo, ver core/archive.py).
+"""
+import random
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    CustomUser, DailyKPI, Deposit, KPICounter, Roulette, RouletteArchive, Task, TaskArchive,
+    UserLevel, UserRewardClaim, Withdrawal,
+)
+
+PENDING_DEPOSITS = 'pending_deposits'
+PENDING_WITHDRAWALS = 'pending_withdrawals'
+WITHDRAWAL_PENDING_STATUS = 'Pending'
+WITHDRAWAL_APPROVED_STATUS = 'Aprovado'
+
+DAILY_FIELDS = [
+    'new_users', 'deposits_count', 'deposits_amount', 'deposits_approved_count', 'deposits_approved_amount',
+    'withdrawals_count', 'withdrawals_amount', 'withdrawals_approved_amount', 'level_purchases',
+    'level_purchases_amount', 'tasks_count', 'tasks_earnings', 'roulette_spins', 'roulette_prizes',
+    'reward_claims', 'reward_claims_amount',
+]
+
+
+def kpi_slots():
+    return getattr(settings, 'KPI_SLOTS', 8)
+
+
+def local_day(value):
+    return timezone.localtime(value).date()
+
+
+# --- CONTRIBUIÇÃO DE CADA LINHA ---
+# Devolvem ({dia: {campo: valor}}, {contador: (quantidade, valor)})
+
+def deposit_contribution(deposit):
+    daily = {'deposits_count': 1, 'deposits_amount': deposit.amount}
+    counters = {}
+    if deposit.is_approved:
+        daily.update(deposits_approved_count=1, deposits_approved_amount=deposit.amount)
+    else:
+        counters[PENDING_DEPOSITS] = (1, deposit.amount)
+    return {local_day(deposit.created_at): daily}, counters
+
+
+def withdrawal_contribution(withdrawal):
+    daily = {'withdrawals_count': 1, 'withdrawals_amount': withdrawal.amount}
+    counters = {}
+    if withdrawal.status == WITHDRAWAL_APPROVED_STATUS:
+        daily['withdrawals_approved_amount'] = withdrawal.amount
+    elif withdrawal.status == WITHDRAWAL_PENDING_STATUS:
+        counters[PENDING_WITHDRAWALS] = (1, withdrawal.amount)
+    return {local_day(withdrawal.created_at): daily}, counters
+
+
+def user_contribution(user):
+    return {local_day(user.date_joined): {'new_users': 1}}, {}
+
+
+def user_level_contribution(user_level):
+    return {local_day(user_level.purchase_date): {
+        'level_purchases': 1, 'level_purchases_amount': user_level.level.deposit_value,
+    }}, {}
+
+
+def task_contribution(task):
+    return {local_day(task.completed_at): {'tasks_count': 1, 'tasks_earnings': task.earnings}}, {}
+
+
+def roulette_contribution(spin):
+    return {local_day(spin.spin_date): {'roulette_spins': 1, 'roulette_prizes': spin.prize}}, {}
+
+
+def reward_claim_contribution(claim):
+    return {local_day(claim.claimed_at): {
+        'reward_claims': 1, 'reward_claims_amount': claim.reward_code.reward_amount,
+    }}, {}
+
+
+# Modelos cujas linhas podem mudar ou ser apagadas (diferença nova - anterior)
+MUTABLE_CONTRIBUTIONS = {
+    Deposit: deposit_contribution,
+    Withdrawal: withdrawal_contribution,
+}
+# Modelos de eventos: contam apenas quando são criados (o arquivo de Task e
+# Roulette apaga linhas sem alterar os indicadores)
+CREATED_CONTRIBUTIONS = {
+    CustomUser: user_contribution,
+    UserLevel: user_level_contribution,
+    Task: task_contribution,
+    Roulette: roulette_contribution,
+    UserRewardClaim: reward_claim_contribution,
+}
+# Eventos descontados quando a linha é apagada, como no rebuild_kpis: um usuário
+# apagado deixa de contar em new_users. As compras, tarefas, roletas e resgates
+# apagados com ele continuam a contar até um rebuild_kpis (as tarefas e roletas
+# arquivadas continuam a contar sempre).
+DELETED_CONTRIBUTIONS = {
+    CustomUser: user_contribution,
+}
+
+
+def contribution_delta(new=None, old=None):
+    """Diferença entre duas contribuições (qualquer uma pode faltar)."""
+    daily = defaultdict(lambda: defaultdict(Decimal))
+    counters = defaultdict(lambda: [0, Decimal('0')])
+    for contribution, sign in ((new, 1), (old, -1)):
+        if contribution is None:
+            continue
+        days, contribution_counters = contribution
+        for day, values in days.items():
+            for field, value in values.items():
+                daily[day][field] += sign * value
+        for name, (count, amount) in contribution_counters.items():
+            counters[name][0] += sign * count
+            counters[name][1] += sign * amount
+    return (
+        {day: {field: value for field, value in values.items() if value} for day, values in daily.items()},
+        {name: values for name, values in counters.items() if any(values)},
+    )
+
+
+def apply_delta(delta):
+    days, counters = delta
+    slot = random.randrange(kpi_slots())
+    for day, values in days.items():
+        if values:
+            _increment(DailyKPI, {'day': day, 'slot': slot}, values)
+    for name, (count, amount) in counters.items():
+        _increment(KPICounter, {'name': name, 'slot': slot}, {'count': count, 'amount': amount})
+
+
+def _increment(model, key, values):
+    changes = {field: F(field) + value for field, value in values.items()}
+    if not model.objects.filter(**key).update(**changes):
+        # Primeira escrita nesta linha: cria-a (sem falhar se outra escrita se antecipou)
+        model.objects.bulk_create([model(**key)], ignore_conflicts=True)
+        model.objects.filter(**key).update(**changes)
+
+
+# --- LEITURA (APENAS DAS TABELAS DE INDICADORES) ---
+
+def daily_kpis(days=30, today=None):
+    """Indicadores dos últimos 'days' dias, do mais recente para o mais antigo."""
+    today = today or timezone.localdate()
+    first_day = today - timedelta(days=days - 1)
+    rows = {
+        row['day']: row for row in
+        DailyKPI.objects.filter(day__gte=first_day, day__lte=today)
+        .values('day').annotate(**{field: Sum(field) for field in DAILY_FIELDS})
+    }
+    empty = dict.fromkeys(DAILY_FIELDS, 0)
+    return [
+        {**empty, **rows.get(day, {}), 'day': day}
+        for day in (today - timedelta(days=offset) for offset in range(days))
+    ]
+
+
+def pending_counters():
+    totals = {name: {'count': 0, 'amount': Decimal('0')} for name in (PENDING_DEPOSITS, PENDING_WITHDRAWALS)}
+    for row in KPICounter.objects.values('name').annotate(count_total=Sum('count'), amount_total=Sum('amount')):
+        totals[row['name']] = {'count': row['count_total'], 'amount': row['amount_total']}
+    return totals
+
+
+# --- RECONSTRUÇÃO A PARTIR DAS TABELAS DE ORIGEM ---
+
+def _daily_totals(queryset, date_field, fields):
+    """{dia: {campo_kpi: valor}} com um GROUP BY por dia (hora local)."""
+    aggregates = {
+        kpi_field: Count('pk') if source is None else Sum(source)
+        for kpi_field, source in fields.items()
+    }
+    rows = queryset.annotate(day=TruncDate(date_field)).values('day').annotate(**aggregates)
+    return {row.pop('day'): row for row in rows}
+
+
+def rebuild_kpis(since=None):
+    """
+    Recalcula os indicadores diários (a partir de 'since', ou todos) e os
+    contadores de pendentes. Deve correr com pouca atividade: as escritas
+    feitas durante a reconstrução podem ficar por contar.
+    """
+    sources = [
+        (CustomUser.objects.all(), 'date_joined', {'new_users': None}),
+        (Deposit.objects.all(), 'created_at', {'deposits_count': None, 'deposits_amount': 'amount'}),
+        (Deposit.objects.filter(is_approved=True), 'created_at', {
+            'deposits_approved_count': None, 'deposits_approved_amount': 'amount',
+        }),
+        (Withdrawal.objects.all(), 'created_at', {'withdrawals_count': None, 'withdrawals_amount': 'amount'}),
+        (Withdrawal.objects.filter(status=WITHDRAWAL_APPROVED_STATUS), 'created_at', {
+            'withdrawals_approved_amount': 'amount',
+        }),
+        (UserLevel.objects.all(), 'purchase_date', {
+            'level_purchases': None, 'level_purchases_amount': 'level__deposit_value',
+        }),
+        (Task.objects.all(), 'completed_at', {'tasks_count': None, 'tasks_earnings': 'earnings'}),
+        (TaskArchive.objects.all(), 'completed_at', {'tasks_count': None, 'tasks_earnings': 'earnings'}),
+        (Roulette.objects.all(), 'spin_date', {'roulette_spins': None, 'roulette_prizes': 'prize'}),
+        (RouletteArchive.objects.all(), 'spin_date', {'roulette_spins': None, 'roulette_prizes': 'prize'}),
+        (UserRewardClaim.objects.all(), 'claimed_at', {
+            'reward_claims': None, 'reward_claims_amount': 'reward_code__reward_amount',
+        }),
+    ]
+    start = None
+    if since:
+        start = timezone.make_aware(datetime.combine(since, time.min))
+
+    days = defaultdict(lambda: defaultdict(Decimal))
+    for queryset, date_field, fields in sources:
+        if start:
+            queryset = queryset.filter(**{f'{date_field}__gte': start})
+        for day, values in _daily_totals(queryset, date_field, fields).items():
+            for field, value in values.items():
+                days[day][field] += value or 0
+
+    pending = [
+        (PENDING_DEPOSITS, Deposit.objects.filter(is_approved=False)),
+        (PENDING_WITHDRAWALS, Withdrawal.objects.filter(status=WITHDRAWAL_PENDING_STATUS)),
+    ]
+    with transaction.atomic():
+        stale = DailyKPI.objects.all()
+        if since:
+            stale = stale.filter(day__gte=since)
+        stale.delete()
+        DailyKPI.objects.bulk_create(
+            (DailyKPI(day=day, slot=0, **values) for day, values in days.items()), batch_size=1000,
+        )
+        KPICounter.objects.all().delete()
+        KPICounter.objects.bulk_create(
+            KPICounter(name=name, slot=0, **queryset.aggregate(count=Count('pk'), amount=Sum('amount', default=0)))
+            for name, queryset in pending
+        )
+    return len(days)
@@ -0,0 +1,251 @@
+"""
+Rankings de convidantes e de ganhos, mantidos incrementalmente.
+
+Cada evento soma pontos ao usuário em três períodos de uma vez (o dia, a
+semana ISO e 'all'), com um único UPDATE ... SET score = score + x nas
+linhas que já existem (core/signals.py):
+- cadastro com convite: +1 em 'team_size' para o convidante;
+- primeira compra de nível de um convidado: +1 em 'invested_invitees';
+- tarefa concluída: os ganhos em 'earnings'.
+
+Os primeiros LEADERBOARD_SIZE de um ranking e período vêm do índice
+(board, period, -score): a leitura custa o mesmo com mil ou com milhões de
+usuários, e fica na cache durante LEADERBOARD_CACHE_SECONDS. Os períodos de
+dias e semanas antigos são apagados por purge_leaderboards.
+
+A tabela não guarda uma linha por usuário: trim_periods (também em
+purge_leaderboards) corta cada ranking e período, incluindo 'all', às
+primeiras leaderboard_keep() linhas (LEADERBOARD_SIZE mais
+LEADERBOARD_TRIM_MARGIN). Quem é cortado e volta a pontuar recomeça do zero
+nesse período; para voltar ao topo teria de passar à frente de toda a
+margem, o que com a margem por omissão não acontece na prática.
+rebuild_leaderboards recalcula os valores exatos a partir das tabelas de
+origem e é o recurso se um ranking parecer errado.
+"""
+import heapq
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Min, Q, Sum
+from django.utils import timezone
+
+from .models import CustomUser, LeaderboardScore, Task, TaskArchive, UserLevel
+
+BOARDS = [board for board, _ in LeaderboardScore.BOARD_CHOICES]
+PERIODS = ['day', 'week', 'all']
+PERIOD_LABELS = {'day': 'Hoje', 'week': 'Esta Semana', 'all': 'Sempre'}
+ALL_TIME = 'all'
+# Dias e semanas mantidos por purge_leaderboards
+LEADERBOARD_DAYS_KEPT = 7
+LEADERBOARD_WEEKS_KEPT = 4
+
+
+def leaderboard_size():
+    return getattr(settings, 'LEADERBOARD_SIZE', 10)
+
+
+def leaderboard_keep():
+    """Linhas mantidas por ranking e período."""
+    return leaderboard_size() + getattr(settings, 'LEADERBOARD_TRIM_MARGIN', 1000)
+
+
+def cache_seconds():
+    return getattr(settings, 'LEADERBOARD_CACHE_SECONDS', 60)
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def period_key(period, day):
+    """Chave guardada em LeaderboardScore.period para o período que contém 'day'."""
+    if period == 'day':
+        return f'd{day.isoformat()}'
+    if period == 'week':
+        return f'w{week_start(day).isoformat()}'
+    return ALL_TIME
+
+
+def event_periods(moment):
+    day = timezone.localtime(moment).date()
+    return [period_key(period, day) for period in PERIODS]
+
+
+# --- ESCRITA ---
+
+def add_score(board, user_id, amount, moment=None):
+    """Soma 'amount' ao usuário no ranking, nos três períodos do instante indicado."""
+    if not user_id or not amount:
+        return
+    periods = event_periods(moment or timezone.now())
+    scores = LeaderboardScore.objects.filter(board=board, user_id=user_id, period__in=periods)
+    updated = scores.update(score=F('score') + amount)
+    if updated == len(periods):
+        return
+    # Primeiro evento do dia/semana: cria as linhas em falta e soma de novo nelas
+    existing = set(scores.values_list('period', flat=True)) if updated else set()
+    missing = [period for period in periods if period not in existing]
+    LeaderboardScore.objects.bulk_create(
+        [LeaderboardScore(board=board, user_id=user_id, period=period) for period in missing],
+        ignore_conflicts=True,
+    )
+    LeaderboardScore.objects.filter(board=board, user_id=user_id, period__in=missing).update(
+        score=F('score') + amount,
+    )
+
+
+def user_registered(user):
+    if user.invited_by_id:
+        add_score(LeaderboardScore.BOARD_TEAM_SIZE, user.invited_by_id, 1, user.date_joined)
+
+
+def level_purchased(user_level):
+    """Conta o convidado na primeira compra de nível."""
+    if UserLevel.user.is_cached(user_level):
+        invited_by_id = user_level.user.invited_by_id
+    else:
+        invited_by_id = (
+            CustomUser.objects.filter(pk=user_level.user_id).values_list('invited_by_id', flat=True).first()
+        )
+    if not invited_by_id:
+        return
+    if UserLevel.objects.filter(user_id=user_level.user_id, pk__lt=user_level.pk).exists():
+        return
+    add_score(LeaderboardScore.BOARD_INVESTED_INVITEES, invited_by_id, 1, user_level.purchase_date)
+
+
+def task_completed(task):
+    add_score(LeaderboardScore.BOARD_EARNINGS, task.user_id, task.earnings, task.completed_at)
+
+
+# --- LEITURA ---
+
+def mask_phone(phone_number):
+    """'923456789' -> '923***789'."""
+    if len(phone_number) <= 6:
+        return phone_number[:2] + '***'
+    return f'{phone_number[:3]}***{phone_number[-3:]}'
+
+
+def top_scores(board, period='all', today=None):
+    """Os primeiros LEADERBOARD_SIZE do ranking, guardados na cache por pouco tempo."""
+    key = period_key(period, today or timezone.localdate())
+    cache_key = f'leaderboard:{board}:{key}'
+    entries = cache.get(cache_key)
+    if entries is None:
+        rows = (
+            LeaderboardScore.objects.filter(board=board, period=key, score__gt=0)
+            .order_by('-score', 'user')
+            .values_list('user__phone_number', 'score')[:leaderboard_size()]
+        )
+        entries = [
+            {'position': position, 'user': mask_phone(phone_number), 'score': f'{score:.2f}'}
+            for position, (phone_number, score) in enumerate(rows, start=1)
+        ]
+        cache.set(cache_key, entries, cache_seconds())
+    return entries
+
+
+# --- MANUTENÇÃO ---
+
+def purge_old_periods(today=None):
+    """Apaga os dias e as semanas fora da janela mantida. Devolve as linhas apagadas."""
+    today = today or timezone.localdate()
+    oldest_day = period_key('day', today - timedelta(days=LEADERBOARD_DAYS_KEPT))
+    oldest_week = period_key('week', today - timedelta(weeks=LEADERBOARD_WEEKS_KEPT))
+    # As chaves têm datas ISO: a ordem das strings é a ordem das datas
+    return LeaderboardScore.objects.filter(
+        Q(period__startswith='d', period__lt=oldest_day) | Q(period__startswith='w', period__lt=oldest_week),
+    ).delete()[0]
+
+
+def kept_periods(today):
+    """Chaves de todos os períodos que purge_old_periods ainda não apagou."""
+    days = [period_key('day', today - timedelta(days=offset)) for offset in range(LEADERBOARD_DAYS_KEPT + 1)]
+    weeks = [period_key('week', today - timedelta(weeks=offset)) for offset in range(LEADERBOARD_WEEKS_KEPT + 1)]
+    return [ALL_TIME, *days, *weeks]
+
+
+def trim_periods(today=None):
+    """
+    Apaga, em cada ranking e período, as linhas abaixo das primeiras
+    leaderboard_keep(). Devolve as linhas apagadas.
+    """
+    today = today or timezone.localdate()
+    keep = leaderboard_keep()
+    deleted = 0
+    for board in BOARDS:
+        for period in kept_periods(today):
+            rows = LeaderboardScore.objects.filter(board=board, period=period)
+            # A última linha mantida, lida no índice (board, period, -score, user)
+            boundary = list(rows.order_by('-score', 'user').values_list('score', 'user')[keep - 1:keep])
+            if not boundary:
+                continue
+            [(score, user_id)] = boundary
+            deleted += rows.filter(Q(score__lt=score) | Q(score=score, user__gt=user_id)).delete()[0]
+    return deleted
+
+
+def _local_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def rebuild_leaderboards(today=None):
+    """
+    Recalcula 'all', o dia e a semana atuais a partir das tabelas de origem.
+    Deve correr com pouca atividade: os eventos durante a reconstrução
+    podem ficar por contar.
+    """
+    today = today or timezone.localdate()
+    starts = {'day': _local_start(today), 'week': _local_start(week_start(today)), 'all': None}
+    first_purchases = UserLevel.objects.values('user').annotate(first_id=Min('id')).values('first_id')
+    sources = {
+        LeaderboardScore.BOARD_TEAM_SIZE: [
+            (CustomUser.objects.filter(invited_by__isnull=False), 'invited_by', 'date_joined', Count('pk')),
+        ],
+        LeaderboardScore.BOARD_INVESTED_INVITEES: [
+            (UserLevel.objects.filter(pk__in=first_purchases, user__invited_by__isnull=False),
+             'user__invited_by', 'purchase_date', Count('pk')),
+        ],
+        LeaderboardScore.BOARD_EARNINGS: [
+            (Task.objects.all(), 'user', 'completed_at', Sum('earnings')),
+            (TaskArchive.objects.all(), 'user', 'completed_at', Sum('earnings')),
+        ],
+    }
+
+    scores = defaultdict(Decimal)
+    for board, queries in sources.items():
+        for queryset, user_field, date_field, aggregate in queries:
+            for period, start in starts.items():
+                if start:
+                    queryset_in_period = queryset.filter(**{f'{date_field}__gte': start})
+                else:
+                    queryset_in_period = queryset
+                rows = queryset_in_period.order_by().values(user_field).annotate(total=aggregate)
+                for row in rows:
+                    scores[board, period_key(period, today), row[user_field]] += row['total'] or 0
+
+    # Só as primeiras leaderboard_keep() de cada ranking e período, como em trim_periods
+    entries = defaultdict(list)
+    for (board, period, user_id), score in scores.items():
+        if score:
+            entries[board, period].append((score, user_id))
+    keep = leaderboard_keep()
+
+    periods = [period_key(period, today) for period in PERIODS]
+    with transaction.atomic():
+        LeaderboardScore.objects.filter(period__in=periods).delete()
+        LeaderboardScore.objects.bulk_create(
+            (
+                LeaderboardScore(board=board, period=period, user_id=user_id, score=score)
+                for (board, period), rows in entries.items()
+                for score, user_id in heapq.nlargest(keep, rows, key=lambda row: (row[0], -row[1]))
+            ),
+            batch_size=1000,
+        )
+    cache.delete_many([f'leaderboard:{board}:{period}' for board in BOARDS for period in periods])
+    return len(scores)
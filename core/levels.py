@@ -0,0 +1,95 @@
+"""
+Nível atual de cada usuário, guardado na própria linha do usuário.
+
+CustomUser.current_level aponta para o nível ativo de maior valor (o mais
+recente em caso de empate) e CustomUser.active_level_count conta os níveis
+ativos; level_active continua a indicar se há algum. refresh_current_levels
+recalcula os três numa só instrução UPDATE e é chamado sempre que os níveis
+de um usuário mudam (sinais de UserLevel, expiração dos ciclos, backfill).
+
+As views obtêm o nível a partir de request.user, que já está carregado, e
+do catálogo de níveis guardado em memória no processo, por isso não fazem
+nenhuma consulta. O catálogo confere o carimbo LEVEL_CATALOG no máximo uma
+vez a cada LEVEL_CATALOG_CHECK_SECONDS (uma consulta) e recarrega quando ele
+muda; no processo que altera um nível recarrega logo (forget_catalog).
+"""
+import time
+
+from django.db.models import Count, Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import CustomUser, Level, UserLevel
+from .versions import LEVEL_CATALOG, bump_version, get_versions, user_version_name
+
+BACKFILL_CHUNK_SIZE = 2000
+
+# Os níveis mudam raramente (admin): os outros processos veem a alteração até isto depois
+LEVEL_CATALOG_CHECK_SECONDS = 5
+
+_catalog = {'version': None, 'checked_at': None, 'levels': {}}
+
+
+def forget_catalog():
+    """O próximo level_catalog() deste processo confere o carimbo e recarrega."""
+    _catalog['version'] = _catalog['checked_at'] = None
+
+
+def level_catalog(reload=False):
+    """Níveis por id, em memória enquanto o carimbo LEVEL_CATALOG não mudar."""
+    now = time.monotonic()
+    checked_at = _catalog['checked_at']
+    if not reload and checked_at is not None and now - checked_at < LEVEL_CATALOG_CHECK_SECONDS:
+        return _catalog['levels']
+    version, = get_versions(LEVEL_CATALOG)
+    if reload or _catalog['version'] != version:
+        _catalog['levels'] = {level.pk: level for level in Level.objects.all()}
+        _catalog['version'] = version
+    _catalog['checked_at'] = now
+    return _catalog['levels']
+
+
+def bump_level_catalog():
+    """Para alterações feitas sem sinais (ex.: bulk_create de níveis)."""
+    bump_version(LEVEL_CATALOG)
+    forget_catalog()
+
+
+def current_level(user):
+    """Nível atual do usuário (Level) ou None, sem consultar a base de dados."""
+    level_id = getattr(user, 'current_level_id', None)
+    if level_id is None:
+        return None
+    levels = level_catalog()
+    if level_id not in levels:
+        # Nível criado sem sinais (ex.: bulk_create): recarrega o catálogo
+        levels = level_catalog(reload=True)
+    return levels.get(level_id)
+
+
+def refresh_current_levels(user_ids):
+    """Recalcula current_level, active_level_count e level_active dos usuários indicados."""
+    active = UserLevel.objects.filter(user=OuterRef('pk'), is_active=True)
+    updated = CustomUser.objects.filter(pk__in=user_ids).update(
+        current_level=Subquery(active.order_by('-level__deposit_value', '-purchase_date', '-pk').values('level_id')[:1]),
+        active_level_count=Coalesce(
+            Subquery(active.order_by().values('user').annotate(total=Count('pk')).values('total')), 0,
+        ),
+        level_active=Exists(active),
+    )
+    bump_version(*(user_version_name(user_id) for user_id in user_ids))
+    return updated
+
+
+def backfill_current_levels(chunk_size=BACKFILL_CHUNK_SIZE, progress=None):
+    """Recalcula o nível atual de todos os usuários, por intervalos de id."""
+    last_pk, total = 0, 0
+    while True:
+        user_ids = list(
+            CustomUser.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+        if not user_ids:
+            return total
+        total += refresh_current_levels(user_ids)
+        last_pk = user_ids[-1]
+        if progress:
+            progress(total)
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.archive import ARCHIVE_CHUNK_SIZE, ARCHIVES, archive_after_months, archive_cutoff, archive_history, pending_count
+
+
+class Command(BaseCommand):
+    help = "Move Task e Roulette de meses antigos para o arquivo, em lotes (pode ser interrompido e retomado)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('tables', nargs='*', default=list(ARCHIVES), help=f"Tabelas: {', '.join(ARCHIVES)}.")
+        parser.add_argument('--months', type=int, default=None, help="Meses completos mantidos (por omissão ARCHIVE_AFTER_MONTHS).")
+        parser.add_argument('--chunk-size', type=int, default=ARCHIVE_CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help="Mostra apenas quantas linhas seriam movidas.")
+
+    def handle(self, *args, **options):
+        months = archive_after_months() if options['months'] is None else options['months']
+        self.stdout.write(f'Corte: {archive_cutoff(months=months):%Y-%m-%d} ({months} meses mantidos).')
+
+        for name in options['tables']:
+            if options['dry_run']:
+                self.stdout.write(f'{name}: {pending_count(name, months=months)} linhas por arquivar.')
+                continue
+            started = time.monotonic()
+            moved = archive_history(
+                name, months=months, chunk_size=options['chunk_size'],
+                progress=lambda table, total: self.stdout.write(f'{table}: {total} linhas movidas...'),
+            )
+            self.stdout.write(self.style.SUCCESS(f'{name}: {moved} linhas arquivadas em {time.monotonic() - started:.1f}s.'))
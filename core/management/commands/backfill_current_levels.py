@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.levels import BACKFILL_CHUNK_SIZE, backfill_current_levels
+
+
+class Command(BaseCommand):
+    help = "Preenche o nível atual (current_level, active_level_count, level_active) de todos os usuários."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=BACKFILL_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = backfill_current_levels(
+            chunk_size=options['chunk_size'],
+            progress=lambda total: self.stdout.write(f'{total} usuários atualizados...'),
+        )
+        self.stdout.write(self.style.SUCCESS(f'{total} usuários atualizados em {time.monotonic() - started:.1f}s.'))
@@ -0,0 +1,45 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from core.benchmark import BENCHMARK_HOST, DEFAULT_ENDPOINTS, ENDPOINTS, BenchmarkRunner, format_report
+from core.synthetic import synthetic_users
+
+
+class Command(BaseCommand):
+    help = "Mede latência (p50/p95/p99) e pedidos por segundo das views principais com clientes concorrentes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('endpoints', nargs='*', default=DEFAULT_ENDPOINTS, help=f"Endpoints: {', '.join(ENDPOINTS)}.")
+        parser.add_argument('--concurrency', type=int, default=8, help="Clientes em paralelo.")
+        parser.add_argument('--requests', type=int, default=200, help="Pedidos por endpoint.")
+        parser.add_argument('--users', type=int, default=50, help="Usuários sintéticos usados nas sessões.")
+        parser.add_argument('--json', action='store_true', help="Resultado em JSON.")
+        parser.add_argument('--rate-limits', action='store_true', help="Mantém os limites de pedidos (core/ratelimit.py) ativos.")
+        parser.add_argument('--force', action='store_true', help="Permite correr com DEBUG=False.")
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('DEBUG=False: os endpoints POST alteram saldos; use --force numa cópia da base de dados.')
+        unknown = set(options['endpoints']) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f"Endpoints desconhecidos: {', '.join(sorted(unknown))}.")
+
+        # Usuários com nível ativo e equipas, como os que mais usam a plataforma
+        users = list(synthetic_users().filter(level_active=True).order_by('pk')[:options['users']])
+        if not users:
+            raise CommandError('Não há usuários sintéticos: corra primeiro manage.py generate_data.')
+
+        runner = BenchmarkRunner(users, concurrency=options['concurrency'], requests=options['requests'])
+        # Sem os limites por omissão: mede as views, não as respostas 429
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, BENCHMARK_HOST], RATE_LIMIT_ENABLED=options['rate_limits'],
+        ):
+            summaries = runner.run(options['endpoints'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(summaries, indent=2))
+        else:
+            self.stdout.write(format_report(summaries))
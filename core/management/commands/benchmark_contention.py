@@ -0,0 +1,43 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from core.benchmark import BENCHMARK_HOST
+from core.contention import SCENARIOS, ContentionBenchmark, format_contention_report
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede débito, espera por bloqueios e atualizações perdidas nas views que alteram saldos "
+        "(roleta, prémio diário, compra de nível) com usuários partilhados e separados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*', default=SCENARIOS, help=f"Cenários: {', '.join(SCENARIOS)}.")
+        parser.add_argument('--clients', type=int, default=8, help="Clientes em paralelo.")
+        parser.add_argument('--requests', type=int, default=400, help="Pedidos por cenário.")
+        parser.add_argument('--seed', type=int, default=0, help="Semente da mistura de pedidos.")
+        parser.add_argument('--json', action='store_true', help="Resultado em JSON.")
+        parser.add_argument('--force', action='store_true', help="Permite correr com DEBUG=False.")
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('DEBUG=False: o benchmark cria usuários e liquida comissões; use --force numa cópia da base de dados.')
+        unknown = set(options['scenarios']) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Cenários desconhecidos: {', '.join(sorted(unknown))}.")
+        if connection.vendor != 'postgresql':
+            self.stderr.write(self.style.WARNING('Sem PostgreSQL: a espera por bloqueios não é medida.'))
+
+        runner = ContentionBenchmark(clients=options['clients'], requests=options['requests'], seed=options['seed'])
+        # Sem os limites de pedidos: mede as escritas, não as respostas 429
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, BENCHMARK_HOST], RATE_LIMIT_ENABLED=False):
+            reports = runner.run(options['scenarios'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(reports, indent=2, default=str))
+        else:
+            self.stdout.write(format_contention_report(reports))
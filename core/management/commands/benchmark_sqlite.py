@@ -0,0 +1,39 @@
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmark import SQLiteContentionBenchmark, format_sqlite_report, sqlite_modes
+
+
+class Command(BaseCommand):
+    help = "Compara o SQLite por omissão com o modo afinado (settings.SQLITE_PRAGMAS) sob escritas concorrentes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('modes', nargs='*', default=['default', 'tuned'], help="Modos: default, tuned.")
+        parser.add_argument('--threads', type=int, default=8, help="Ligações em paralelo.")
+        parser.add_argument('--operations', type=int, default=300, help="Operações por ligação.")
+        parser.add_argument('--write-ratio', type=float, default=0.3, help="Fração das operações que escrevem.")
+        parser.add_argument('--path', help="Ficheiro SQLite novo para o teste (por omissão, um ficheiro temporário).")
+        parser.add_argument('--json', action='store_true', help="Resultado em JSON.")
+
+    def handle(self, *args, **options):
+        unknown = set(options['modes']) - set(sqlite_modes())
+        if unknown:
+            raise CommandError(f"Modos desconhecidos: {', '.join(sorted(unknown))}.")
+        # O ficheiro é recriado em cada modo: nunca apontar para uma base de dados real
+        if options['path'] and os.path.exists(options['path']):
+            raise CommandError(f"{options['path']} já existe.")
+
+        with tempfile.TemporaryDirectory() as directory:
+            runner = SQLiteContentionBenchmark(
+                options['path'] or os.path.join(directory, 'benchmark.sqlite3'),
+                threads=options['threads'], operations=options['operations'], write_ratio=options['write_ratio'],
+            )
+            summaries = [runner.run(mode) for mode in options['modes']]
+
+        if options['json']:
+            self.stdout.write(json.dumps(summaries, indent=2))
+        else:
+            self.stdout.write(format_sqlite_report(summaries))
@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.synthetic import GENERATION_CHUNK_SIZE, SyntheticDataGenerator, delete_synthetic
+
+
+class Command(BaseCommand):
+    help = "Gera usuários sintéticos (árvore de convites, níveis, tarefas, roletas, depósitos e saques) para testes de desempenho."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000, help="Usuários a gerar.")
+        parser.add_argument('--chunk-size', type=int, default=GENERATION_CHUNK_SIZE, help="Usuários por transação.")
+        parser.add_argument('--seed', type=int, default=None, help="Semente para gerar sempre os mesmos dados.")
+        parser.add_argument('--delete', action='store_true', help="Apaga os dados sintéticos em vez de gerar.")
+        parser.add_argument('--force', action='store_true', help="Permite correr com DEBUG=False.")
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('DEBUG=False: use --force se esta base de dados não for a de produção.')
+
+        if options['delete']:
+            deleted = delete_synthetic()
+            self.stdout.write(self.style.SUCCESS(f'{deleted} registos sintéticos apagados.'))
+            return
+
+        started = time.monotonic()
+
+        def progress(counts):
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"{counts['users']} usuários ({counts['users'] / elapsed:.0f}/s)...")
+
+        counts = SyntheticDataGenerator(
+            options['users'], chunk_size=options['chunk_size'], seed=options['seed'], progress=progress,
+        ).run()
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f'{total} {name}' for name, total in counts.items())
+            + f' gerados em {time.monotonic() - started:.1f}s.'
+        ))
@@ -0,0 +1,14 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.leaderboards import rebuild_leaderboards
+
+
+class Command(BaseCommand):
+    help = "Recalcula os rankings (sempre, dia e semana atuais) a partir dos convites, compras de nível e tarefas."
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        scores = rebuild_leaderboards()
+        self.stdout.write(self.style.SUCCESS(f'{scores} pontuações recalculadas em {time.monotonic() - started:.1f}s.'))
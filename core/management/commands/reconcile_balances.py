@@ -0,0 +1,49 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from core.reconcile import RECONCILE_CHUNK_SIZE, reconcile_balances
+
+REPORT_COLUMNS = (
+    'user_id', 'phone_number', 'available_balance', 'expected_available', 'available_diff',
+    'subsidy_balance', 'expected_subsidy', 'subsidy_diff',
+)
+
+
+class Command(BaseCommand):
+    help = "Compara os saldos dos usuários com a soma dos movimentos (core/reconcile.py), em paralelo por intervalos de id."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help="Processos em paralelo (por omissão, um por CPU; 1 corre sem processos extra).")
+        parser.add_argument('--chunk-size', type=int, default=RECONCILE_CHUNK_SIZE, help="Ids de usuário por intervalo.")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help="Base de dados lida (ex.: a réplica).")
+        parser.add_argument('--include-staff', action='store_true', help="Inclui as contas de staff.")
+        parser.add_argument('--output', help="Ficheiro CSV com as diferenças (por omissão, a saída do comando).")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        checked, mismatches = reconcile_balances(
+            database=options['database'], workers=options['workers'], chunk_size=options['chunk_size'],
+            include_staff=options['include_staff'],
+            progress=lambda done, total: self.stderr.write(f'{done}/{total} intervalos...') if done % 10 == 0 else None,
+        )
+
+        if options['output']:
+            with open(options['output'], 'w', newline='') as report:
+                self.write_report(report, mismatches)
+        elif mismatches:
+            self.write_report(self.stdout, mismatches)
+
+        summary = f'{checked} usuários verificados em {time.monotonic() - started:.1f}s: {len(mismatches)} com diferenças.'
+        self.stderr.write(self.style.WARNING(summary) if mismatches else self.style.SUCCESS(summary))
+
+    def write_report(self, stream, mismatches):
+        writer = csv.writer(stream)
+        writer.writerow(REPORT_COLUMNS)
+        for mismatch in mismatches:
+            writer.writerow([
+                mismatch.user_id, mismatch.phone_number, mismatch.available_balance, mismatch.expected_available,
+                mismatch.available_diff, mismatch.subsidy_balance, mismatch.expected_subsidy, mismatch.subsidy_diff,
+            ])
@@ -0,0 +1,37 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.jobs import run_pending, worker_id
+
+
+class Command(BaseCommand):
+    help = "Executa o worker da fila de tarefas em segundo plano (e o agendador periódico)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Executa um único lote e termina.")
+        parser.add_argument('--batch', type=int, default=10, help="Tarefas reservadas por lote.")
+        parser.add_argument('--sleep', type=float, default=2.0, help="Segundos de espera quando a fila está vazia.")
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        worker = worker_id()
+        self.stdout.write(f'Worker {worker} iniciado.')
+        while not self.stopping:
+            processed = run_pending(limit=options['batch'], worker=worker)
+            # Evita ligações à base de dados mortas entre lotes
+            close_old_connections()
+            if options['once']:
+                break
+            if not processed:
+                time.sleep(options['sleep'])
+        self.stdout.write(f'Worker {worker} terminado.')
+
+    def stop(self, signum, frame):
+        # Termina depois do lote atual
+        self.stopping = True
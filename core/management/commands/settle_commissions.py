@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.commissions import COMMISSION_BATCH_SIZE, settle_commissions
+
+
+class Command(BaseCommand):
+    help = "Liquida as comissões de convite pendentes (normalmente feito pela fila de tarefas)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=COMMISSION_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = 0
+        while True:
+            processed = settle_commissions(batch_size=options['batch_size'])
+            total += processed
+            if processed:
+                self.stdout.write(f'{total} compras processadas...')
+            if processed < options['batch_size']:
+                break
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} compras liquidadas em {time.monotonic() - started:.1f}s.'
+        ))
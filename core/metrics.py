@@ -0,0 +1,256 @@
+"""
+Métricas por view (latência, consultas SQL, tempo de base de dados, tamanho
+das respostas e pedidos em curso) no formato de texto do Prometheus.
+
+Cada processo (worker do gunicorn) acumula as métricas em memória e grava-as
+periodicamente num ficheiro próprio em METRICS_DIR; o endpoint /metrics soma
+os ficheiros de todos os processos. Os contadores e histogramas de workers
+já terminados continuam a contar: cada processo, ao arrancar, junta os
+ficheiros deles em RETIRED_FILE. Os indicadores instantâneos (pedidos em
+curso, ligações abertas) só contam para processos vivos.
+"""
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+METRICS_DIR = getattr(settings, 'METRICS_DIR', os.path.join(tempfile.gettempdir(), 'ddb-metrics'))
+METRICS_FLUSH_INTERVAL = getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0)  # segundos
+# Contadores e histogramas acumulados dos workers terminados
+RETIRED_FILE = 'retired.json'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (1_000, 5_000, 10_000, 50_000, 100_000, 500_000, 1_000_000)
+
+# nome -> (tipo, descrição, buckets)
+METRICS = {
+    'ddb_http_requests_total': ('counter', 'Pedidos HTTP por view, método e status.', None),
+    'ddb_http_request_duration_seconds': ('histogram', 'Latência dos pedidos por view.', LATENCY_BUCKETS),
+    'ddb_http_response_size_bytes': ('histogram', 'Tamanho das respostas por view.', SIZE_BUCKETS),
+    'ddb_db_queries_per_request': ('histogram', 'Consultas SQL por pedido, por view.', QUERY_COUNT_BUCKETS),
+    'ddb_db_query_duration_seconds_total': ('counter', 'Tempo total gasto em SQL, por view.', None),
+    'ddb_db_connections_opened_total': ('counter', 'Ligações à base de dados abertas.', None),
+    'ddb_rate_limited_total': ('counter', 'Pedidos recusados pelos limites (core/ratelimit.py), por view e motivo.', None),
+    'ddb_replica_requests_total': ('counter', 'Pedidos lidos da réplica (core/routers.py), por view.', None),
+    'ddb_http_requests_in_flight': ('gauge', 'Pedidos em curso.', None),
+    'ddb_db_connections_open': ('gauge', 'Ligações à base de dados abertas neste momento.', None),
+}
+
+
+class ProcessMetrics:
+    """Métricas do processo atual; gravadas em METRICS_DIR/<pid>.json."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.in_flight = 0
+        self.last_flush = 0.0
+
+    def inc(self, name, labels, value=1):
+        with self.lock:
+            self.counters[(name, labels)] += value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        with self.lock:
+            histogram = self.histograms.get((name, labels))
+            if histogram is None:
+                # contagens por bucket (não cumulativas), +Inf, soma
+                histogram = self.histograms[(name, labels)] = [0] * (len(buckets) + 1) + [0.0]
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram[index] += 1
+                    break
+            else:
+                histogram[len(buckets)] += 1
+            histogram[-1] += value
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'pid': os.getpid(),
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), values] for (name, labels), values in self.histograms.items()],
+                'gauges': [
+                    ['ddb_http_requests_in_flight', [], self.in_flight],
+                    ['ddb_db_connections_open', [], open_connections()],
+                ],
+            }
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_flush < METRICS_FLUSH_INTERVAL:
+            return
+        self.last_flush = now
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        _write_atomic(os.path.join(METRICS_DIR, f'{os.getpid()}.json'), self.snapshot())
+
+
+def _write_atomic(path, data):
+    # Escrita atómica: o leitor nunca vê um ficheiro a meio
+    with tempfile.NamedTemporaryFile('w', dir=METRICS_DIR, delete=False, suffix='.tmp') as tmp:
+        json.dump(data, tmp)
+    os.replace(tmp.name, path)
+
+
+process_metrics = ProcessMetrics()
+
+
+def open_connections():
+    return sum(1 for conn in connections.all(initialized_only=True) if conn.connection is not None)
+
+
+def _count_new_connection(sender, connection, **kwargs):
+    process_metrics.inc('ddb_db_connections_opened_total', (('alias', connection.alias),))
+
+
+connection_created.connect(_count_new_connection)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merge(counters, histograms, data):
+    for name, labels, value in data['counters']:
+        counters[(name, tuple(map(tuple, labels)))] += value
+    for name, labels, values in data['histograms']:
+        key = (name, tuple(map(tuple, labels)))
+        if key in histograms:
+            histograms[key] = [a + b for a, b in zip(histograms[key], values)]
+        else:
+            histograms[key] = list(values)
+
+
+def _read(path):
+    try:
+        with open(path) as metrics_file:
+            return json.load(metrics_file)
+    except (OSError, ValueError):
+        return None
+
+
+@contextmanager
+def _directory_lock(exclusive):
+    """Exclusivo ao juntar ficheiros de workers terminados, partilhado ao ler."""
+    with open(os.path.join(METRICS_DIR, '.lock'), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def absorb_dead_process_files():
+    """
+    Chamado no arranque de cada processo: junta os contadores e histogramas
+    dos workers terminados em RETIRED_FILE e apaga os ficheiros deles, para
+    que os totais do /metrics nunca desçam (o Prometheus leria a descida
+    como um reinício do contador). Os indicadores instantâneos são descartados.
+    """
+    if not os.path.isdir(METRICS_DIR):
+        return
+    with _directory_lock(exclusive=True):
+        dead = []
+        for filename in os.listdir(METRICS_DIR):
+            stem, ext = os.path.splitext(filename)
+            if ext == '.json' and stem.isdigit() and not _pid_alive(int(stem)):
+                dead.append(os.path.join(METRICS_DIR, filename))
+        if not dead:
+            return
+
+        retired_path = os.path.join(METRICS_DIR, RETIRED_FILE)
+        counters = defaultdict(float)
+        histograms = {}
+        for path in [retired_path, *dead]:
+            data = _read(path)
+            if data:
+                _merge(counters, histograms, data)
+        _write_atomic(retired_path, {
+            'pid': None,
+            'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+            'histograms': [[name, list(labels), values] for (name, labels), values in histograms.items()],
+            'gauges': [],
+        })
+        for path in dead:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def collect():
+    """Soma os ficheiros de todos os processos (e os totais dos terminados)."""
+    process_metrics.flush(force=True)
+    counters = defaultdict(float)
+    histograms = {}
+    gauges = defaultdict(float)
+    with _directory_lock(exclusive=False):
+        for filename in os.listdir(METRICS_DIR):
+            if not filename.endswith('.json'):
+                continue
+            data = _read(os.path.join(METRICS_DIR, filename))
+            if data is None:
+                continue
+            _merge(counters, histograms, data)
+            if data['pid'] and _pid_alive(data['pid']):
+                for name, labels, value in data['gauges']:
+                    gauges[(name, tuple(map(tuple, labels)))] += value
+    return counters, histograms, gauges
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_prometheus():
+    counters, histograms, gauges = collect()
+    lines = []
+    for name, (kind, description, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'histogram':
+            for (metric, labels), values in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets, values):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {_format_number(cumulative)}')
+                cumulative += values[len(buckets)]
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {_format_number(cumulative)}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_number(values[-1])}')
+                lines.append(f'{name}_count{_format_labels(labels)} {_format_number(cumulative)}')
+        else:
+            source = counters if kind == 'counter' else gauges
+            for (metric, labels), value in sorted(source.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_number(value)}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,175 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+from . import profiler, ratelimit, routers
+from .metrics import process_metrics, absorb_dead_process_files
+
+
+class QueryStats:
+    """execute_wrapper que conta as consultas SQL e o tempo gasto nelas."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """
+    Regista latência, consultas SQL, tempo de SQL, tamanho da resposta e
+    pedidos em curso por nome de URL (ver core/metrics.py).
+    Deve ser o primeiro middleware para medir o pedido completo.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        absorb_dead_process_files()
+
+    def __call__(self, request):
+        stats = QueryStats()
+        with process_metrics.lock:
+            process_metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            with process_metrics.lock:
+                process_metrics.in_flight -= 1
+        duration = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unmatched'
+        labels = (('view', view),)
+        process_metrics.inc('ddb_http_requests_total', labels + (('method', request.method), ('status', response.status_code)))
+        process_metrics.observe('ddb_http_request_duration_seconds', labels, duration)
+        process_metrics.observe('ddb_db_queries_per_request', labels, stats.count)
+        process_metrics.inc('ddb_db_query_duration_seconds_total', labels, stats.duration)
+        if not response.streaming:
+            process_metrics.observe('ddb_http_response_size_bytes', labels, len(response.content))
+        process_metrics.flush()
+        return response
+
+
+class ProfilerMiddleware:
+    """
+    Perfil de um pedido a pedido de um membro do staff (ver core/profiler.py).
+    Sem o cabeçalho X-Profile nem o cookie de perfil, o custo é o de duas
+    procuras em dicionário. Deve vir depois do AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiler.is_requested(request) or not request.user.is_staff:
+            return self.get_response(request)
+        return profiler.profile_request(request, self.get_response)
+
+
+class RateLimitMiddleware:
+    """
+    Limites e concorrência das rotas em RATE_LIMITS (ver core/ratelimit.py).
+    Deve vir antes do SessionMiddleware: os pedidos recusados pelo limite
+    por IP ou de concorrência não tocam na base de dados. O limite por
+    usuário corre em process_view, com request.user já autenticado.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return self.get_response(request)
+        policy = ratelimit.get_policy(match.url_name, request.method)
+        if policy is None:
+            return self.get_response(request)
+        # Para as métricas identificarem a view também nos pedidos recusados
+        request.resolver_match = match
+        request._rate_limit_policy = policy
+
+        key = f'ratelimit:{match.url_name}:ip:{ratelimit.client_ip(request)}'
+        wait = ratelimit.count_request(key, *ratelimit.ip_limits(policy))
+        if wait:
+            return self.reject(request, match, 'rate', 429, wait)
+
+        limit = policy.get('concurrency')
+        if not limit:
+            return self.get_response(request)
+        slot = ratelimit.acquire_slot(match.url_name, limit)
+        if slot is None:
+            return self.reject(request, match, 'concurrency', 503, 1)
+        try:
+            return self.get_response(request)
+        finally:
+            ratelimit.release_slot(slot)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        policy = getattr(request, '_rate_limit_policy', None)
+        if not policy or policy.get('key', 'user') != 'user' or not request.user.is_authenticated:
+            return None
+        match = request.resolver_match
+        key = f'ratelimit:{match.url_name}:user:{request.user.pk}'
+        wait = ratelimit.count_request(key, *ratelimit.user_limits(policy))
+        if wait:
+            return self.reject(request, match, 'rate', 429, wait)
+        return None
+
+    @staticmethod
+    def reject(request, match, reason, status, retry_after):
+        process_metrics.inc('ddb_rate_limited_total', (('view', match.view_name), ('reason', reason)))
+        return ratelimit.rejection(request, status, retry_after)
+
+
+class ReplicaMiddleware:
+    """
+    Liga as leituras à réplica nas views de DATABASE_REPLICA_VIEWS e marca
+    com um cookie os clientes que acabaram de escrever, que leem do primário
+    durante REPLICA_STICKY_SECONDS (ver core/routers.py). Deve vir antes do
+    SessionMiddleware para a sessão e o usuário seguirem a mesma regra.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not routers.replica_alias():
+            return self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            try:
+                match = resolve(request.path_info)
+            except Resolver404:
+                match = None
+        cookie = settings.REPLICA_STICKY_COOKIE
+        use_replica = bool(
+            match and cookie not in request.COOKIES and routers.is_replica_view(match.view_name, request.method)
+        )
+        token = routers.begin(use_replica)
+        try:
+            response = self.get_response(request)
+            if routers.reading_from_replica():
+                process_metrics.inc('ddb_replica_requests_total', (('view', match.view_name),))
+        finally:
+            wrote = routers.end(token)
+        if wrote:
+            response.set_cookie(
+                cookie, '1', max_age=routers.sticky_seconds(), httponly=True, samesite='Lax',
+                secure=settings.SESSION_COOKIE_SECURE,
+            )
+        return response
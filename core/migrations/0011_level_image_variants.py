@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_platformsettings_telegram_link'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='level',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Variantes da Imagem'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_level_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deposit',
+            name='proof_staged_name',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='Comprovativo em Envio'),
+        ),
+        migrations.AddField(
+            model_name='deposit',
+            name='proof_thumbnail',
+            field=models.ImageField(blank=True, editable=False, upload_to='deposit_proofs/thumbs/', verbose_name='Miniatura do Comprovativo'),
+        ),
+        migrations.AlterField(
+            model_name='deposit',
+            name='proof_of_payment',
+            field=models.ImageField(blank=True, upload_to='deposit_proofs/', verbose_name='Comprovativo'),
+        ),
+    ]
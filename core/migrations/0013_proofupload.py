@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:28
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_deposit_proof_processing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProofUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Valor')),
+                ('total_size', models.PositiveIntegerField(verbose_name='Tamanho Total (bytes)')),
+                ('received_size', models.PositiveIntegerField(default=0, verbose_name='Recebido (bytes)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Data de Criação')),
+                ('deposit', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.deposit', verbose_name='Depósito')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Envio de Comprovativo',
+                'verbose_name_plural': 'Envios de Comprovativos',
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_proofupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Tarefa')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='Argumentos')),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('running', 'Em Execução'), ('done', 'Concluída'), ('failed', 'Falhou')], default='pending', max_length=10, verbose_name='Status')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Executar em')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Tentativas')),
+                ('max_attempts', models.PositiveIntegerField(default=5, verbose_name='Máximo de Tentativas')),
+                ('unique_key', models.CharField(blank=True, max_length=255, null=True, unique=True, verbose_name='Chave Única')),
+                ('locked_by', models.CharField(blank=True, default='', max_length=100, verbose_name='Worker')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='Bloqueada em')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Último Erro')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Data de Criação')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Concluída em')),
+            ],
+            options={
+                'verbose_name': 'Tarefa em Segundo Plano',
+                'verbose_name_plural': 'Tarefas em Segundo Plano',
+                'indexes': [models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx')],
+            },
+        ),
+    ]
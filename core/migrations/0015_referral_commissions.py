@@ -0,0 +1,53 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def start_watermark_after_existing_purchases(apps, schema_editor):
+    # As compras anteriores já foram pagas pela lógica antiga da view 'nivel'
+    UserLevel = apps.get_model('core', 'UserLevel')
+    SettlementWatermark = apps.get_model('core', 'SettlementWatermark')
+    last = UserLevel.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    SettlementWatermark.objects.update_or_create(name='referral_commissions', defaults={'last_id': last})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SettlementWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Processo')),
+                ('last_id', models.BigIntegerField(default=0, verbose_name='Último ID Processado')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Marca de Processamento',
+                'verbose_name_plural': 'Marcas de Processamento',
+            },
+        ),
+        migrations.CreateModel(
+            name='ReferralCommission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tier', models.PositiveSmallIntegerField(verbose_name='Geração')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Valor')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Data de Pagamento')),
+                ('beneficiary', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='referral_commissions', to=settings.AUTH_USER_MODEL, verbose_name='Beneficiário')),
+                ('user_level', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.userlevel', verbose_name='Compra de Nível')),
+            ],
+            options={
+                'verbose_name': 'Comissão de Convite',
+                'verbose_name_plural': 'Comissões de Convite',
+                'constraints': [models.UniqueConstraint(fields=('user_level', 'tier'), name='unique_commission_per_purchase_tier')],
+            },
+        ),
+        migrations.RunPython(start_watermark_after_existing_purchases, migrations.RunPython.noop),
+    ]
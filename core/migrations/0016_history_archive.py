@@ -0,0 +1,109 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Tabela de arquivo -> coluna de data usada para as partições mensais
+ARCHIVE_TABLES = [
+    ('core_taskarchive', 'completed_at'),
+    ('core_roulettearchive', 'spin_date'),
+]
+
+
+def partition_archives_on_postgresql(apps, schema_editor):
+    """
+    No PostgreSQL, recria as tabelas de arquivo (ainda vazias) particionadas
+    por mês. As partições mensais são criadas por core/archive.py antes de
+    cada movimentação; a partição DEFAULT apanha qualquer outra data.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column in ARCHIVE_TABLES:
+        schema_editor.execute(f'ALTER TABLE {table} RENAME TO {table}_unpartitioned')
+        schema_editor.execute(
+            f'CREATE TABLE {table} (LIKE {table}_unpartitioned INCLUDING DEFAULTS) PARTITION BY RANGE ({column})'
+        )
+        # A chave primária de uma tabela particionada tem de incluir a coluna da partição
+        schema_editor.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id, {column})')
+        schema_editor.execute(f'CREATE INDEX {table}_user_date_idx ON {table} (user_id, {column})')
+        schema_editor.execute(
+            f'ALTER TABLE {table} ADD CONSTRAINT {table}_user_id_fk FOREIGN KEY (user_id) '
+            f'REFERENCES core_customuser (id) DEFERRABLE INITIALLY DEFERRED'
+        )
+        schema_editor.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+        schema_editor.execute(f'DROP TABLE {table}_unpartitioned')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_referral_commissions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RouletteArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('prize', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Prêmio')),
+                ('spin_date', models.DateTimeField(verbose_name='Data da Rodada')),
+                ('is_approved', models.BooleanField(default=False, verbose_name='Aprovado')),
+            ],
+            options={
+                'verbose_name': 'Roleta Arquivada',
+                'verbose_name_plural': 'Roletas Arquivadas',
+            },
+        ),
+        migrations.CreateModel(
+            name='TaskArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('earnings', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Ganhos')),
+                ('completed_at', models.DateTimeField(verbose_name='Data de Conclusão')),
+            ],
+            options={
+                'verbose_name': 'Tarefa Arquivada',
+                'verbose_name_plural': 'Tarefas Arquivadas',
+            },
+        ),
+        migrations.CreateModel(
+            name='UserMonthlyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Mês')),
+                ('task_count', models.PositiveIntegerField(default=0, verbose_name='Tarefas')),
+                ('task_earnings', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Ganhos das Tarefas')),
+                ('roulette_count', models.PositiveIntegerField(default=0, verbose_name='Rodadas da Roleta')),
+                ('roulette_prizes', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Prêmios da Roleta')),
+            ],
+            options={
+                'verbose_name': 'Atividade Mensal Arquivada',
+                'verbose_name_plural': 'Atividade Mensal Arquivada',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'completed_at'], name='task_user_completed_idx'),
+        ),
+        migrations.AddField(
+            model_name='roulettearchive',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuário'),
+        ),
+        migrations.AddField(
+            model_name='taskarchive',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuário'),
+        ),
+        migrations.AddField(
+            model_name='usermonthlyactivity',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_activity', to=settings.AUTH_USER_MODEL, verbose_name='Usuário'),
+        ),
+        migrations.AddConstraint(
+            model_name='usermonthlyactivity',
+            constraint=models.UniqueConstraint(fields=('user', 'month'), name='unique_monthly_activity_per_user'),
+        ),
+        migrations.RunPython(partition_archives_on_postgresql, migrations.RunPython.noop),
+    ]
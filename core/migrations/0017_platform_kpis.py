@@ -0,0 +1,57 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_history_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyKPI',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Dia')),
+                ('slot', models.PositiveSmallIntegerField(default=0, verbose_name='Fração')),
+                ('new_users', models.IntegerField(default=0, verbose_name='Novos Usuários')),
+                ('deposits_count', models.IntegerField(default=0, verbose_name='Depósitos')),
+                ('deposits_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Valor Depositado')),
+                ('deposits_approved_count', models.IntegerField(default=0, verbose_name='Depósitos Aprovados')),
+                ('deposits_approved_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Valor Aprovado')),
+                ('withdrawals_count', models.IntegerField(default=0, verbose_name='Saques')),
+                ('withdrawals_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Valor de Saques')),
+                ('withdrawals_approved_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Valor de Saques Aprovados')),
+                ('level_purchases', models.IntegerField(default=0, verbose_name='Compras de Nível')),
+                ('level_purchases_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Valor das Compras de Nível')),
+                ('tasks_count', models.IntegerField(default=0, verbose_name='Tarefas')),
+                ('tasks_earnings', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Ganhos das Tarefas')),
+                ('roulette_spins', models.IntegerField(default=0, verbose_name='Rodadas da Roleta')),
+                ('roulette_prizes', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Prêmios da Roleta')),
+                ('reward_claims', models.IntegerField(default=0, verbose_name='Resgates de Subsídio')),
+                ('reward_claims_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Valor dos Resgates')),
+            ],
+            options={
+                'verbose_name': 'Indicador Diário',
+                'verbose_name_plural': 'Indicadores Diários',
+                'constraints': [models.UniqueConstraint(fields=('day', 'slot'), name='unique_daily_kpi_slot')],
+            },
+        ),
+        migrations.CreateModel(
+            name='KPICounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, verbose_name='Contador')),
+                ('slot', models.PositiveSmallIntegerField(default=0, verbose_name='Fração')),
+                ('count', models.IntegerField(default=0, verbose_name='Quantidade')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Valor')),
+            ],
+            options={
+                'verbose_name': 'Contador da Plataforma',
+                'verbose_name_plural': 'Contadores da Plataforma',
+                'constraints': [models.UniqueConstraint(fields=('name', 'slot'), name='unique_kpi_counter_slot')],
+            },
+        ),
+    ]
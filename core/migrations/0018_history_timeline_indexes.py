@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_platform_kpis'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='deposit',
+            index=models.Index(fields=['user', 'created_at'], name='deposit_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='roulette',
+            index=models.Index(fields=['user', 'spin_date'], name='roulette_user_spin_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='roulettearchive',
+            index=models.Index(fields=['user', 'spin_date'], name='roulettearchive_user_spin_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskarchive',
+            index=models.Index(fields=['user', 'completed_at'], name='taskarchive_user_done_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userrewardclaim',
+            index=models.Index(fields=['user', 'claimed_at'], name='claim_user_claimed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='withdrawal',
+            index=models.Index(fields=['user', 'created_at'], name='withdrawal_user_created_idx'),
+        ),
+    ]
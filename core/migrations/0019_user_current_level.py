@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_history_timeline_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='active_level_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Níveis Ativos'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='current_level',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.level', verbose_name='Nível Atual'),
+        ),
+    ]
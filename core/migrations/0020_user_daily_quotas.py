@@ -0,0 +1,56 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:15
+
+from datetime import date
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_today_quotas(apps, schema_editor):
+    """Preenche as quotas de hoje a partir das tarefas, resgates e saques já feitos."""
+    CustomUser = apps.get_model('core', 'CustomUser')
+    Task = apps.get_model('core', 'Task')
+    UserRewardClaim = apps.get_model('core', 'UserRewardClaim')
+    Withdrawal = apps.get_model('core', 'Withdrawal')
+    today = date.today()
+
+    task_counts = Task.objects.filter(completed_at__date=today).values('user_id').annotate(total=Count('pk'))
+    for row in task_counts:
+        CustomUser.objects.filter(pk=row['user_id']).update(last_task_date=today, tasks_today=row['total'])
+    CustomUser.objects.filter(
+        pk__in=UserRewardClaim.objects.filter(claim_date=today).values('user_id'),
+    ).update(last_claim_date=today)
+    CustomUser.objects.filter(
+        pk__in=Withdrawal.objects.filter(created_at__date=today).values('user_id'),
+    ).update(last_withdrawal_date=today)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_user_current_level'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='last_claim_date',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Último Resgate'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='last_task_date',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Última Tarefa'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='last_withdrawal_date',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Último Saque'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='tasks_today',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Tarefas no Dia'),
+        ),
+        migrations.RunPython(fill_today_quotas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:31
+
+import re
+
+from django.db import migrations
+
+# Cópia congelada de core/phones.py e das definições PHONE_* no momento
+# desta migração: mudanças posteriores não alteram o que ela faz.
+COUNTRY_CODE = '244'
+NATIONAL_LENGTH = 9
+PHONE_SEPARATORS = re.compile(r'[\s\-.()/]')
+
+
+def normalize_phone(value):
+    value = (value or '').strip()
+    digits = PHONE_SEPARATORS.sub('', value)
+    international = digits.startswith(('+', '00'))
+    digits = digits[1:] if digits.startswith('+') else digits[2:] if digits.startswith('00') else digits
+    if not digits.isdigit():
+        return value
+    if digits.startswith(COUNTRY_CODE) and (international or len(digits) == len(COUNTRY_CODE) + NATIONAL_LENGTH):
+        digits = digits[len(COUNTRY_CODE):]
+    return digits
+
+
+def normalize_phone_numbers(apps, schema_editor):
+    """
+    Normaliza os números guardados com separadores ou com o indicativo do país.
+    Um número cuja forma normalizada já pertence a outro usuário fica como
+    está (a resolver à mão no admin).
+    """
+    CustomUser = apps.get_model('core', 'CustomUser')
+    pattern = rf'[^0-9]|^{COUNTRY_CODE}[0-9]{{{NATIONAL_LENGTH}}}$'
+    candidates = CustomUser.objects.filter(phone_number__regex=pattern).values_list('pk', 'phone_number')
+    for pk, phone_number in candidates.iterator():
+        normalized = normalize_phone(phone_number)
+        if normalized != phone_number and not CustomUser.objects.filter(phone_number=normalized).exists():
+            CustomUser.objects.filter(pk=pk).update(phone_number=normalized)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0020_user_daily_quotas'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_phone_numbers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:35
+
+from django.conf import settings
+from django.db import migrations
+
+INDEX_NAME = 'core_user_phone_trgm_idx'
+
+
+def create_trigram_index(apps, schema_editor):
+    """Índice de trigramas para a pesquisa por qualquer parte do telefone (só PostgreSQL)."""
+    if schema_editor.connection.vendor != 'postgresql' or not getattr(settings, 'PHONE_TRIGRAM_INDEX', True):
+        return
+    table = apps.get_model('core', 'CustomUser')._meta.db_table
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # CONCURRENTLY: não bloqueia as escritas na tabela de usuários enquanto o índice é criado
+    schema_editor.execute(
+        f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME} ON {table} USING gin (phone_number gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY não pode correr numa transação
+    atomic = False
+
+    dependencies = [
+        ('core', '0021_normalized_phone_numbers'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_phone_trigram_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.CharField(choices=[('team_size', 'Convidados'), ('invested_invitees', 'Convidados com Nível'), ('earnings', 'Ganhos das Tarefas')], max_length=30, verbose_name='Ranking')),
+                ('period', models.CharField(max_length=12, verbose_name='Período')),
+                ('score', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Pontuação')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Pontuação de Ranking',
+                'verbose_name_plural': 'Pontuações de Ranking',
+                'indexes': [models.Index(fields=['board', 'period', '-score', 'user'], name='leaderboard_top_idx')],
+                'constraints': [models.UniqueConstraint(fields=('board', 'period', 'user'), name='unique_leaderboard_score')],
+            },
+        ),
+    ]
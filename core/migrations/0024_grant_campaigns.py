@@ -0,0 +1,80 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0023_leaderboards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CampaignGrant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Data')),
+            ],
+            options={
+                'verbose_name': 'Oferta de Campanha',
+                'verbose_name_plural': 'Ofertas de Campanhas',
+            },
+        ),
+        migrations.CreateModel(
+            name='GrantCampaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Nome')),
+                ('grant_type', models.CharField(choices=[('spins', 'Giros da Roleta'), ('bonus', 'Bónus no Saldo Disponível')], default='spins', max_length=10, verbose_name='Oferta')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Quantidade')),
+                ('joined_from', models.DateField(blank=True, null=True, verbose_name='Cadastro a partir de')),
+                ('joined_until', models.DateField(blank=True, null=True, verbose_name='Cadastro até')),
+                ('min_team_size', models.PositiveIntegerField(blank=True, null=True, verbose_name='Convidados (mínimo)')),
+                ('min_deposit_total', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='Depósitos Aprovados (mínimo)')),
+                ('deposits_from', models.DateField(blank=True, null=True, verbose_name='Depósitos a partir de')),
+                ('status', models.CharField(choices=[('draft', 'Rascunho'), ('running', 'Em Execução'), ('paused', 'Pausada'), ('done', 'Concluída')], default='draft', max_length=10, verbose_name='Status')),
+                ('target_count', models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Usuários no Segmento')),
+                ('granted_count', models.PositiveIntegerField(default=0, editable=False, verbose_name='Usuários Contemplados')),
+                ('max_user_id', models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='Último Usuário Abrangido')),
+                ('last_user_id', models.BigIntegerField(default=0, editable=False, verbose_name='Último Usuário Processado')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Data de Criação')),
+                ('started_at', models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Iniciada em')),
+                ('finished_at', models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Concluída em')),
+            ],
+            options={
+                'verbose_name': 'Campanha de Ofertas',
+                'verbose_name_plural': 'Campanhas de Ofertas',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['date_joined'], name='core_user_joined_idx'),
+        ),
+        migrations.AddField(
+            model_name='campaigngrant',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuário'),
+        ),
+        migrations.AddField(
+            model_name='grantcampaign',
+            name='level',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.level', verbose_name='Nível Atual'),
+        ),
+        migrations.AddField(
+            model_name='campaigngrant',
+            name='campaign',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='grants', to='core.grantcampaign', verbose_name='Campanha'),
+        ),
+        migrations.AddIndex(
+            model_name='campaigngrant',
+            index=models.Index(fields=['user', 'campaign'], name='campaign_grant_user_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='campaigngrant',
+            constraint=models.UniqueConstraint(fields=('campaign', 'user'), name='unique_campaign_grant'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_grant_campaigns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='last_read_announcement_id',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Último Aviso Lido'),
+        ),
+        migrations.CreateModel(
+            name='Announcement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=120, verbose_name='Título')),
+                ('message', models.TextField(verbose_name='Mensagem')),
+                ('audience', models.CharField(choices=[('all', 'Todos os Usuários'), ('invested', 'Usuários com Nível Ativo'), ('not_invested', 'Usuários sem Nível Ativo')], default='all', max_length=15, verbose_name='Público')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Ativo')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Data de Publicação')),
+            ],
+            options={
+                'verbose_name': 'Aviso',
+                'verbose_name_plural': 'Avisos',
+                'indexes': [models.Index(condition=models.Q(('is_active', True)), fields=['audience', 'id'], name='announcement_audience_idx')],
+            },
+        ),
+    ]
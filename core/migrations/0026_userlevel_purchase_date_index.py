@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_announcements'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userlevel',
+            index=models.Index(fields=['purchase_date'], name='userlevel_purchase_date_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_userlevel_purchase_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionStamp',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='Conjunto de Dados')),
+                ('stamp', models.BigIntegerField(verbose_name='Carimbo (ns)')),
+            ],
+            options={
+                'verbose_name': 'Carimbo de Versão',
+                'verbose_name_plural': 'Carimbos de Versão',
+            },
+        ),
+    ]
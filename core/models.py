@@ -2,9 +2,17 @@ from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.utils import timezone
 from datetime import date
+import logging
 import uuid
 import os
 from django.db.models import Q # Adicionado para a UniqueConstraint
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+
+from .images import LEVEL_IMAGE_WIDTHS, UNREADABLE_IMAGE_ERRORS, save_variants
+from .phones import normalize_phone
+
+logger = logging.getLogger(__name__)
 
 # ---
 
@@ -12,7 +20,7 @@ class CustomUserManager(BaseUserManager):
     def create_user(self, phone_number, password=None, **extra_fields):
         if not phone_number:
             raise ValueError('O número de telefone deve ser fornecido')
-        user = self.model(phone_number=phone_number, **extra_fields)
+        user = self.model(phone_number=self.model.normalize_username(phone_number), **extra_fields)
         user.set_password(password)
         user.save(using=self._db)
         return user
@@ -23,6 +31,10 @@ class CustomUserManager(BaseUserManager):
         extra_fields.setdefault('is_active', True)
         return self.create_user(phone_number, password, **extra_fields)
 
+    def get_by_natural_key(self, phone_number):
+        # O login aceita o número em qualquer formato (core/phones.py)
+        return super().get_by_natural_key(self.model.normalize_username(phone_number))
+
 # ---
 
 class CustomUser(AbstractBaseUser, PermissionsMixin):
@@ -36,7 +48,20 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     available_balance = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, verbose_name="Saldo Disponível")
     subsidy_balance = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, verbose_name="Saldo de Subsídios")
     level_active = models.BooleanField(default=False, verbose_name="Nível Ativo")
+    # Mantidos por core/levels.py: o nível ativo de maior valor e o número de níveis ativos
+    current_level = models.ForeignKey(
+        'Level', on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='+',
+        verbose_name="Nível Atual",
+    )
+    active_level_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Níveis Ativos")
+    # Limites diários (core/quotas.py): data da última ação de cada tipo
+    last_task_date = models.DateField(null=True, blank=True, editable=False, verbose_name="Última Tarefa")
+    tasks_today = models.PositiveSmallIntegerField(default=0, editable=False, verbose_name="Tarefas no Dia")
+    last_claim_date = models.DateField(null=True, blank=True, editable=False, verbose_name="Último Resgate")
+    last_withdrawal_date = models.DateField(null=True, blank=True, editable=False, verbose_name="Último Saque")
     roulette_spins = models.IntegerField(default=0, verbose_name="Giros da Roleta")
+    # Avisos (core/announcements.py): os de id maior estão por ler
+    last_read_announcement_id = models.BigIntegerField(default=0, editable=False, verbose_name="Último Aviso Lido")
     
     # 🌟 CAMPO ADICIONADO PARA CORRIGIR O AttributeError 
     first_level_invested_paid_to_inviter = models.BooleanField(
@@ -49,10 +74,21 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
 
     objects = CustomUserManager()
 
+    class Meta:
+        indexes = [
+            # Segmentos das campanhas por data de cadastro (core/campaigns.py)
+            models.Index(fields=['date_joined'], name='core_user_joined_idx'),
+        ]
+
     def __str__(self):
         return self.phone_number
 
+    @classmethod
+    def normalize_username(cls, username):
+        return normalize_phone(username)
+
     def save(self, *args, **kwargs):
+        self.phone_number = normalize_phone(self.phone_number)
         if not self.invite_code:
             while True:
                 new_invite_code = uuid.uuid4().hex[:8]
@@ -111,6 +147,9 @@ class UserRewardClaim(models.Model):
     class Meta:
         verbose_name = "Resgate de Subsídio"
         verbose_name_plural = "Resgates de Subsídios"
+        indexes = [
+            models.Index(fields=['user', 'claimed_at'], name='claim_user_claimed_idx'),
+        ]
         # Garante que um usuário só pode resgatar um código UMA VEZ por dia
         unique_together = ('user', 'claim_date')
 
@@ -187,19 +226,45 @@ class BankDetails(models.Model):
 class Deposit(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, verbose_name="Usuário")
     amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Valor")
-    proof_of_payment = models.ImageField(upload_to='deposit_proofs/', verbose_name="Comprovativo")
+    # Vazio enquanto o comprovativo comprimido espera em staging (ver core/uploads.py)
+    proof_of_payment = models.ImageField(upload_to='deposit_proofs/', blank=True, verbose_name="Comprovativo")
+    proof_thumbnail = models.ImageField(upload_to='deposit_proofs/thumbs/', blank=True, editable=False, verbose_name="Miniatura do Comprovativo")
+    proof_staged_name = models.CharField(max_length=255, blank=True, default='', editable=False, verbose_name="Comprovativo em Envio")
     is_approved = models.BooleanField(default=False, verbose_name="Aprovado")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Data de Criação")
     
     class Meta:
         verbose_name = "Depósito"
         verbose_name_plural = "Depósitos"
+        indexes = [
+            # Histórico do usuário por data ('historico', ver core/timeline.py)
+            models.Index(fields=['user', 'created_at'], name='deposit_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"Depósito de {self.amount} por {self.user.phone_number}"
 
 # ---
 
+class ProofUpload(models.Model):
+    """Sessão de envio em partes (retomável) de um comprovativo de depósito."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, verbose_name="Usuário")
+    amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Valor")
+    total_size = models.PositiveIntegerField(verbose_name="Tamanho Total (bytes)")
+    received_size = models.PositiveIntegerField(default=0, verbose_name="Recebido (bytes)")
+    deposit = models.OneToOneField(Deposit, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Depósito")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Data de Criação")
+
+    class Meta:
+        verbose_name = "Envio de Comprovativo"
+        verbose_name_plural = "Envios de Comprovativos"
+
+    def __str__(self):
+        return f"Envio {self.pk} de {self.user.phone_number} ({self.received_size}/{self.total_size})"
+
+# ---
+
 class Withdrawal(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, verbose_name="Usuário")
     amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Valor")
@@ -209,6 +274,10 @@ class Withdrawal(models.Model):
     class Meta:
         verbose_name = "Saque"
         verbose_name_plural = "Saques"
+        indexes = [
+            # Histórico do usuário por data ('saque', 'historico')
+            models.Index(fields=['user', 'created_at'], name='withdrawal_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"Saque de {self.amount} por {self.user.phone_number} ({self.status})"
@@ -222,6 +291,8 @@ class Level(models.Model):
     monthly_gain = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Ganho Mensal")
     cycle_days = models.IntegerField(verbose_name="Ciclo (dias)")
     image = models.ImageField(upload_to='level_images/', verbose_name="Imagem")
+    # Variantes WebP/AVIF geradas a partir de 'image' (ver core/images.py)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name="Variantes da Imagem")
 
     class Meta:
         verbose_name = "Nível"
@@ -230,6 +301,23 @@ class Level(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Regera as variantes apenas quando a imagem original muda
+        if self.image and self.image_variants.get('source') != self.image.name:
+            try:
+                with self.image.open('rb') as source:
+                    variants = save_variants(default_storage, source, self.image.name, widths=LEVEL_IMAGE_WIDTHS)
+            except UNREADABLE_IMAGE_ERRORS as error:
+                # Ficheiro em falta (ex.: cópia da base sem os ficheiros) ou que não é uma
+                # imagem: o nível fica gravado e level_picture usa só a original; a
+                # próxima gravação tenta de novo
+                log = logger.info if isinstance(error, FileNotFoundError) else logger.warning
+                log('Sem variantes para a imagem %s do nível %s: %s', self.image.name, self.pk, error)
+                return
+            self.image_variants = {'source': self.image.name, 'variants': variants}
+            super().save(update_fields=['image_variants'])
+
 # ---
 
 class UserLevel(models.Model):
@@ -241,12 +329,66 @@ class UserLevel(models.Model):
     class Meta:
         verbose_name = "Nível do Usuário"
         verbose_name_plural = "Níveis dos Usuários"
+        indexes = [
+            # Compras recentes revistas pela liquidação das comissões (core/commissions.py)
+            models.Index(fields=['purchase_date'], name='userlevel_purchase_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.phone_number} - {self.level.name}"
 
 # ---
 
+class ReferralCommission(models.Model):
+    """Comissão de convite paga sobre a compra de um nível (ver core/commissions.py)."""
+    user_level = models.ForeignKey(UserLevel, on_delete=models.CASCADE, verbose_name="Compra de Nível")
+    beneficiary = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='referral_commissions', verbose_name="Beneficiário")
+    tier = models.PositiveSmallIntegerField(verbose_name="Geração")
+    amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Valor")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Data de Pagamento")
+
+    class Meta:
+        verbose_name = "Comissão de Convite"
+        verbose_name_plural = "Comissões de Convite"
+        # Uma comissão por compra e por geração: a liquidação é idempotente
+        constraints = [
+            models.UniqueConstraint(fields=['user_level', 'tier'], name='unique_commission_per_purchase_tier')
+        ]
+
+    def __str__(self):
+        return f"Comissão de {self.amount} Kz para {self.beneficiary.phone_number} (geração {self.tier})"
+
+# ---
+
+class VersionStamp(models.Model):
+    """Instante (ns) da última alteração de um conjunto de dados (ver core/versions.py)."""
+    name = models.CharField(max_length=50, primary_key=True, verbose_name="Conjunto de Dados")
+    stamp = models.BigIntegerField(verbose_name="Carimbo (ns)")
+
+    class Meta:
+        verbose_name = "Carimbo de Versão"
+        verbose_name_plural = "Carimbos de Versão"
+
+    def __str__(self):
+        return f"{self.name}: {self.stamp}"
+
+# ---
+
+class SettlementWatermark(models.Model):
+    """Último id já processado por um processo incremental (ex.: liquidação de comissões)."""
+    name = models.CharField(max_length=50, unique=True, verbose_name="Processo")
+    last_id = models.BigIntegerField(default=0, verbose_name="Último ID Processado")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
+
+    class Meta:
+        verbose_name = "Marca de Processamento"
+        verbose_name_plural = "Marcas de Processamento"
+
+    def __str__(self):
+        return f"{self.name}: {self.last_id}"
+
+# ---
+
 class Task(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, verbose_name="Usuário")
     earnings = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Ganhos")
@@ -255,6 +397,10 @@ class Task(models.Model):
     class Meta:
         verbose_name = "Tarefa"
         verbose_name_plural = "Tarefas"
+        indexes = [
+            # Tarefas do dia por usuário ('tarefa', 'process_task', 'renda')
+            models.Index(fields=['user', 'completed_at'], name='task_user_completed_idx'),
+        ]
 
     def __str__(self):
         return f"Tarefa de {self.user.phone_number} em {self.completed_at}"
@@ -270,10 +416,71 @@ class Roulette(models.Model):
     class Meta:
         verbose_name = "Roleta"
         verbose_name_plural = "Roletas"
+        indexes = [
+            models.Index(fields=['user', 'spin_date'], name='roulette_user_spin_idx'),
+        ]
 
     def __str__(self):
         return f"Roleta de {self.user.phone_number} - Prêmio: {self.prize}"
 
+# ---
+# ARQUIVO DO HISTÓRICO (ver core/archive.py)
+# ---
+
+class TaskArchive(models.Model):
+    """Tarefas de meses antigos, movidas de Task com o mesmo id."""
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='+', verbose_name="Usuário")
+    earnings = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Ganhos")
+    completed_at = models.DateTimeField(verbose_name="Data de Conclusão")
+
+    class Meta:
+        verbose_name = "Tarefa Arquivada"
+        verbose_name_plural = "Tarefas Arquivadas"
+        indexes = [
+            models.Index(fields=['user', 'completed_at'], name='taskarchive_user_done_idx'),
+        ]
+
+    def __str__(self):
+        return f"Tarefa de {self.user.phone_number} em {self.completed_at}"
+
+class RouletteArchive(models.Model):
+    """Rodadas da roleta de meses antigos, movidas de Roulette com o mesmo id."""
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='+', verbose_name="Usuário")
+    prize = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Prêmio")
+    spin_date = models.DateTimeField(verbose_name="Data da Rodada")
+    is_approved = models.BooleanField(default=False, verbose_name="Aprovado")
+
+    class Meta:
+        verbose_name = "Roleta Arquivada"
+        verbose_name_plural = "Roletas Arquivadas"
+        indexes = [
+            models.Index(fields=['user', 'spin_date'], name='roulettearchive_user_spin_idx'),
+        ]
+
+    def __str__(self):
+        return f"Roleta de {self.user.phone_number} - Prêmio: {self.prize}"
+
+class UserMonthlyActivity(models.Model):
+    """Totais mensais por usuário das tarefas e roletas já arquivadas."""
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='monthly_activity', verbose_name="Usuário")
+    month = models.DateField(verbose_name="Mês")  # primeiro dia do mês (hora local)
+    task_count = models.PositiveIntegerField(default=0, verbose_name="Tarefas")
+    task_earnings = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Ganhos das Tarefas")
+    roulette_count = models.PositiveIntegerField(default=0, verbose_name="Rodadas da Roleta")
+    roulette_prizes = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Prêmios da Roleta")
+
+    class Meta:
+        verbose_name = "Atividade Mensal Arquivada"
+        verbose_name_plural = "Atividade Mensal Arquivada"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month'], name='unique_monthly_activity_per_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.phone_number} - {self.month:%m/%Y}"
+
 # ---
 
 class RouletteSettings(models.Model):
@@ -289,4 +496,254 @@ class RouletteSettings(models.Model):
 
     def __str__(self):
         return "Configurações da Roleta"
-        
\ No newline at end of file
+        
+
+# ---
+# INDICADORES DA PLATAFORMA (ver core/kpis.py)
+# ---
+
+def _kpi_amount(verbose_name):
+    return models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name=verbose_name)
+
+class DailyKPI(models.Model):
+    """Indicadores de um dia; cada dia tem várias linhas ('slot') somadas na leitura."""
+    day = models.DateField(verbose_name="Dia")
+    slot = models.PositiveSmallIntegerField(default=0, verbose_name="Fração")
+    new_users = models.IntegerField(default=0, verbose_name="Novos Usuários")
+    deposits_count = models.IntegerField(default=0, verbose_name="Depósitos")
+    deposits_amount = _kpi_amount("Valor Depositado")
+    deposits_approved_count = models.IntegerField(default=0, verbose_name="Depósitos Aprovados")
+    deposits_approved_amount = _kpi_amount("Valor Aprovado")
+    withdrawals_count = models.IntegerField(default=0, verbose_name="Saques")
+    withdrawals_amount = _kpi_amount("Valor de Saques")
+    withdrawals_approved_amount = _kpi_amount("Valor de Saques Aprovados")
+    level_purchases = models.IntegerField(default=0, verbose_name="Compras de Nível")
+    level_purchases_amount = _kpi_amount("Valor das Compras de Nível")
+    tasks_count = models.IntegerField(default=0, verbose_name="Tarefas")
+    tasks_earnings = _kpi_amount("Ganhos das Tarefas")
+    roulette_spins = models.IntegerField(default=0, verbose_name="Rodadas da Roleta")
+    roulette_prizes = _kpi_amount("Prêmios da Roleta")
+    reward_claims = models.IntegerField(default=0, verbose_name="Resgates de Subsídio")
+    reward_claims_amount = _kpi_amount("Valor dos Resgates")
+
+    class Meta:
+        verbose_name = "Indicador Diário"
+        verbose_name_plural = "Indicadores Diários"
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'slot'], name='unique_daily_kpi_slot'),
+        ]
+
+    def __str__(self):
+        return f"Indicadores de {self.day:%d/%m/%Y} ({self.slot})"
+
+class KPICounter(models.Model):
+    """Contadores atuais (ex.: depósitos pendentes), também divididos em 'slot'."""
+    name = models.CharField(max_length=50, verbose_name="Contador")
+    slot = models.PositiveSmallIntegerField(default=0, verbose_name="Fração")
+    count = models.IntegerField(default=0, verbose_name="Quantidade")
+    amount = _kpi_amount("Valor")
+
+    class Meta:
+        verbose_name = "Contador da Plataforma"
+        verbose_name_plural = "Contadores da Plataforma"
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'slot'], name='unique_kpi_counter_slot'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.slot}): {self.count}"
+
+# ---
+# RANKINGS (ver core/leaderboards.py)
+# ---
+
+class LeaderboardScore(models.Model):
+    """Pontuação de um usuário num ranking, num período ('all', 'd2026-01-31', 'w2026-01-26')."""
+    BOARD_TEAM_SIZE = 'team_size'
+    BOARD_INVESTED_INVITEES = 'invested_invitees'
+    BOARD_EARNINGS = 'earnings'
+    BOARD_CHOICES = [
+        (BOARD_TEAM_SIZE, 'Convidados'),
+        (BOARD_INVESTED_INVITEES, 'Convidados com Nível'),
+        (BOARD_EARNINGS, 'Ganhos das Tarefas'),
+    ]
+
+    board = models.CharField(max_length=30, choices=BOARD_CHOICES, verbose_name="Ranking")
+    period = models.CharField(max_length=12, verbose_name="Período")
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='+', verbose_name="Usuário")
+    score = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Pontuação")
+
+    class Meta:
+        verbose_name = "Pontuação de Ranking"
+        verbose_name_plural = "Pontuações de Ranking"
+        constraints = [
+            models.UniqueConstraint(fields=['board', 'period', 'user'], name='unique_leaderboard_score'),
+        ]
+        indexes = [
+            # Os primeiros N de um ranking e período são uma leitura de N entradas do índice
+            models.Index(fields=['board', 'period', '-score', 'user'], name='leaderboard_top_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_board_display()} {self.period}: {self.user_id} ({self.score})"
+
+# ---
+# CAMPANHAS DE OFERTAS EM MASSA (ver core/campaigns.py)
+# ---
+
+class GrantCampaign(models.Model):
+    """Oferta de giros da roleta ou de bónus a um segmento de usuários, aplicada em lotes."""
+    GRANT_SPINS = 'spins'
+    GRANT_BONUS = 'bonus'
+    GRANT_CHOICES = [
+        (GRANT_SPINS, 'Giros da Roleta'),
+        (GRANT_BONUS, 'Bónus no Saldo Disponível'),
+    ]
+
+    STATUS_DRAFT = 'draft'
+    STATUS_RUNNING = 'running'
+    STATUS_PAUSED = 'paused'
+    STATUS_DONE = 'done'
+    STATUS_CHOICES = [
+        (STATUS_DRAFT, 'Rascunho'),
+        (STATUS_RUNNING, 'Em Execução'),
+        (STATUS_PAUSED, 'Pausada'),
+        (STATUS_DONE, 'Concluída'),
+    ]
+
+    name = models.CharField(max_length=100, verbose_name="Nome")
+    grant_type = models.CharField(max_length=10, choices=GRANT_CHOICES, default=GRANT_SPINS, verbose_name="Oferta")
+    # Giros (número inteiro) ou Kz, conforme a oferta
+    amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Quantidade")
+
+    # Segmento: os critérios vazios não filtram
+    level = models.ForeignKey(
+        'Level', on_delete=models.PROTECT, null=True, blank=True, related_name='+', verbose_name="Nível Atual",
+    )
+    joined_from = models.DateField(null=True, blank=True, verbose_name="Cadastro a partir de")
+    joined_until = models.DateField(null=True, blank=True, verbose_name="Cadastro até")
+    min_team_size = models.PositiveIntegerField(null=True, blank=True, verbose_name="Convidados (mínimo)")
+    min_deposit_total = models.DecimalField(
+        max_digits=12, decimal_places=2, null=True, blank=True, verbose_name="Depósitos Aprovados (mínimo)",
+    )
+    deposits_from = models.DateField(null=True, blank=True, verbose_name="Depósitos a partir de")
+
+    # Progresso (core/campaigns.py)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_DRAFT, verbose_name="Status")
+    target_count = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Usuários no Segmento")
+    granted_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Usuários Contemplados")
+    # Usuários com id até max_user_id (fixado no início); já percorridos até last_user_id
+    max_user_id = models.BigIntegerField(null=True, blank=True, editable=False, verbose_name="Último Usuário Abrangido")
+    last_user_id = models.BigIntegerField(default=0, editable=False, verbose_name="Último Usuário Processado")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Data de Criação")
+    started_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Iniciada em")
+    finished_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Concluída em")
+
+    class Meta:
+        verbose_name = "Campanha de Ofertas"
+        verbose_name_plural = "Campanhas de Ofertas"
+
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()})"
+
+    def clean(self):
+        if self.amount is not None and self.amount <= 0:
+            raise ValidationError({'amount': 'A quantidade deve ser positiva.'})
+        if self.grant_type == self.GRANT_SPINS and self.amount is not None and self.amount != int(self.amount):
+            raise ValidationError({'amount': 'O número de giros deve ser inteiro.'})
+        if self.joined_from and self.joined_until and self.joined_from > self.joined_until:
+            raise ValidationError({'joined_until': 'A data final é anterior à inicial.'})
+
+
+class CampaignGrant(models.Model):
+    """Registo de cada usuário contemplado: a oferta é aplicada uma única vez (e entra em core/reconcile.py)."""
+    campaign = models.ForeignKey(GrantCampaign, on_delete=models.PROTECT, related_name='grants', verbose_name="Campanha")
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='+', verbose_name="Usuário")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Data")
+
+    class Meta:
+        verbose_name = "Oferta de Campanha"
+        verbose_name_plural = "Ofertas de Campanhas"
+        constraints = [
+            models.UniqueConstraint(fields=['campaign', 'user'], name='unique_campaign_grant'),
+        ]
+        indexes = [
+            # Somas por usuário da reconciliação
+            models.Index(fields=['user', 'campaign'], name='campaign_grant_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.campaign.name}: {self.user_id}"
+
+# ---
+# AVISOS (ver core/announcements.py)
+# ---
+
+class Announcement(models.Model):
+    """Aviso publicado uma vez pelo staff e lido por todos os usuários do público escolhido."""
+    AUDIENCE_ALL = 'all'
+    AUDIENCE_INVESTED = 'invested'
+    AUDIENCE_NOT_INVESTED = 'not_invested'
+    AUDIENCE_CHOICES = [
+        (AUDIENCE_ALL, 'Todos os Usuários'),
+        (AUDIENCE_INVESTED, 'Usuários com Nível Ativo'),
+        (AUDIENCE_NOT_INVESTED, 'Usuários sem Nível Ativo'),
+    ]
+
+    title = models.CharField(max_length=120, verbose_name="Título")
+    message = models.TextField(verbose_name="Mensagem")
+    audience = models.CharField(max_length=15, choices=AUDIENCE_CHOICES, default=AUDIENCE_ALL, verbose_name="Público")
+    # Desativar retira o aviso da lista e do contador de quem ainda não o leu
+    is_active = models.BooleanField(default=True, verbose_name="Ativo")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Data de Publicação")
+
+    class Meta:
+        verbose_name = "Aviso"
+        verbose_name_plural = "Avisos"
+        indexes = [
+            # Avisos por ler: id > marca do usuário, por público
+            models.Index(fields=['audience', 'id'], name='announcement_audience_idx', condition=Q(is_active=True)),
+        ]
+
+    def __str__(self):
+        return self.title
+
+# ---
+# FILA DE TAREFAS EM SEGUNDO PLANO (ver core/jobs.py)
+# ---
+
+class Job(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pendente'),
+        (STATUS_RUNNING, 'Em Execução'),
+        (STATUS_DONE, 'Concluída'),
+        (STATUS_FAILED, 'Falhou'),
+    ]
+
+    name = models.CharField(max_length=100, verbose_name="Tarefa")
+    payload = models.JSONField(default=dict, blank=True, verbose_name="Argumentos")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name="Status")
+    run_at = models.DateTimeField(default=timezone.now, verbose_name="Executar em")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Tentativas")
+    max_attempts = models.PositiveIntegerField(default=5, verbose_name="Máximo de Tentativas")
+    # Evita tarefas duplicadas (ex.: a mesma ocorrência de uma tarefa periódica)
+    unique_key = models.CharField(max_length=255, unique=True, null=True, blank=True, verbose_name="Chave Única")
+    locked_by = models.CharField(max_length=100, blank=True, default='', verbose_name="Worker")
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name="Bloqueada em")
+    last_error = models.TextField(blank=True, default='', verbose_name="Último Erro")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Data de Criação")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Concluída em")
+
+    class Meta:
+        verbose_name = "Tarefa em Segundo Plano"
+        verbose_name_plural = "Tarefas em Segundo Plano"
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()})"
@@ -0,0 +1,66 @@
+"""
+Números de telefone normalizados e pesquisa indexada por telefone.
+
+phone_number é guardado só com dígitos e sem o indicativo do país
+(PHONE_COUNTRY_CODE): '+244 923-456-789' e '923456789' são o mesmo usuário.
+O cadastro, o login (get_by_natural_key) e o admin normalizam o que recebem.
+
+A pesquisa do admin (PhoneSearchMixin em core/admin.py) escolhe a consulta
+mais barata para o texto escrito:
+- número completo -> igualdade (índice único);
+- parte inicial do número -> prefixo (LIKE 'x%'): no PostgreSQL usa o
+  índice varchar_pattern_ops (core_customuser_phone_number_..._like) que o
+  Django já cria para o campo unique=True;
+- '*' antes dos dígitos -> qualquer parte do número (LIKE '%x%'): só é
+  rápido no PostgreSQL com o índice de trigramas (PHONE_TRIGRAM_INDEX);
+- texto que não é um número -> os restantes campos de pesquisa.
+"""
+import re
+
+from django.conf import settings
+
+# Separadores aceites ao escrever um número
+PHONE_SEPARATORS = re.compile(r'[\s\-.()/]')
+SUBSTRING_MARKER = '*'
+
+# estratégia -> lookup do Django
+SEARCH_LOOKUPS = {'exact': '', 'prefix': '__startswith', 'substring': '__contains'}
+
+
+def country_code():
+    return getattr(settings, 'PHONE_COUNTRY_CODE', '244')
+
+
+def national_length():
+    return getattr(settings, 'PHONE_NATIONAL_LENGTH', 9)
+
+
+def normalize_phone(value):
+    """
+    '+244 923 456 789' -> '923456789'. Texto que não é um número (ex.: o
+    nome de um superusuário antigo) fica como está, sem espaços nas pontas.
+    """
+    value = (value or '').strip()
+    digits = PHONE_SEPARATORS.sub('', value)
+    international = digits.startswith(('+', '00'))
+    digits = digits[1:] if digits.startswith('+') else digits[2:] if digits.startswith('00') else digits
+    if not digits.isdigit():
+        return value
+    code = country_code()
+    if digits.startswith(code) and (international or len(digits) == len(code) + national_length()):
+        digits = digits[len(code):]
+    return digits
+
+
+def search_strategy(term):
+    """Devolve (estratégia, dígitos) para o texto pesquisado, ou (None, texto)."""
+    term = term.strip()
+    substring = term.startswith(SUBSTRING_MARKER)
+    digits = normalize_phone(term.lstrip(SUBSTRING_MARKER))
+    if not digits.isdigit():
+        return None, term
+    if substring:
+        return 'substring', digits
+    if len(digits) >= national_length():
+        return 'exact', digits
+    return 'prefix', digits
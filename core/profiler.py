@@ -0,0 +1,200 @@
+"""
+Perfil de pedidos a pedido (apenas staff).
+
+Ativado pelo cabeçalho 'X-Profile: 1' ou pelo cookie PROFILE_COOKIE: o
+pedido corre sob cProfile, cada consulta SQL é registada com o tempo e o
+EXPLAIN, e o resultado é guardado em PROFILES_DIR (um JSON por pedido).
+As páginas de admin em /admin/profiles/ listam, mostram e comparam perfis.
+"""
+import cProfile
+import json
+import os
+import pstats
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+PROFILES_DIR = getattr(settings, 'PROFILES_DIR', os.path.join(settings.BASE_DIR, '.profiles'))
+PROFILE_COOKIE = 'ddb_profile'
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILES_KEPT = getattr(settings, 'PROFILES_KEPT', 50)
+# Funções guardadas por perfil (ordenadas pelo tempo cumulativo)
+PROFILE_TOP_FUNCTIONS = 200
+EXPLAIN_LIMIT = 100
+
+EXPLAIN_PREFIX = {
+    'postgresql': 'EXPLAIN ',
+    'mysql': 'EXPLAIN ',
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+}
+
+
+def is_requested(request):
+    """Verificação barata, feita antes de qualquer outra coisa no middleware."""
+    return bool(request.META.get(PROFILE_HEADER) or request.COOKIES.get(PROFILE_COOKIE))
+
+
+class QueryCapture:
+    """execute_wrapper que guarda cada consulta SQL com o seu tempo."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'params': params,
+                'many': many,
+                'duration_ms': (time.perf_counter() - started) * 1000,
+            })
+
+
+def explain(query):
+    """EXPLAIN da consulta (apenas SELECT, nunca executa escritas)."""
+    connection = connections[query['alias']]
+    prefix = EXPLAIN_PREFIX.get(connection.vendor)
+    if not prefix or query['many'] or not query['sql'].lstrip().upper().startswith('SELECT'):
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + query['sql'], query['params'])
+            return '\n'.join(' | '.join(str(column) for column in row) for row in cursor.fetchall())
+    except Exception as e:
+        return f'(EXPLAIN falhou: {e})'
+
+
+def profile_request(request, get_response):
+    """Executa o pedido sob perfil, guarda o resultado e devolve a resposta."""
+    capture = QueryCapture()
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(capture))
+        profiler.enable()
+        try:
+            response = get_response(request)
+        finally:
+            profiler.disable()
+    duration = time.perf_counter() - started
+
+    queries = capture.queries
+    for query in queries[:EXPLAIN_LIMIT]:
+        query['explain'] = explain(query)
+    for query in queries:
+        query['params'] = repr(query['params'])
+
+    match = getattr(request, 'resolver_match', None)
+    profile_id = save_profile({
+        'created_at': timezone.now().isoformat(),
+        'path': request.get_full_path(),
+        'method': request.method,
+        'view': match.view_name if match else None,
+        'status': response.status_code,
+        'user': str(request.user),
+        'duration_ms': duration * 1000,
+        'query_count': len(queries),
+        'query_time_ms': sum(query['duration_ms'] for query in queries),
+        'queries': queries,
+        'functions': function_stats(profiler),
+    })
+    response['X-Profile-Id'] = profile_id
+    return response
+
+
+def _short_path(filename):
+    base_dir = str(settings.BASE_DIR)
+    return os.path.relpath(filename, base_dir) if filename.startswith(base_dir) else filename
+
+
+def function_stats(profiler):
+    stats = pstats.Stats(profiler).stats
+    rows = [
+        {
+            'function': f'{_short_path(filename)}:{line}({name})',
+            'ncalls': ncalls,
+            'tottime_ms': tottime * 1000,
+            'cumtime_ms': cumtime * 1000,
+        }
+        for (filename, line, name), (_, ncalls, tottime, cumtime, _) in stats.items()
+    ]
+    rows.sort(key=lambda row: row['cumtime_ms'], reverse=True)
+    return rows[:PROFILE_TOP_FUNCTIONS]
+
+
+# --- ARMAZENAMENTO LOCAL ---
+
+def save_profile(data):
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    # O nome começa pela data para que a ordem alfabética seja a cronológica
+    profile_id = f"{timezone.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    data['id'] = profile_id
+    with open(os.path.join(PROFILES_DIR, f'{profile_id}.json'), 'w') as profile_file:
+        json.dump(data, profile_file)
+    _prune()
+    return profile_id
+
+
+def _prune():
+    for filename in _profile_files()[PROFILES_KEPT:]:
+        os.remove(os.path.join(PROFILES_DIR, filename))
+
+
+def _profile_files():
+    if not os.path.isdir(PROFILES_DIR):
+        return []
+    return sorted((name for name in os.listdir(PROFILES_DIR) if name.endswith('.json')), reverse=True)
+
+
+def list_profiles():
+    """Resumo dos perfis guardados, do mais recente para o mais antigo."""
+    summaries = []
+    for filename in _profile_files():
+        profile = load_profile(filename[:-len('.json')])
+        if profile:
+            summaries.append({key: value for key, value in profile.items() if key not in ('queries', 'functions')})
+    return summaries
+
+
+def load_profile(profile_id):
+    # O id vem do URL: aceita apenas nomes gerados por save_profile
+    if not profile_id.replace('-', '').isalnum():
+        return None
+    try:
+        with open(os.path.join(PROFILES_DIR, f'{profile_id}.json')) as profile_file:
+            return json.load(profile_file)
+    except (OSError, ValueError):
+        return None
+
+
+def diff_profiles(before, after):
+    """Compara dois perfis função a função (tempo cumulativo) e nos totais."""
+    before_functions = {row['function']: row for row in before['functions']}
+    after_functions = {row['function']: row for row in after['functions']}
+    rows = []
+    for function in before_functions.keys() | after_functions.keys():
+        a = before_functions.get(function, {})
+        b = after_functions.get(function, {})
+        rows.append({
+            'function': function,
+            'before_ms': a.get('cumtime_ms', 0),
+            'after_ms': b.get('cumtime_ms', 0),
+            'delta_ms': b.get('cumtime_ms', 0) - a.get('cumtime_ms', 0),
+            'before_calls': a.get('ncalls', 0),
+            'after_calls': b.get('ncalls', 0),
+        })
+    rows.sort(key=lambda row: abs(row['delta_ms']), reverse=True)
+    totals = {
+        key: {'before': before[key], 'after': after[key], 'delta': after[key] - before[key]}
+        for key in ('duration_ms', 'query_count', 'query_time_ms')
+    }
+    return {'totals': totals, 'functions': rows}
@@ -0,0 +1,58 @@
+"""
+Limites diários por usuário (tarefas, resgate do subsídio, saques) guardados
+na própria linha do usuário: a data da última ação de cada tipo e, para as
+tarefas, quantas foram feitas nesse dia.
+
+As verificações das páginas comparam campos de request.user, que já está
+carregado, sem consultar as tabelas de histórico. As ações consomem a quota
+com um UPDATE condicional (consume_quota), dentro da mesma transação que
+grava a ação: dois pedidos simultâneos nunca passam os dois.
+
+"Hoje" é timezone.localdate() (hora de Luanda), como nas restantes regras diárias
+das views e no ETag diário de core/versions.py.
+"""
+from django.db.models import Case, F, Q, Value, When
+
+from .models import CustomUser
+
+# tipo -> (campo da data, campo do contador ou None)
+QUOTAS = {
+    'task': ('last_task_date', 'tasks_today'),
+    'claim': ('last_claim_date', None),
+    'withdrawal': ('last_withdrawal_date', None),
+}
+
+
+def used_today(user, kind, today):
+    """Quantas vezes a ação foi feita hoje (0 ou 1 para os tipos sem contador)."""
+    date_field, count_field = QUOTAS[kind]
+    if getattr(user, date_field) != today:
+        return 0
+    return getattr(user, count_field) if count_field else 1
+
+
+def consume_quota(user, kind, today, limit=1):
+    """
+    Regista mais uma ação de hoje se ainda houver quota. Devolve False (sem
+    alterar nada) se o limite já foi atingido, mesmo por outro pedido em curso.
+    Deve correr na transação que grava a ação.
+    """
+    date_field, count_field = QUOTAS[kind]
+    not_today = ~Q(**{date_field: today})
+    changes = {date_field: today}
+    if count_field:
+        available = not_today | Q(**{f'{count_field}__lt': limit})
+        changes[count_field] = Case(When(not_today, then=Value(1)), default=F(count_field) + 1)
+    elif limit == 1:
+        available = not_today
+    else:
+        raise ValueError(f"A quota '{kind}' só permite uma ação por dia.")
+
+    used = used_today(user, kind, today)
+    if not CustomUser.objects.filter(available, pk=user.pk).update(**changes):
+        return False
+    # Mantém o objeto em memória igual à linha
+    setattr(user, date_field, today)
+    if count_field:
+        setattr(user, count_field, used + 1)
+    return True
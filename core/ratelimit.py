@@ -0,0 +1,142 @@
+"""
+Limites de pedidos e corte de carga para as rotas de escrita mais usadas.
+
+Cada rota em RATE_LIMITS tem:
+- um limite por IP, sempre, e, nas rotas com a chave 'user', outro por
+  usuário autenticado (request.user.pk, nunca o cookie de sessão enviado
+  pelo cliente, que um bot pode trocar a cada pedido). Acima deles a
+  resposta é 429 com Retry-After;
+- um máximo opcional de pedidos simultâneos; acima dele a resposta é 503
+  imediato.
+
+Os limites são janelas fixas de burst / rate segundos com até 'burst'
+pedidos: em média 'rate' pedidos por segundo, com rajadas de 'burst' (até
+o dobro na passagem de uma janela para a seguinte). Cada cliente tem um só
+contador por janela e cada rota um só contador de pedidos em curso, todos
+alterados com cache.add/incr, que são atómicos no Redis e na LocMemCache.
+
+O estado vive na cache própria 'ratelimit' (CACHES). O limite por IP e o
+de concorrência correm no RateLimitMiddleware antes da sessão e da
+autenticação: esses pedidos recusados não fazem nenhuma consulta à base de
+dados. O limite por usuário corre em process_view, depois da autenticação
+(a sessão e o usuário que a view carregaria de qualquer forma).
+
+Os contadores de pedidos em curso expiram CONCURRENCY_SLOT_TIMEOUT depois de
+criados, para esquecer os de workers que morreram a meio de um pedido: o
+limite de concorrência é aproximado (alguns pedidos a mais podem passar
+logo a seguir), o que basta para cortar a carga.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+from django.utils.connection import ConnectionProxy
+
+RATE_PERIODS = {'s': 1, 'm': 60, 'h': 3600}
+# Um contador de pedidos em curso esquecido por um worker morto dura no máximo isto
+CONCURRENCY_SLOT_TIMEOUT = 60
+# Limite por IP das rotas com chave 'user' sem 'ip_rate': vários usuários
+# podem partilhar o mesmo IP (NAT das operadoras móveis)
+IP_RATE_FACTOR = 10
+
+# Cache dos contadores (CACHES['ratelimit'])
+RATE_LIMIT_CACHE_ALIAS = 'ratelimit'
+ratelimit_cache = ConnectionProxy(caches, RATE_LIMIT_CACHE_ALIAS)
+
+MESSAGES = {
+    429: 'Muitos pedidos seguidos. Aguarde um momento e tente novamente.',
+    503: 'O serviço está sobrecarregado. Tente novamente dentro de instantes.',
+}
+
+
+def parse_rate(rate):
+    """'10/m' -> 10 / 60 pedidos por segundo."""
+    count, period = rate.split('/')
+    return int(count) / RATE_PERIODS[period]
+
+
+def get_policy(url_name, method):
+    """Política da rota para este método, ou None se não for limitada."""
+    if not getattr(settings, 'RATE_LIMIT_ENABLED', True):
+        return None
+    policy = getattr(settings, 'RATE_LIMITS', {}).get(url_name)
+    if not policy or method not in policy.get('methods', ('POST',)):
+        return None
+    return policy
+
+
+def user_limits(policy):
+    """(pedidos por segundo, rajada) por cliente."""
+    rate = parse_rate(policy['rate'])
+    return rate, policy.get('burst', max(1, round(rate * 60)))
+
+
+def ip_limits(policy):
+    """(pedidos por segundo, rajada) por IP."""
+    rate, burst = user_limits(policy)
+    if policy.get('key', 'user') == 'ip':
+        return rate, burst
+    if 'ip_rate' in policy:
+        ip_rate = parse_rate(policy['ip_rate'])
+        return ip_rate, policy.get('ip_burst', max(1, round(ip_rate * 60)))
+    return rate * IP_RATE_FACTOR, burst * IP_RATE_FACTOR
+
+
+def client_ip(request):
+    header = getattr(settings, 'RATE_LIMIT_IP_HEADER', '')
+    if header and request.META.get(header):
+        # A última entrada é a acrescentada pelo nosso proxy (as anteriores vêm do cliente)
+        return request.META[header].split(',')[-1].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def increment(key, timeout):
+    """Soma 1 ao contador (criado a 0 com este timeout) e devolve o novo valor."""
+    ratelimit_cache.add(key, 0, timeout)
+    try:
+        return ratelimit_cache.incr(key)
+    except ValueError:
+        # Expirou entre o add e o incr
+        ratelimit_cache.add(key, 1, timeout)
+        return 1
+
+
+def count_request(key, rate, burst, now=None):
+    """
+    Conta o pedido na janela atual do cliente. Devolve 0 se o pedido pode
+    passar, senão os segundos até à janela seguinte.
+    """
+    now = time.time() if now is None else now
+    window = burst / rate
+    index = int(now // window)
+    if increment(f'{key}:{index}', math.ceil(window) + 1) <= burst:
+        return 0
+    return (index + 1) * window - now
+
+
+def acquire_slot(url_name, limit):
+    """Conta mais um pedido em curso na rota; devolve a chave do contador ou None acima de 'limit'."""
+    key = f'ratelimit:active:{url_name}'
+    if increment(key, CONCURRENCY_SLOT_TIMEOUT) <= limit:
+        return key
+    release_slot(key)
+    return None
+
+
+def release_slot(key):
+    try:
+        ratelimit_cache.decr(key)
+    except ValueError:
+        pass  # O contador já expirou
+
+
+def rejection(request, status, retry_after):
+    # As rotas chamadas por fetch() esperam o JSON {'success', 'message'}
+    if request.content_type == 'application/json':
+        response = JsonResponse({'success': False, 'message': MESSAGES[status]}, status=status)
+    else:
+        response = HttpResponse(MESSAGES[status], content_type='text/plain; charset=utf-8', status=status)
+    response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
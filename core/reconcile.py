@@ -0,0 +1,225 @@
+"""
+Reconciliação dos saldos dos usuários com o histórico de movimentos.
+
+Para cada usuário (exceto staff):
+    available_balance = WELCOME_BONUS + depósitos aprovados + tarefas
+                        + prêmios da roleta + subsídios diários + comissões
+                        + bónus de campanhas - saques - compras de nível
+    subsidy_balance   = prêmios da roleta + subsídios diários + comissões
+
+Os usuários são divididos em intervalos de id; cada intervalo faz uma
+consulta GROUP BY por fonte (LEDGER) e uma aos saldos, numa transação só de
+leitura (REPEATABLE READ no PostgreSQL: todas as somas veem o mesmo
+instante). Os intervalos correm num conjunto de processos. Os usuários com
+diferenças são verificados de novo numa transação nova, para descartar os
+que estavam a meio de uma ação durante a primeira leitura.
+
+Pagamentos feitos fora destes registos (bónus dados à mão no admin, o
+subsídio antigo da view 'nivel' antes de core/commissions.py) aparecem
+como diferenças.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+import django
+from django.apps import apps
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Max, Min, Q, Sum
+
+from .balances import WELCOME_BONUS
+from .models import (
+    CampaignGrant, CustomUser, Deposit, GrantCampaign, ReferralCommission, Roulette, RouletteArchive, Task, TaskArchive,
+    UserLevel, UserRewardClaim, Withdrawal,
+)
+
+# Ids de usuário por intervalo
+RECONCILE_CHUNK_SIZE = 20000
+# Acima disto a segunda leitura repete o intervalo inteiro em vez de id IN (...)
+RECHECK_MAX_IDS = 500
+CENTS = Decimal('0.01')
+
+
+@dataclass(frozen=True)
+class LedgerSource:
+    """Uma fonte de movimentos: soma de 'amount' por usuário, com sinal em cada saldo."""
+    name: str
+    model: type
+    amount: str
+    available: int
+    subsidy: int = 0
+    user_field: str = 'user'
+    condition: Q = field(default_factory=Q)
+
+
+LEDGER = [
+    LedgerSource('deposits', Deposit, 'amount', available=1, condition=Q(is_approved=True)),
+    LedgerSource('tasks', Task, 'earnings', available=1),
+    LedgerSource('task_archive', TaskArchive, 'earnings', available=1),
+    LedgerSource('roulette', Roulette, 'prize', available=1, subsidy=1, condition=Q(is_approved=True)),
+    LedgerSource('roulette_archive', RouletteArchive, 'prize', available=1, subsidy=1, condition=Q(is_approved=True)),
+    LedgerSource('reward_claims', UserRewardClaim, 'reward_code__reward_amount', available=1, subsidy=1),
+    LedgerSource('commissions', ReferralCommission, 'amount', available=1, subsidy=1, user_field='beneficiary'),
+    LedgerSource(
+        'campaign_bonuses', CampaignGrant, 'campaign__amount', available=1,
+        condition=Q(campaign__grant_type=GrantCampaign.GRANT_BONUS),
+    ),
+    # Os saques são descontados no pedido, qualquer que seja o estado depois
+    LedgerSource('withdrawals', Withdrawal, 'amount', available=-1),
+    LedgerSource('level_purchases', UserLevel, 'level__deposit_value', available=-1),
+]
+
+
+@dataclass(frozen=True)
+class Mismatch:
+    user_id: int
+    phone_number: str
+    available_balance: Decimal
+    expected_available: Decimal
+    subsidy_balance: Decimal
+    expected_subsidy: Decimal
+
+    @property
+    def available_diff(self):
+        return self.available_balance - self.expected_available
+
+    @property
+    def subsidy_diff(self):
+        return self.subsidy_balance - self.expected_subsidy
+
+
+def _user_lookups(prefix, user_range=None, user_ids=None):
+    if user_ids is not None:
+        return {f'{prefix}__in': user_ids}
+    low, high = user_range
+    return {f'{prefix}__gte': low, f'{prefix}__lt': high}
+
+
+@contextmanager
+def read_only_transaction(database=DEFAULT_DB_ALIAS):
+    """
+    transaction.atomic() para leituras: um instantâneo REPEATABLE READ,
+    READ ONLY no PostgreSQL; no SQLite abre com BEGIN DEFERRED em vez do
+    BEGIN IMMEDIATE do modo afinado (SQLITE_TUNED), que ficaria com o
+    bloqueio de escrita durante toda a leitura e faria esperar as views.
+    """
+    connection = connections[database]
+    connection.ensure_connection()
+    transaction_mode = getattr(connection, 'transaction_mode', None)
+    if connection.vendor == 'sqlite':
+        connection.transaction_mode = None
+    try:
+        with transaction.atomic(using=database):
+            # Deve ser a primeira instrução da transação
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+            yield
+    finally:
+        if connection.vendor == 'sqlite':
+            connection.transaction_mode = transaction_mode
+
+
+def reconcile_users(database=DEFAULT_DB_ALIAS, user_range=None, user_ids=None, include_staff=False):
+    """
+    Reconcilia os usuários de um intervalo de ids [início, fim) ou de uma
+    lista de ids. Devolve (usuários verificados, lista de Mismatch).
+    """
+    with read_only_transaction(database):
+        expected = {}
+        for source in LEDGER:
+            totals = (
+                source.model.objects.using(database)
+                .filter(source.condition, **_user_lookups(f'{source.user_field}_id', user_range, user_ids))
+                .order_by()
+                .values(source.user_field)
+                .annotate(total=Sum(source.amount))
+                .values_list(source.user_field, 'total')
+            )
+            for user_id, total in totals:
+                available, subsidy = expected.get(user_id, (0, 0))
+                expected[user_id] = (available + source.available * total, subsidy + source.subsidy * total)
+
+        users = CustomUser.objects.using(database).filter(**_user_lookups('pk', user_range, user_ids))
+        if not include_staff:
+            users = users.filter(is_staff=False)
+        checked = 0
+        mismatches = []
+        for user_id, phone_number, available_balance, subsidy_balance in users.values_list(
+            'pk', 'phone_number', 'available_balance', 'subsidy_balance',
+        ).iterator():
+            checked += 1
+            available, subsidy = expected.get(user_id, (0, 0))
+            # As somas no SQLite não vêm arredondadas aos cêntimos
+            expected_available = (WELCOME_BONUS + available).quantize(CENTS)
+            expected_subsidy = Decimal(subsidy).quantize(CENTS)
+            if available_balance != expected_available or subsidy_balance != expected_subsidy:
+                mismatches.append(Mismatch(
+                    user_id, phone_number, available_balance, expected_available, subsidy_balance, expected_subsidy,
+                ))
+    return checked, mismatches
+
+
+def user_ranges(database=DEFAULT_DB_ALIAS, chunk_size=RECONCILE_CHUNK_SIZE):
+    """Intervalos [início, fim) de ids de usuário com chunk_size ids cada."""
+    bounds = CustomUser.objects.using(database).aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return []
+    return [(low, low + chunk_size) for low in range(bounds['low'], bounds['high'] + 1, chunk_size)]
+
+
+def _init_worker():
+    # Com o arranque 'spawn' (macOS/Windows) o processo novo ainda não carregou o Django
+    if not apps.ready:
+        django.setup()
+
+
+def reconcile_range(database, user_range, include_staff=False):
+    """
+    Reconcilia um intervalo e verifica de novo, numa transação nova, os
+    usuários com diferenças: ficam só os que continuam diferentes.
+    """
+    checked, suspects = reconcile_users(database, user_range=user_range, include_staff=include_staff)
+    if not suspects:
+        return checked, []
+    suspect_ids = {mismatch.user_id for mismatch in suspects}
+    if len(suspect_ids) > RECHECK_MAX_IDS:
+        _, mismatches = reconcile_users(database, user_range=user_range, include_staff=include_staff)
+    else:
+        _, mismatches = reconcile_users(database, user_ids=sorted(suspect_ids), include_staff=include_staff)
+    return checked, [mismatch for mismatch in mismatches if mismatch.user_id in suspect_ids]
+
+
+def reconcile_balances(
+    database=DEFAULT_DB_ALIAS, workers=None, chunk_size=RECONCILE_CHUNK_SIZE, include_staff=False, progress=None,
+):
+    """
+    Reconcilia todos os usuários em paralelo (workers processos; 1 corre
+    neste processo). Devolve (usuários verificados, Mismatch por id).
+    """
+    workers = workers or os.cpu_count() or 1
+    ranges = user_ranges(database, chunk_size)
+    checked = 0
+    mismatches = []
+
+    if workers == 1:
+        results = (reconcile_range(database, user_range, include_staff) for user_range in ranges)
+        for done, (count, found) in enumerate(results, start=1):
+            checked += count
+            mismatches += found
+            if progress:
+                progress(done, len(ranges))
+    else:
+        # Os processos filhos não podem herdar ligações abertas (sockets partilhados)
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = [pool.submit(reconcile_range, database, user_range, include_staff) for user_range in ranges]
+            for done, future in enumerate(as_completed(futures), start=1):
+                count, found = future.result()
+                checked += count
+                mismatches += found
+                if progress:
+                    progress(done, len(ranges))
+    return checked, sorted(mismatches, key=lambda mismatch: mismatch.user_id)
@@ -0,0 +1,135 @@
+"""
+Leituras numa réplica da base de dados, com read-your-writes.
+
+Com DATABASE_REPLICA definido (alias em DATABASES), o ReplicaMiddleware
+liga o encaminhamento para a réplica nos pedidos GET/HEAD às views de
+DATABASE_REPLICA_VIEWS (páginas só de leitura, changelists do admin e
+relatórios). Tudo o resto lê e escreve no primário ('default').
+
+A réplica está sempre um pouco atrasada, por isso um pedido volta ao
+primário:
+- depois de escrever (o resto do pedido lê o que acabou de gravar);
+- dentro de transaction.atomic() no primário (também nos TestCase, que
+  correm numa transação: os dados do teste não estão na réplica);
+- durante REPLICA_STICKY_SECONDS depois de o cliente escrever (cookie
+  REPLICA_STICKY_COOKIE, posto pelo middleware na resposta que escreveu);
+- quando um carimbo de versão da página (core/versions.py) mudou há menos
+  de REPLICA_STICKY_SECONDS: a página nova não é renderizada com dados
+  antigos e guardada no navegador com o carimbo novo.
+
+Comandos e jobs podem ler da réplica com o gestor de contexto
+read_from_replica().
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from fnmatch import fnmatchcase
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_SAFE_METHODS = ('GET', 'HEAD')
+
+
+class RoutingState:
+    """Estado do encaminhamento no pedido (ou bloco) atual."""
+
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.wrote = False
+
+
+_state = ContextVar('replica_routing', default=None)
+
+
+def replica_alias():
+    """Alias da réplica, ou '' sem réplica configurada."""
+    return getattr(settings, 'DATABASE_REPLICA', '')
+
+
+def sticky_seconds():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+
+
+def is_replica_view(view_name, method):
+    if not replica_alias() or method not in REPLICA_SAFE_METHODS:
+        return False
+    return any(fnmatchcase(view_name, pattern) for pattern in getattr(settings, 'DATABASE_REPLICA_VIEWS', ()))
+
+
+def begin(use_replica):
+    """Abre o estado de um pedido; devolve o token para end()."""
+    return _state.set(RoutingState(use_replica))
+
+
+def end(token):
+    """Fecha o estado; devolve True se o pedido escreveu no primário."""
+    state = _state.get()
+    _state.reset(token)
+    return bool(state and state.wrote)
+
+
+def pin_to_primary():
+    """O resto do pedido lê do primário."""
+    state = _state.get()
+    if state is not None:
+        state.use_replica = False
+
+
+def pin_if_recent(stamp_ns, now_ns):
+    """Lê do primário se o carimbo (em nanossegundos) for mais recente que a janela."""
+    if now_ns - stamp_ns < sticky_seconds() * 1e9:
+        pin_to_primary()
+
+
+def reading_from_replica():
+    state = _state.get()
+    return bool(
+        state is not None and state.use_replica and not state.wrote and replica_alias()
+        and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+    )
+
+
+@contextmanager
+def read_from_replica():
+    """Para comandos e jobs: as leituras do bloco vão para a réplica (se houver)."""
+    token = begin(True)
+    try:
+        yield
+    finally:
+        end(token)
+
+
+# Carimbos de versão (core/versions.py)
+STAMP_MODEL = 'core.versionstamp'
+
+
+class ReplicaRouter:
+    """Router de DATABASE_ROUTERS: as escritas vão sempre para o primário."""
+
+    def db_for_read(self, model, **hints):
+        # Os carimbos decidem se a página pode vir da réplica: lidos sempre no primário
+        if model._meta.label_lower == STAMP_MODEL:
+            return DEFAULT_DB_ALIAS
+        return replica_alias() if reading_from_replica() else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Renovar um carimbo não é uma escrita do usuário (sem cookie REPLICA_STICKY)
+        if model._meta.label_lower == STAMP_MODEL:
+            return DEFAULT_DB_ALIAS
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primário e réplica têm os mesmos dados
+        databases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # A réplica recebe o esquema por replicação
+        if replica_alias() and db == replica_alias():
+            return False
+        return None
@@ -0,0 +1,29 @@
+"""
+Test runner do projeto (TEST_RUNNER).
+
+Os testes usam caches em memória do processo em vez das de CACHES
+(ficheiros): os rankings e os contadores não passam de uma execução dos
+testes para a seguinte nem para o servidor de desenvolvimento.
+
+Os limites de pedidos (core/ratelimit.py) ficam desligados: os testes
+repetem os mesmos ids de usuário e o mesmo IP, e os contadores de um teste
+recusariam os pedidos do seguinte. RateLimitTests liga-os.
+"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'ratelimit': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'ratelimit'},
+}
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.settings_override = override_settings(CACHES=TEST_CACHES, RATE_LIMIT_ENABLED=False)
+        self.settings_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.settings_override.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,110 @@
+"""
+Sinais que renovam os carimbos de versão usados nas respostas condicionais
+(ver core/versions.py), o nível atual dos usuários (ver core/levels.py), os
+indicadores diários (ver core/kpis.py) e os rankings (ver core/leaderboards.py).
+
+Os receptores são sempre ligados a modelos concretos: um receptor de
+post_delete sem 'sender' impediria o Django de apagar qualquer queryset
+numa só instrução (QuerySet.delete passaria a carregar cada linha).
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import leaderboards
+from .kpis import (
+    CREATED_CONTRIBUTIONS, DELETED_CONTRIBUTIONS, MUTABLE_CONTRIBUTIONS, apply_delta, contribution_delta,
+)
+from .levels import forget_catalog, refresh_current_levels
+from .models import CustomUser, Level, PlatformBankDetails, PlatformSettings, Task, UserLevel
+from .versions import (
+    LEVEL_CATALOG, PLATFORM_BANK_DETAILS, PLATFORM_SETTINGS, bump_version, user_version_name,
+)
+
+GLOBAL_VERSIONS = {
+    PlatformSettings: PLATFORM_SETTINGS,
+    PlatformBankDetails: PLATFORM_BANK_DETAILS,
+    Level: LEVEL_CATALOG,
+}
+
+
+def bump_global_version(sender, **kwargs):
+    bump_version(GLOBAL_VERSIONS[sender])
+
+
+for model in GLOBAL_VERSIONS:
+    post_save.connect(bump_global_version, sender=model)
+    post_delete.connect(bump_global_version, sender=model)
+
+
+@receiver(post_save, sender=CustomUser)
+def bump_user_version(sender, instance, **kwargs):
+    bump_version(user_version_name(instance.pk))
+
+
+@receiver(post_save, sender=Level)
+@receiver(post_delete, sender=Level)
+def forget_level_catalog(sender, **kwargs):
+    # Este processo recarrega já; os outros até LEVEL_CATALOG_CHECK_SECONDS depois
+    forget_catalog()
+
+
+@receiver(post_save, sender=UserLevel)
+@receiver(post_delete, sender=UserLevel)
+def refresh_user_current_level(sender, instance, raw=False, **kwargs):
+    # Recalcula o nível atual do usuário (core/levels.py), o que renova o seu carimbo
+    if not raw:
+        refresh_current_levels([instance.user_id])
+
+
+# --- INDICADORES DIÁRIOS (core/kpis.py) ---
+
+def remember_previous_kpi_row(sender, instance, raw=False, **kwargs):
+    # Só as alterações (aprovações, mudanças de status) precisam do estado anterior
+    instance._kpi_previous = None
+    if not raw and not instance._state.adding and instance.pk:
+        instance._kpi_previous = sender.objects.filter(pk=instance.pk).first()
+
+
+def update_kpis_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if sender in MUTABLE_CONTRIBUTIONS:
+        contribution = MUTABLE_CONTRIBUTIONS[sender]
+        previous = getattr(instance, '_kpi_previous', None)
+        apply_delta(contribution_delta(contribution(instance), previous and contribution(previous)))
+    elif created:
+        apply_delta(contribution_delta(CREATED_CONTRIBUTIONS[sender](instance)))
+
+
+def update_kpis_on_delete(sender, instance, **kwargs):
+    contribution = MUTABLE_CONTRIBUTIONS.get(sender) or DELETED_CONTRIBUTIONS[sender]
+    apply_delta(contribution_delta(old=contribution(instance)))
+
+
+for model in MUTABLE_CONTRIBUTIONS:
+    pre_save.connect(remember_previous_kpi_row, sender=model)
+    post_save.connect(update_kpis_on_save, sender=model)
+    post_delete.connect(update_kpis_on_delete, sender=model)
+for model in CREATED_CONTRIBUTIONS:
+    post_save.connect(update_kpis_on_save, sender=model)
+for model in DELETED_CONTRIBUTIONS:
+    post_delete.connect(update_kpis_on_delete, sender=model)
+
+
+# --- RANKINGS (core/leaderboards.py) ---
+
+LEADERBOARD_EVENTS = {
+    CustomUser: leaderboards.user_registered,
+    UserLevel: leaderboards.level_purchased,
+    Task: leaderboards.task_completed,
+}
+
+
+def update_leaderboards(sender, instance, created, raw=False, **kwargs):
+    # Só eventos novos: o arquivo de Task e as edições no admin não mexem nos rankings
+    if created and not raw:
+        LEADERBOARD_EVENTS[sender](instance)
+
+
+for model in LEADERBOARD_EVENTS:
+    post_save.connect(update_leaderboards, sender=model)
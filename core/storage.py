@@ -0,0 +1,36 @@
+import json
+
+from django.core.files.base import ContentFile
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+from .images import RESPONSIVE_IMAGES_MANIFEST, is_responsive_candidate, save_variants
+
+
+class ResponsiveStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """
+    Storage estático do WhiteNoise com um passo extra no collectstatic:
+    para cada JPEG/PNG gera variantes WebP/AVIF em várias larguras e grava
+    o mapa original -> variantes em RESPONSIVE_IMAGES_MANIFEST.
+
+    As variantes entram na lista de ficheiros do ManifestStaticFilesStorage,
+    por isso também recebem hash no nome e cache de longa duração.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            responsive_manifest = {}
+            for name in list(paths):
+                if not is_responsive_candidate(name):
+                    continue
+                storage, path = paths[name]
+                with storage.open(path) as source:
+                    variants = save_variants(self, source, name)
+                for variant in variants:
+                    paths[variant['name']] = (self, variant['name'])
+                responsive_manifest[name] = variants
+
+            if self.exists(RESPONSIVE_IMAGES_MANIFEST):
+                self.delete(RESPONSIVE_IMAGES_MANIFEST)
+            self._save(RESPONSIVE_IMAGES_MANIFEST, ContentFile(json.dumps(responsive_manifest).encode()))
+
+        yield from super().post_process(paths, dry_run, **options)
@@ -0,0 +1,246 @@
+"""
+Dados sintéticos com volume de produção, para medir desempenho localmente
+(manage.py generate_data) e alimentar o benchmark (core/benchmark.py).
+
+Os usuários gerados têm telefone com o prefixo SYNTHETIC_PHONE_PREFIX e
+código de convite iniciado por 'z' (os códigos reais são hexadecimais), por
+isso nunca colidem com dados reais e podem ser apagados com delete_synthetic().
+"""
+import csv
+import io
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import DateTimeField, Max
+from django.utils import timezone
+
+from .levels import bump_level_catalog, refresh_current_levels
+from .models import CustomUser, Deposit, Level, Roulette, Task, UserLevel, Withdrawal
+
+SYNTHETIC_PHONE_PREFIX = '80'
+SYNTHETIC_PASSWORD = 'sintetico-123'
+GENERATION_CHUNK_SIZE = 5000
+# Período coberto pelos históricos gerados
+HISTORY_DAYS = 365
+
+# Proporções aproximadas observadas em produção
+INVITED_RATIO = 0.7        # usuários que chegaram por convite
+BUYER_RATIO = 0.4          # usuários que compraram pelo menos um nível
+SECOND_LEVEL_RATIO = 0.15  # compradores com um segundo nível
+WITHDRAWAL_RATIO = 0.3     # compradores que já pediram saques
+MAX_TASK_DAYS = 30         # tarefas diárias geradas por nível (no máximo)
+
+DEFAULT_LEVELS = [
+    # nome, depósito, ganho diário
+    ('VIP 1', 5000, 200),
+    ('VIP 2', 15000, 650),
+    ('VIP 3', 40000, 1800),
+    ('VIP 4', 100000, 4700),
+    ('VIP 5', 250000, 12500),
+]
+# Os níveis baratos são os mais comprados
+LEVEL_WEIGHTS = [50, 25, 15, 7, 3]
+
+
+def _base36(number):
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+    encoded = ''
+    while True:
+        number, remainder = divmod(number, 36)
+        encoded = digits[remainder] + encoded
+        if not number:
+            return encoded
+
+
+def synthetic_users():
+    return CustomUser.objects.filter(phone_number__startswith=SYNTHETIC_PHONE_PREFIX, invite_code__startswith='z')
+
+
+def copy_rows(model, field_names, rows, batch_size=5000):
+    """
+    Inserção rápida sem instanciar modelos: COPY no PostgreSQL e executemany
+    nas outras bases. 'rows' são tuplos na ordem de field_names (chaves
+    estrangeiras pelo id); todas as colunas NOT NULL têm de ser indicadas.
+    As datas são gravadas tal como geradas (auto_now_add não se aplica).
+    """
+    if not rows:
+        return
+    # A ligação real (e não o proxy 'connection') evita uma procura por valor
+    db = connections[DEFAULT_DB_ALIAS]
+    fields = [model._meta.get_field(name) for name in field_names]
+    table = db.ops.quote_name(model._meta.db_table)
+    columns = ', '.join(db.ops.quote_name(field.column) for field in fields)
+    # Só as datas (sempre com fuso horário) precisam da conversão do backend
+    converters = [index for index, field in enumerate(fields) if isinstance(field, DateTimeField)]
+    adapt = db.ops.adapt_datetimefield_value
+
+    def prepared(row):
+        if not converters:
+            return row
+        row = list(row)
+        for index in converters:
+            row[index] = adapt(row[index])
+        return row
+
+    with db.cursor() as cursor:
+        if db.vendor == 'postgresql':
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(prepared(row) for row in rows)
+            buffer.seek(0)
+            cursor.cursor.copy_expert(f'COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+            return
+        placeholders = ', '.join(['%s'] * len(fields))
+        sql = f'INSERT INTO {table} ({columns}) VALUES ({placeholders})'
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(sql, [prepared(row) for row in rows[start:start + batch_size]])
+
+
+def ensure_levels():
+    levels = list(Level.objects.order_by('deposit_value'))
+    if levels:
+        return levels
+    Level.objects.bulk_create(
+        Level(
+            name=name, deposit_value=deposit, daily_gain=daily_gain, monthly_gain=daily_gain * 30,
+            cycle_days=90, image='level_images/sintetico.jpg',
+        )
+        for name, deposit, daily_gain in DEFAULT_LEVELS
+    )
+    # bulk_create não envia sinais: renova o catálogo em cache (core/levels.py)
+    bump_level_catalog()
+    return list(Level.objects.order_by('deposit_value'))
+
+
+class SyntheticDataGenerator:
+    """
+    Gera 'total' usuários em blocos de 'chunk_size', cada bloco numa
+    transação com os seus níveis, tarefas, roletas, depósitos e saques.
+
+    A árvore de convites segue uma ligação preferencial: cada convidado
+    escolhe um convidante entre os usuários anteriores, com forte preferência
+    pelos mais antigos, o que produz poucas equipas muito grandes e muitas
+    pequenas, como em produção.
+    """
+
+    def __init__(self, total, chunk_size=GENERATION_CHUNK_SIZE, seed=None, now=None, progress=None):
+        self.total = total
+        self.chunk_size = chunk_size
+        self.random = random.Random(seed)
+        self.now = now or timezone.now()
+        self.progress = progress
+        self.password = make_password(SYNTHETIC_PASSWORD)
+        self.levels = ensure_levels()
+        self.level_weights = (LEVEL_WEIGHTS * len(self.levels))[:len(self.levels)]
+        # Continua a numeração depois do último usuário sintético existente
+        last_phone = synthetic_users().aggregate(last=Max('phone_number'))['last']
+        self.start = int(last_phone[len(SYNTHETIC_PHONE_PREFIX):]) + 1 if last_phone else 0
+        # Ids dos usuários sintéticos já existentes (candidatos a convidantes)
+        self.user_ids = list(synthetic_users().order_by('pk').values_list('pk', flat=True))
+        self.counts = {'users': 0, 'user_levels': 0, 'tasks': 0, 'roulettes': 0, 'deposits': 0, 'withdrawals': 0}
+
+    def run(self):
+        for offset in range(0, self.total, self.chunk_size):
+            size = min(self.chunk_size, self.total - offset)
+            with transaction.atomic():
+                self.generate_chunk(self.start + offset, size)
+            if self.progress:
+                self.progress(self.counts)
+        return self.counts
+
+    def joined_at(self, index):
+        # Os índices crescem com a data de registo ao longo de HISTORY_DAYS
+        position = index / max(self.start + self.total, 1)
+        return self.now - timedelta(days=HISTORY_DAYS * (1 - position), seconds=self.random.randint(0, 3600))
+
+    def pick_inviter(self):
+        if not self.user_ids or self.random.random() > INVITED_RATIO:
+            return None
+        return self.user_ids[int(len(self.user_ids) * self.random.random() ** 3)]
+
+    def generate_chunk(self, first_index, size):
+        # Insere por lotes pequenos para que os usuários de um lote possam ser
+        # convidados pelos dos lotes anteriores do mesmo bloco
+        batch_size = max(1, min(1000, self.total // 20))
+        users = []
+        for start in range(first_index, first_index + size, batch_size):
+            batch = [
+                CustomUser(
+                    phone_number=f'{SYNTHETIC_PHONE_PREFIX}{index:08d}',
+                    invite_code='z' + _base36(index).rjust(7, '0'),
+                    password=self.password,
+                    date_joined=self.joined_at(index),
+                    invited_by_id=self.pick_inviter(),
+                    available_balance=Decimal(self.random.randrange(0, 50000)),
+                )
+                for index in range(start, min(start + batch_size, first_index + size))
+            ]
+            batch = CustomUser.objects.bulk_create(batch)
+            if batch[0].pk is None:
+                # Bases de dados sem RETURNING: recupera os ids pelo telefone
+                ids = dict(synthetic_users().filter(
+                    phone_number__in=[user.phone_number for user in batch]
+                ).values_list('phone_number', 'pk'))
+                for user in batch:
+                    user.pk = ids[user.phone_number]
+            self.user_ids.extend(user.pk for user in batch)
+            users.extend(batch)
+        self.counts['users'] += len(users)
+        self.generate_histories(users)
+
+    def generate_histories(self, users):
+        user_levels, tasks, roulettes, deposits, withdrawals = [], [], [], [], []
+        for user in users:
+            if self.random.random() > BUYER_RATIO:
+                continue
+            purchases = 2 if self.random.random() < SECOND_LEVEL_RATIO else 1
+            for level in self.random.choices(self.levels, weights=self.level_weights, k=purchases):
+                age = (self.now - user.date_joined).total_seconds()
+                purchase_date = user.date_joined + timedelta(seconds=self.random.uniform(0, age))
+                deposits.append((
+                    user.pk, level.deposit_value, 'deposit_proofs/sintetico.jpg', '', '', True,
+                    purchase_date - timedelta(hours=1),
+                ))
+                expired = (self.now - purchase_date).days >= level.cycle_days
+                user_levels.append((user.pk, level.pk, purchase_date, not expired))
+                task_days = min((self.now - purchase_date).days, level.cycle_days, MAX_TASK_DAYS)
+                for day in range(task_days):
+                    tasks.append((
+                        user.pk, level.daily_gain,
+                        purchase_date + timedelta(days=day, minutes=self.random.randint(0, 600)),
+                    ))
+                for _ in range(self.random.randint(0, 3)):
+                    roulettes.append((
+                        user.pk, self.random.choice([100, 200, 300, 500, 1000]),
+                        purchase_date + timedelta(hours=self.random.randint(1, 24 * 30)), True,
+                    ))
+            if self.random.random() < WITHDRAWAL_RATIO:
+                for _ in range(self.random.randint(1, 4)):
+                    withdrawals.append((
+                        user.pk, self.random.choice([3000, 5000, 10000]),
+                        self.random.choice(['Aprovado', 'Aprovado', 'Pending']),
+                        user.date_joined + timedelta(days=self.random.randint(1, 60)),
+                    ))
+
+        copy_rows(UserLevel, ['user', 'level', 'purchase_date', 'is_active'], user_levels)
+        copy_rows(Task, ['user', 'earnings', 'completed_at'], tasks)
+        copy_rows(Roulette, ['user', 'prize', 'spin_date', 'is_approved'], roulettes)
+        copy_rows(Deposit, [
+            'user', 'amount', 'proof_of_payment', 'proof_thumbnail', 'proof_staged_name', 'is_approved', 'created_at',
+        ], deposits)
+        copy_rows(Withdrawal, ['user', 'amount', 'status', 'created_at'], withdrawals)
+        # copy_rows não envia sinais: atualiza o nível atual dos compradores (core/levels.py)
+        refresh_current_levels({user_id for user_id, _, _, _ in user_levels})
+
+        self.counts['user_levels'] += len(user_levels)
+        self.counts['tasks'] += len(tasks)
+        self.counts['roulettes'] += len(roulettes)
+        self.counts['deposits'] += len(deposits)
+        self.counts['withdrawals'] += len(withdrawals)
+
+
+def delete_synthetic():
+    """Apaga os usuários sintéticos (os históricos seguem por CASCADE)."""
+    return synthetic_users().delete()[0]
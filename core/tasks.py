@@ -0,0 +1,73 @@
+"""
+Tarefas executadas pelo worker da fila (manage.py run_jobs).
+Os agendamentos periódicos ficam em settings.PERIODIC_JOBS.
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .archive import ARCHIVES, archive_history
+from .commissions import settle_all
+from .jobs import task
+from .leaderboards import purge_old_periods, trim_periods
+from .levels import refresh_current_levels
+from .models import Job, Level, UserLevel
+
+# Tarefas registadas noutros módulos também têm de ser importadas pelo worker
+from .campaigns import run_grant_campaign  # noqa: F401
+from .uploads import purge_abandoned_uploads, upload_deposit_proof  # noqa: F401
+
+# Tarefas concluídas há mais tempo do que isto são apagadas
+FINISHED_JOB_RETENTION = timedelta(days=7)
+
+
+@task
+def settle_referral_commissions():
+    """Liquida as comissões de convite das compras de nível novas (core/commissions.py)."""
+    return settle_all()
+
+
+@task(atomic=True)
+def expire_level_cycles():
+    """
+    Desativa os níveis cujo ciclo (Level.cycle_days) terminou e recalcula o
+    nível atual (current_level, active_level_count, level_active) dos usuários afetados.
+    """
+    now = timezone.now()
+    affected_users = set()
+    for level in Level.objects.all():
+        expired = UserLevel.objects.filter(
+            level=level, is_active=True,
+            purchase_date__lt=now - timedelta(days=level.cycle_days),
+        )
+        user_ids = set(expired.values_list('user_id', flat=True))
+        if user_ids:
+            expired.update(is_active=False)
+            affected_users |= user_ids
+
+    if affected_users:
+        refresh_current_levels(affected_users)
+    return len(affected_users)
+
+
+@task
+def archive_old_history():
+    """Move Task e Roulette de meses antigos para o arquivo (core/archive.py)."""
+    return {name: archive_history(name) for name in ARCHIVES}
+
+
+@task
+def purge_finished_jobs():
+    Job.objects.filter(
+        status=Job.STATUS_DONE,
+        finished_at__lt=timezone.now() - FINISHED_JOB_RETENTION,
+    ).delete()
+
+
+@task
+def purge_leaderboards():
+    """
+    Apaga os dias e as semanas antigos dos rankings e corta os restantes às
+    primeiras linhas mantidas (core/leaderboards.py).
+    """
+    return purge_old_periods() + trim_periods()
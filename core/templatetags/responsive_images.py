@@ -0,0 +1,64 @@
+import json
+from functools import lru_cache
+
+from django import template
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.storage import default_storage
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from ..images import MIME_TYPES, RESPONSIVE_IMAGES_MANIFEST, available_formats, srcset
+
+register = template.Library()
+
+
+@lru_cache(maxsize=1)
+def _static_variants():
+    """
+    Lê o mapa de variantes gerado pelo collectstatic.
+    Em desenvolvimento (sem collectstatic) o mapa não existe e os templates
+    usam apenas a imagem original.
+    """
+    try:
+        with staticfiles_storage.open(RESPONSIVE_IMAGES_MANIFEST) as manifest:
+            return json.load(manifest)
+    except (FileNotFoundError, OSError, ValueError):
+        return {}
+
+
+def _picture(variants, url, fallback_src, alt, sizes, css_class, loading):
+    sources = format_html_join(
+        '',
+        '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (MIME_TYPES[fmt], srcset(variants, fmt, url), sizes)
+            for fmt in available_formats()
+            if any(v['format'] == fmt for v in variants)
+        ),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" alt="{}" class="{}" loading="{}" decoding="async"></picture>',
+        sources, fallback_src, alt, css_class, loading,
+    )
+
+
+@register.simple_tag
+def static_picture(path, alt='', sizes='100vw', css_class='', loading='lazy'):
+    """
+    {% static_picture 'ddb/images/image1.jpg' alt='...' sizes='100vw' %}
+    Emite um <picture> com as variantes WebP/AVIF do ficheiro estático.
+    """
+    variants = _static_variants().get(path, [])
+    return _picture(variants, static, static(path), alt, sizes, css_class, loading)
+
+
+@register.simple_tag
+def level_picture(level, alt='', sizes='96px', css_class='', loading='lazy'):
+    """
+    {% level_picture level sizes='96px' %}
+    Emite um <picture> com as variantes geradas em Level.save().
+    """
+    if not level.image:
+        return ''
+    variants = (level.image_variants or {}).get('variants', [])
+    return _picture(variants, default_storage.url, level.image.url, alt or level.name, sizes, css_class, loading)
@@ -1,3 +1,1866 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import runpy
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections, models, transaction
+from django.db.models import F
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import (
+    announcements, archive, balances, benchmark, campaigns, commissions, contention, images, jobs, kpis, levels,
+    leaderboards, metrics, phones, profiler, quotas, ratelimit, reconcile, routers, runner, synthetic, tasks, timeline,
+    uploads, versions, views,
+)
+from . import urls as core_urls
+from .middleware import ReplicaMiddleware
+from .templatetags import responsive_images
+from .models import (
+    Announcement, BankDetails, CampaignGrant, CustomUser, DailyRewardCode, Deposit, GrantCampaign, Job, LeaderboardScore, Level, PlatformBankDetails, PlatformSettings,
+    ProofUpload, ReferralCommission, Roulette, RouletteArchive, RouletteSettings, Task, TaskArchive, UserLevel,
+    UserMonthlyActivity, UserRewardClaim, VersionStamp, Withdrawal,
+)
+
+
+def make_jpeg(size=(3000, 4000), orientation=None):
+    """Imagem de teste semelhante a uma foto de telemóvel."""
+    image = Image.effect_noise(size, 64).convert('RGB')
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=95, exif=exif)
+    return buffer.getvalue()
+
+
+class LocalStorageTestMixin:
+    """Substitui o Cloudinary e o staging por diretórios temporários."""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.staging_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.staging_root, ignore_errors=True)
+
+        media_override = override_settings(MEDIA_ROOT=self.media_root, PROOF_UPLOAD_ASYNC=False)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+        self.staging = FileSystemStorage(location=self.staging_root)
+        staging_patch = mock.patch.object(uploads, 'local_staging_storage', self.staging)
+        staging_patch.start()
+        self.addCleanup(staging_patch.stop)
+
+
+def make_png(size=(1000, 500)):
+    buffer = io.BytesIO()
+    Image.effect_noise(size, 64).convert('RGBA').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class ResponsiveImageTests(LocalStorageTestMixin, TestCase):
+    def render(self, source, **context):
+        return Template('{% load responsive_images %}' + source).render(Context(context))
+
+    def test_build_variants(self):
+        variants = images.build_variants(io.BytesIO(make_png()), 'ddb/images/banner.png', widths=(320, 640, 2000), formats=['webp'])
+
+        # 2000 é maior do que a original; a original (1000) entra por ser bem maior do que 640
+        self.assertEqual([meta['width'] for meta, _ in variants], [320, 640, 1000])
+        self.assertEqual(variants[0][0]['name'], 'ddb/images/banner.w320.webp')
+        for meta, content in variants:
+            with Image.open(io.BytesIO(content)) as encoded:
+                self.assertEqual(encoded.format, 'WEBP')
+                self.assertEqual(encoded.size, (meta['width'], meta['width'] // 2))
+
+    def test_level_save_generates_variants_for_level_picture(self):
+        level = Level.objects.create(
+            name='VIP1', deposit_value=1000, daily_gain=50, monthly_gain=1500, cycle_days=30,
+            image=SimpleUploadedFile('vip1.jpg', make_jpeg(size=(600, 400)), content_type='image/jpeg'),
+        )
+
+        level.refresh_from_db()
+        self.assertEqual(level.image_variants['source'], level.image.name)
+        variants = level.image_variants['variants']
+        self.assertEqual(sorted({v['width'] for v in variants}), [96, 192, 480, 600])
+        self.assertEqual({v['format'] for v in variants}, set(images.available_formats()))
+        for variant in variants:
+            self.assertTrue(os.path.exists(os.path.join(self.media_root, variant['name'])))
+
+        html = self.render('{% level_picture level %}', level=level)
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn(f"{variants[0]['name']} 96w", html)
+        self.assertIn(f'src="{level.image.url}"', html)
+
+    def test_level_save_tolerates_missing_or_unreadable_image(self):
+        broken = SimpleUploadedFile('vip2.jpg', b'isto nao e uma imagem', content_type='image/jpeg')
+        for name, image, log_level in [('VIP1', 'level_images/em-falta.jpg', 'INFO'), ('VIP2', broken, 'WARNING')]:
+            with self.subTest(name), self.assertLogs('core.models', log_level):
+                level = Level.objects.create(
+                    name=name, deposit_value=1000, daily_gain=50, monthly_gain=1500, cycle_days=30, image=image,
+                )
+            level.refresh_from_db()
+            self.assertEqual(level.image_variants, {})
+            html = self.render('{% level_picture level %}', level=level)
+            self.assertNotIn('<source', html)
+            self.assertIn(f'src="{level.image.url}"', html)
+
+    def test_collectstatic_post_processing(self):
+        source_dir = tempfile.mkdtemp()
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source_dir, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, static_root, ignore_errors=True)
+        os.makedirs(os.path.join(source_dir, 'images'))
+        with open(os.path.join(source_dir, 'images', 'banner.png'), 'wb') as banner:
+            banner.write(make_png())
+        with open(os.path.join(source_dir, 'site.css'), 'w') as stylesheet:
+            stylesheet.write('body { margin: 0; }')
+
+        storages = {**settings.STORAGES, 'staticfiles': {'BACKEND': 'core.storage.ResponsiveStaticFilesStorage'}}
+        with override_settings(STATIC_ROOT=static_root, STATICFILES_DIRS=[('ddb', source_dir)], STORAGES=storages):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            responsive_images._static_variants.cache_clear()
+            self.addCleanup(responsive_images._static_variants.cache_clear)
+
+            with open(os.path.join(static_root, images.RESPONSIVE_IMAGES_MANIFEST)) as manifest:
+                variants = json.load(manifest)
+            # Só os JPEG/PNG têm variantes, que recebem hash e compressão como os outros ficheiros
+            self.assertEqual(list(variants), ['ddb/images/banner.png'])
+            for variant in variants['ddb/images/banner.png']:
+                self.assertTrue(os.path.exists(os.path.join(static_root, variant['name'])))
+            html = self.render("{% static_picture 'ddb/images/banner.png' %}")
+            self.assertIn('<source type="image/webp"', html)
+            self.assertIn('banner.w320.', html)
+            self.assertRegex(html, r'src="/static/ddb/images/banner\.[0-9a-f]{12}\.png"')
+
+
+class DepositProofUploadTests(LocalStorageTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.create_user('923000001', 'senha-forte-123')
+        self.client.force_login(self.user)
+
+    def post_deposit(self, content):
+        proof = SimpleUploadedFile('foto.jpg', content, content_type='image/jpeg')
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('deposito'), {'amount': '5000', 'proof_of_payment': proof})
+
+    def test_proof_is_rotated_downsized_and_thumbnailed(self):
+        original = make_jpeg(size=(4000, 3000), orientation=6)
+        response = self.post_deposit(original)
+
+        self.assertEqual(response.status_code, 200)
+        deposit = Deposit.objects.get(user=self.user)
+        self.assertEqual(deposit.proof_staged_name, '')
+        self.assertLess(deposit.proof_of_payment.size, len(original))
+
+        with Image.open(deposit.proof_of_payment) as stored:
+            # Orientação 6 = rodado 90°, por isso a imagem fica em modo retrato
+            self.assertEqual(stored.size, (1200, 1600))
+        with Image.open(deposit.proof_thumbnail) as thumbnail:
+            self.assertEqual(thumbnail.width, uploads.PROOF_THUMBNAIL_WIDTH)
+
+        self.assertEqual(self.staging.listdir(uploads.PROOF_STAGING_PREFIX)[1], [])
+
+    def test_upload_is_deferred_until_scheduled_work_runs(self):
+        proof = SimpleUploadedFile('foto.jpg', make_jpeg(size=(800, 600)), content_type='image/jpeg')
+        # Sem executar os callbacks de on_commit, o envio definitivo ainda não aconteceu
+        self.client.post(reverse('deposito'), {'amount': '5000', 'proof_of_payment': proof})
+
+        deposit = Deposit.objects.get(user=self.user)
+        staged_name = deposit.proof_staged_name
+        self.assertFalse(deposit.proof_of_payment)
+        self.assertTrue(self.staging.exists(staged_name))
+
+        uploads.upload_deposit_proof(deposit.pk)
+        deposit.refresh_from_db()
+        self.assertTrue(deposit.proof_of_payment)
+        self.assertFalse(self.staging.exists(staged_name))
+
+    @override_settings(PROOF_UPLOAD_ASYNC=True)
+    def test_async_upload_stages_in_storage_shared_with_worker(self):
+        self.post_deposit(make_jpeg(size=(800, 600)))
+
+        deposit = Deposit.objects.get(user=self.user)
+        staged_name = deposit.proof_staged_name
+        # O worker não vê o disco do processo web: o comprovativo espera no storage definitivo
+        self.assertTrue(staged_name.startswith(uploads.PROOF_STAGING_PREFIX))
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, staged_name)))
+        self.assertFalse(self.staging.exists(staged_name))
+        self.assertTrue(Job.objects.filter(name=uploads.upload_deposit_proof.job_name).exists())
+
+        uploads.upload_deposit_proof(deposit.pk)
+        deposit.refresh_from_db()
+        self.assertTrue(deposit.proof_of_payment)
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, staged_name)))
+
+
+class InterruptedStream(io.BytesIO):
+    """Corpo de pedido que falha depois de 'cut' bytes, como uma ligação móvel que cai."""
+
+    def __init__(self, data, cut):
+        super().__init__(data[:cut])
+
+    def read(self, size=-1):
+        data = super().read(size)
+        if not data:
+            raise OSError('ligação interrompida')
+        return data
+
+
+class ChunkedProofUploadTests(LocalStorageTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.create_user('923000002', 'senha-forte-123')
+        self.client.force_login(self.user)
+        self.content = make_jpeg(size=(1200, 900))
+
+    def init_upload(self):
+        response = self.client.post(reverse('proof_upload_init'), {'amount': '5000', 'size': len(self.content)})
+        self.assertEqual(response.status_code, 201)
+        return response.json()['upload_id']
+
+    def put_chunk(self, upload_id, offset, data):
+        url = reverse('proof_upload_chunk', args=[upload_id]) + f'?offset={offset}'
+        return self.client.put(url, data, content_type='application/octet-stream')
+
+    def status(self, upload_id):
+        return self.client.get(reverse('proof_upload_chunk', args=[upload_id])).json()['offset']
+
+    def finalise(self, upload_id):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('proof_upload_finalise', args=[upload_id]))
+
+    def test_resume_after_connection_drops_mid_chunk(self):
+        upload_id = self.init_upload()
+        half = len(self.content) // 2
+
+        # O servidor recebe apenas parte da primeira metade antes da queda
+        request = RequestFactory().put('/?offset=0', b'', content_type='application/octet-stream')
+        request.user = self.user
+        request._stream = InterruptedStream(self.content, cut=half // 3)
+        views.proof_upload_chunk(request, upload_id)
+
+        offset = self.status(upload_id)
+        self.assertEqual(offset, half // 3)
+
+        # O cliente retoma a partir do offset informado pelo servidor
+        self.assertEqual(self.put_chunk(upload_id, offset, self.content[offset:half]).json()['offset'], half)
+        self.assertEqual(self.put_chunk(upload_id, half, self.content[half:]).json()['offset'], len(self.content))
+
+        response = self.finalise(upload_id)
+        self.assertEqual(response.status_code, 200)
+        deposit = Deposit.objects.get(pk=response.json()['deposit_id'])
+        self.assertEqual(deposit.user, self.user)
+        self.assertTrue(deposit.proof_of_payment)
+        self.assertTrue(deposit.proof_thumbnail)
+
+    def test_resent_chunk_after_lost_response_is_idempotent(self):
+        upload_id = self.init_upload()
+        half = len(self.content) // 2
+
+        self.put_chunk(upload_id, 0, self.content[:half])
+        # A resposta perdeu-se: o cliente reenvia a mesma parte
+        self.assertEqual(self.put_chunk(upload_id, 0, self.content[:half]).json()['offset'], half)
+        self.put_chunk(upload_id, half, self.content[half:])
+
+        self.assertEqual(self.finalise(upload_id).status_code, 200)
+        upload = ProofUpload.objects.get(pk=upload_id)
+        self.assertEqual(upload.received_size, len(self.content))
+
+    def test_gap_and_incomplete_finalise_are_rejected(self):
+        upload_id = self.init_upload()
+
+        response = self.put_chunk(upload_id, 100, self.content[100:200])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 0)
+
+        self.put_chunk(upload_id, 0, self.content[:100])
+        response = self.finalise(upload_id)
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Deposit.objects.exists())
+
+    def test_chunk_beyond_declared_size_is_rejected(self):
+        upload_id = self.init_upload()
+        response = self.put_chunk(upload_id, 0, self.content + b'extra')
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.status(upload_id), 0)
+
+    def test_abandoned_uploads_and_parts_are_purged(self):
+        abandoned, finished, recent = self.init_upload(), self.init_upload(), self.init_upload()
+        for upload_id in (abandoned, finished, recent):
+            self.put_chunk(upload_id, 0, self.content[:100])
+        self.put_chunk(finished, 100, self.content[100:])
+        self.finalise(finished)
+        ProofUpload.objects.filter(pk__in=[abandoned, finished]).update(created_at=timezone.now() - timedelta(days=2))
+
+        self.assertEqual(uploads.purge_abandoned_uploads(), 2)
+        self.assertEqual(list(ProofUpload.objects.values_list('pk', flat=True)), [uuid.UUID(recent)])
+        self.assertEqual(self.staging.listdir('chunks')[1], [f'{recent}.part'])
+
+        # Ficheiro parcial sem escritas há mais de um dia, num disco que o worker não limpou
+        old = time.time() - 2 * 86400
+        os.utime(self.staging.path(f'chunks/{recent}.part'), (old, old))
+        self.assertEqual(uploads.purge_stale_chunks(force=True), 1)
+        response = self.put_chunk(recent, 100, self.content[100:])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 0)
+        self.assertEqual(self.status(recent), 0)
+
+
+class ConditionalResponseTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('923000003', 'senha-forte-123')
+        self.settings = PlatformSettings.objects.create(
+            whatsapp_link='https://wa.me/1', history_text='Historia', deposit_instruction='-', withdrawal_instruction='-',
+        )
+        self.level = Level.objects.create(
+            name='VIP1', deposit_value=1000, daily_gain=50, monthly_gain=1500, cycle_days=30, image='x.jpg',
+        )
+
+    def get(self, view, **headers):
+        request = RequestFactory().get('/', headers=headers)
+        request.user = self.user
+        return view(request)
+
+    def test_repeat_visit_gets_304_with_one_query(self):
+        for view in (views.sobre, views.nivel, views.deposito):
+            with self.subTest(view=view.__name__):
+                first = self.get(view)
+                self.assertEqual(first.status_code, 200)
+                self.assertIn('no-cache', first['Cache-Control'])
+
+                # Só os carimbos, pela chave primária
+                with self.assertNumQueries(1):
+                    repeat = self.get(view, if_none_match=first['ETag'])
+                self.assertEqual(repeat.status_code, 304)
+
+                with self.assertNumQueries(1):
+                    repeat = self.get(view, if_modified_since=first['Last-Modified'])
+                self.assertEqual(repeat.status_code, 304)
+
+    def test_settings_change_invalidates_sobre(self):
+        first = self.get(views.sobre)
+        self.settings.history_text = 'Nova historia'
+        self.settings.save()
+        self.assertEqual(self.get(views.sobre, if_none_match=first['ETag']).status_code, 200)
+
+    def test_user_change_invalidates_nivel_only_for_that_user(self):
+        first = self.get(views.nivel)
+        other = CustomUser.objects.create_user('923000004', 'senha-forte-123')
+        other.available_balance = 10
+        other.save()
+        self.assertEqual(self.get(views.nivel, if_none_match=first['ETag']).status_code, 304)
+
+        self.user.available_balance = 5000
+        self.user.save()
+        self.assertEqual(self.get(views.nivel, if_none_match=first['ETag']).status_code, 200)
+
+    def test_full_request_returns_304(self):
+        self.client.force_login(self.user)
+        first = self.client.get(reverse('sobre'))
+        self.assertEqual(self.client.get(reverse('sobre'), headers={'if-none-match': first['ETag']}).status_code, 304)
+
+    def test_stamps_see_worker_credits(self):
+        # Os carimbos vivem na base de dados, partilhada com o worker
+        first = self.get(views.nivel)
+        with self.captureOnCommitCallbacks(execute=True):
+            balances.credit_balances({self.user.pk: Decimal('10')}, fields=('available_balance',))
+        self.assertEqual(self.get(views.nivel, if_none_match=first['ETag']).status_code, 200)
+
+    def test_bump_writes_without_counting_rows(self):
+        names = [versions.LEVEL_CATALOG, *(versions.user_version_name(pk) for pk in range(1000, 1050))]
+        versions.get_versions(versions.LEVEL_CATALOG)
+        with self.assertNumQueries(1):
+            versions.bump_version(*names)
+        self.assertEqual(VersionStamp.objects.filter(name__in=names).count(), 51)
+
+
+calls = []
+
+
+@jobs.task(name='test_flaky', max_attempts=2)
+def flaky_task(value):
+    calls.append(value)
+    raise RuntimeError('falha simulada')
+
+
+@jobs.task(name='test_enqueue_follow_up', atomic=True)
+def enqueue_follow_up_task(value):
+    calls.append(value)
+    jobs.enqueue(flaky_task, value)
+
+
+@override_settings(PERIODIC_JOBS={})
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_failed_job_is_retried_with_backoff_then_marked_failed(self):
+        jobs.enqueue(flaky_task, 'x')
+
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.assertEqual(jobs.run_pending(), 1)
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_PENDING, 1))
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=jobs.JOB_BACKOFF_BASE - 5))
+        self.assertIn('falha simulada', job.last_error)
+
+        # Ainda dentro do backoff: nada a correr
+        self.assertEqual(jobs.run_pending(), 0)
+
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.jobs', 'ERROR'):
+            jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_FAILED, 2))
+        self.assertEqual(calls, ['x', 'x'])
+
+    def test_claimed_job_is_not_claimed_twice(self):
+        jobs.enqueue(flaky_task, 'x')
+        self.assertEqual(len(jobs.claim_jobs(worker='a')), 1)
+        self.assertEqual(jobs.claim_jobs(worker='b'), [])
+
+    def test_stale_running_job_is_released(self):
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        jobs.enqueue(flaky_task, 'x', run_at=an_hour_ago)
+        jobs.claim_jobs(worker='a', now=an_hour_ago)
+        self.assertEqual(jobs.release_stale_jobs(), 1)
+        self.assertEqual(Job.objects.get().status, Job.STATUS_PENDING)
+
+    def test_heartbeat_keeps_long_running_job_claimed(self):
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        jobs.enqueue(flaky_task, 'x', run_at=an_hour_ago)
+        jobs.claim_jobs(worker='a', now=an_hour_ago)
+        self.assertEqual(jobs.heartbeat('a'), 1)
+        self.assertEqual(jobs.release_stale_jobs(), 0)
+        self.assertEqual(Job.objects.get().status, Job.STATUS_RUNNING)
+
+    def test_result_of_reclaimed_job_is_discarded(self):
+        jobs.enqueue(enqueue_follow_up_task, 'x')
+        [job] = jobs.claim_jobs(worker='a')
+        # Entretanto a tarefa foi devolvida à fila e reservada por outro worker
+        Job.objects.filter(pk=job.pk).update(locked_by='b')
+
+        with self.assertLogs('core.jobs', 'WARNING'):
+            self.assertFalse(jobs.run_job(job))
+        self.assertEqual(calls, ['x'])
+        # A tarefa atómica foi revertida e o estado do outro worker mantém-se
+        self.assertEqual(list(Job.objects.values_list('status', 'locked_by')), [(Job.STATUS_RUNNING, 'b')])
+
+    @override_settings(PERIODIC_JOBS={'purge_finished_jobs': '30 3 * * *'})
+    def test_periodic_jobs_are_scheduled_once_per_occurrence(self):
+        now = timezone.make_aware(datetime(2026, 1, 5, 10, 0))
+        jobs.schedule_periodic_jobs(now)
+        jobs.schedule_periodic_jobs(now + timedelta(minutes=5))
+
+        job = Job.objects.get()
+        self.assertEqual(job.name, 'purge_finished_jobs')
+        self.assertEqual(timezone.localtime(job.run_at), timezone.make_aware(datetime(2026, 1, 6, 3, 30)))
+
+    def test_cron_schedule(self):
+        schedule = jobs.CronSchedule('*/15 8-9 * * 1')  # segundas, 08:00–09:45
+        monday = timezone.make_aware(datetime(2026, 1, 5, 9, 50))
+        self.assertEqual(schedule.next_after(monday), timezone.make_aware(datetime(2026, 1, 12, 8, 0)))
+        with self.assertRaises(ValueError):
+            jobs.CronSchedule('61 * * * *')
+
+    def test_expire_level_cycles(self):
+        user = CustomUser.objects.create_user('923000005', 'senha-forte-123', level_active=True)
+        level = Level.objects.create(
+            name='VIP1', deposit_value=1000, daily_gain=50, monthly_gain=1500, cycle_days=30, image='x.jpg',
+        )
+        user_level = UserLevel.objects.create(user=user, level=level)
+        UserLevel.objects.filter(pk=user_level.pk).update(purchase_date=timezone.now() - timedelta(days=31))
+
+        self.assertEqual(tasks.expire_level_cycles(), 1)
+        user.refresh_from_db()
+        self.assertFalse(user.level_active)
+        self.assertFalse(UserLevel.objects.get().is_active)
+
+
+
+class ReferralCommissionTests(TestCase):
+    def setUp(self):
+        self.level = Level.objects.create(
+            name='VIP1', deposit_value=1000, daily_gain=50, monthly_gain=1500, cycle_days=30, image='x.jpg',
+        )
+        # Cadeia: avo -> pai -> filho -> neto
+        self.grandparent = CustomUser.objects.create_user('923100001', 'senha-forte-123')
+        self.parent = CustomUser.objects.create_user('923100002', 'senha-forte-123', invited_by=self.grandparent)
+        self.child = CustomUser.objects.create_user('923100003', 'senha-forte-123', invited_by=self.parent)
+        self.later = timezone.now() + timedelta(minutes=1)
+
+    def buy(self, user):
+        return UserLevel.objects.create(user=user, level=self.level)
+
+    def balances(self):
+        return [
+            CustomUser.objects.get(pk=user.pk).subsidy_balance
+            for user in (self.grandparent, self.parent, self.child)
+        ]
+
+    @override_settings(REFERRAL_COMMISSION_RATES=['0.15', '0.05', '0.01'])
+    def test_multi_tier_commissions_are_settled_once(self):
+        self.buy(self.child)
+        self.assertEqual(commissions.settle_all(now=self.later), 1)
+        self.assertEqual(self.balances(), [Decimal('50.00'), Decimal('150.00'), Decimal('0.00')])
+
+        # Repetir não paga de novo
+        self.assertEqual(commissions.settle_all(now=self.later), 0)
+        self.assertEqual(ReferralCommission.objects.count(), 2)
+        self.assertTrue(CustomUser.objects.get(pk=self.child.pk).first_level_invested_paid_to_inviter)
+
+    def test_only_first_purchase_pays_by_default(self):
+        self.buy(self.child)
+        self.buy(self.child)
+        self.buy(self.parent)
+        commissions.settle_all(now=self.later)
+        # 15% do filho para o pai e 15% do pai para o avô, só na primeira compra
+        self.assertEqual(self.balances(), [Decimal('150.00'), Decimal('150.00'), Decimal('0.00')])
+
+    def test_recent_purchases_wait_for_the_settlement_lag(self):
+        self.buy(self.child)
+        self.assertEqual(commissions.settle_all(), 0)
+        self.assertEqual(commissions.settle_all(now=self.later), 1)
+
+    def test_purchase_committed_after_the_watermark_is_settled(self):
+        # A compra 50 faz commit depois de a marca já ter passado a 100
+        other = CustomUser.objects.create_user('923100004', 'senha-forte-123', invited_by=self.grandparent)
+        UserLevel.objects.create(id=100, user=other, level=self.level)
+        self.assertEqual(commissions.settle_all(now=self.later), 1)
+        UserLevel.objects.create(id=50, user=self.child, level=self.level)
+
+        self.assertEqual(commissions.settle_all(now=self.later), 1)
+        self.assertEqual(self.balances(), [Decimal('150.00'), Decimal('150.00'), Decimal('0.00')])
+        self.assertEqual(commissions.settle_all(now=self.later), 0)
+        # Fora de SETTLEMENT_LOOKBACK já não é revista
+        UserLevel.objects.create(id=60, user=self.parent, level=self.level)
+        self.assertEqual(commissions.settle_all(now=self.later + commissions.SETTLEMENT_LOOKBACK), 0)
+
+    def test_small_batches_cover_all_purchases(self):
+        for n in range(5):
+            invitee = CustomUser.objects.create_user(f'92320000{n}', 'senha-forte-123', invited_by=self.parent)
+            self.buy(invitee)
+        self.assertEqual(commissions.settle_all(batch_size=2, now=self.later), 5)
+        self.assertEqual(CustomUser.objects.get(pk=self.parent.pk).available_balance, Decimal('750.00'))
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir, ignore_errors=True)
+        patcher = mock.patch.object(metrics, 'METRICS_DIR', metrics_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.staff = CustomUser.objects.create_user('923300001', 'senha-forte-123', is_staff=True)
+
+    def test_metrics_are_recorded_per_view_and_staff_only(self):
+        self.client.get(reverse('health'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+        self.client.force_login(self.staff)
+        self.client.get(reverse('sobre'))
+        body = self.client.get(reverse('metrics')).content.decode()
+
+        self.assertIn('ddb_http_requests_total{view="health",method="GET",status="200"}', body)
+        self.assertIn('ddb_http_request_duration_seconds_bucket{view="sobre",le="+Inf"}', body)
+        self.assertIn('ddb_db_queries_per_request_count{view="sobre"}', body)
+        self.assertIn('# TYPE ddb_http_requests_in_flight gauge', body)
+
+    @override_settings(METRICS_TOKEN='segredo')
+    def test_metrics_token(self):
+        response = self.client.get(reverse('metrics'), headers={'authorization': 'Bearer segredo'})
+        self.assertEqual(response.status_code, 200)
+
+    def write_worker_file(self, pid):
+        with open(os.path.join(metrics.METRICS_DIR, f'{pid}.json'), 'w') as worker_file:
+            json.dump({
+                'pid': pid,
+                'counters': [['ddb_http_requests_total', [['view', 'menu'], ['method', 'GET'], ['status', 200]], 5]],
+                'histograms': [],
+                'gauges': [['ddb_http_requests_in_flight', [], 3]],
+            }, worker_file)
+
+    def test_files_from_other_workers_are_summed(self):
+        key = ('ddb_http_requests_total', (('view', 'menu'), ('method', 'GET'), ('status', 200)))
+        # Os testes anteriores também contam no processo atual
+        before = metrics.collect()[0].get(key, 0)
+        self.client.get(reverse('menu'))
+        # Outro worker vivo (o processo pai serve de exemplo)
+        self.write_worker_file(os.getppid())
+
+        counters, _, gauges = metrics.collect()
+        self.assertEqual(counters[key], before + 6)
+        self.assertEqual(gauges[('ddb_http_requests_in_flight', ())], 3)
+
+    def test_dead_worker_counters_keep_counting_after_startup(self):
+        key = ('ddb_http_requests_total', (('view', 'menu'), ('method', 'GET'), ('status', 200)))
+        before = metrics.collect()[0].get(key, 0)
+        for pid in (999999998, 999999999):
+            self.write_worker_file(pid)
+
+        metrics.absorb_dead_process_files()
+        metrics.absorb_dead_process_files()
+
+        names = set(os.listdir(metrics.METRICS_DIR))
+        self.assertIn(metrics.RETIRED_FILE, names)
+        self.assertFalse(names & {'999999998.json', '999999999.json'})
+        counters, _, gauges = metrics.collect()
+        self.assertEqual(counters[key], before + 10)
+        self.assertEqual(gauges.get(('ddb_http_requests_in_flight', ()), 0), 0)
+
+    def test_ready(self):
+        response = self.client.get(reverse('ready'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['checks']['database'], 'ok')
+
+    def test_ready_hides_error_details(self):
+        with mock.patch.object(cache, 'set', side_effect=OSError('/srv/app/.cache: Permission denied')):
+            with self.assertLogs('core.views', 'ERROR'):
+                response = self.client.get(reverse('ready'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['checks']['cache'], 'indisponível')
+        self.assertNotIn('Permission denied', response.content.decode())
+
+
+class ProfilerTests(TestCase):
+    def setUp(self):
+        profiles_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, profiles_dir, ignore_errors=True)
+        patcher = mock.patch.object(profiler, 'PROFILES_DIR', profiles_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.staff = CustomUser.objects.create_user('923400001', 'senha-forte-123', is_staff=True)
+        self.user = CustomUser.objects.create_user('923400002', 'senha-forte-123')
+
+    def test_only_staff_requests_with_header_are_profiled(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('perfil'), headers={'x-profile': '1'})
+        self.assertNotIn('X-Profile-Id', response)
+
+        self.client.force_login(self.staff)
+        self.assertNotIn('X-Profile-Id', self.client.get(reverse('perfil')))
+        self.assertEqual(profiler.list_profiles(), [])
+
+        response = self.client.get(reverse('perfil'), headers={'x-profile': '1'})
+        profile = profiler.load_profile(response['X-Profile-Id'])
+        self.assertEqual(profile['view'], 'perfil')
+        self.assertEqual(profile['query_count'], len(profile['queries']))
+        self.assertTrue(any(query['explain'] for query in profile['queries']))
+        self.assertTrue(profile['functions'])
+
+    def test_cookie_toggle_and_admin_pages(self):
+        self.client.force_login(self.staff)
+        self.client.get(reverse('profile_list'), {'cookie': '1'})
+        first = self.client.get(reverse('sobre'))['X-Profile-Id']
+        second = self.client.get(reverse('perfil'))['X-Profile-Id']
+
+        self.assertContains(self.client.get(reverse('profile_list')), second)
+        self.assertContains(self.client.get(reverse('profile_detail', args=[first])), 'EXPLAIN')
+        self.assertContains(self.client.get(reverse('profile_diff'), {'a': first, 'b': second}), 'B - A')
+        self.assertEqual(self.client.get(reverse('profile_detail', args=['..settings'])).status_code, 404)
+
+        self.client.get(reverse('profile_list'), {'cookie': '0'})
+        self.assertNotIn('X-Profile-Id', self.client.get(reverse('sobre')))
+
+    def test_admin_pages_are_staff_only(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('profile_list')).status_code, 302)
+
+
+# Orçamentos por rota de core/urls.py: (método, dados, máximo de consultas SQL, tempo máximo em ms).
+# Qualquer aumento de consultas falha o build; ao otimizar uma view, baixe o número aqui.
+# As rotas que gravam eventos contam os indicadores (core/kpis.py) no pior caso: a primeira
+# escrita do dia numa fração cria a linha (3 consultas; depois, 1).
+VIEW_BUDGETS = {
+    'home': ('get', {}, 2, 250),
+    'menu': ('get', {}, 4, 250),
+    'cadastro': ('get', {}, 1, 250),
+    'login': ('get', {}, 1, 250),
+    'logout': ('get', {}, 4, 250),
+    'deposito': ('get', {}, 6, 250),
+    'proof_upload_init': ('post', {'amount': '5000', 'size': '1000'}, 3, 250),
+    'proof_upload_chunk': ('get', {}, 3, 250),
+    'proof_upload_finalise': ('post', {}, 5, 250),
+    'saque': ('get', {}, 5, 500),
+    'tarefa': ('get', {}, 2, 250),
+    'premios_subsidios': ('get', {}, 3, 250),
+    'claim_daily_reward': ('post', {'reward_code': 'HOJE'}, 11, 250),
+    'process_task': ('post', {}, 13, 250),
+    'nivel': ('get', {}, 5, 250),
+    'equipa': ('get', {}, 3, 500),
+    'roleta': ('get', {}, 2, 250),
+    'spin_roulette': ('post', {}, 11, 250),
+    'sobre': ('get', {}, 4, 250),
+    'perfil': ('get', {}, 3, 250),
+    'renda': ('get', {}, 7, 250),
+    'historico': ('get', {}, 9, 250),
+    'historico_api': ('get', {}, 9, 250),
+    'snapshot': ('get', {}, 3, 250),
+    'leaderboard': ('get', {}, 2, 250),
+    'avisos': ('get', {}, 4, 250),
+    'metrics': ('get', {}, 2, 250),
+    'health': ('get', {}, 0, 250),
+    'ready': ('get', {}, 1, 250),
+    'change_password': ('get', {}, 2, 250),
+    'change_password_done': ('get', {}, 2, 250),
+}
+
+# Orçamentos das listas do admin: (máximo de consultas SQL, tempo máximo em ms)
+ADMIN_CHANGELIST_BUDGETS = {
+    'auth.group': (5, 1000),
+    'core.customuser': (5, 1000),
+    'core.platformsettings': (5, 1000),
+    'core.level': (5, 1000),
+    'core.bankdetails': (5, 1000),
+    'core.platformbankdetails': (5, 1000),
+    'core.deposit': (5, 1000),
+    'core.withdrawal': (6, 1000),
+    'core.task': (5, 1000),
+    'core.roulette': (5, 1000),
+    'core.roulettesettings': (5, 1000),
+    'core.userlevel': (5, 1000),
+    'core.dailyrewardcode': (5, 1000),
+    'core.userrewardclaim': (6, 1000),
+    'core.referralcommission': (6, 1000),
+    'core.settlementwatermark': (5, 1000),
+    'core.job': (6, 1000),
+    'core.taskarchive': (5, 1000),
+    'core.roulettearchive': (5, 1000),
+    'core.usermonthlyactivity': (5, 1000),
+    'core.grantcampaign': (5, 1000),
+    'core.announcement': (5, 1000),
+}
+
+# Os tempos variam com a carga da máquina: por omissão só são reportados (as consultas
+# falham sempre). RENDER_BUDGET_ENFORCE=1 faz falhar os tempos acima do orçamento, que
+# máquinas de CI lentas podem alargar com RENDER_BUDGET_FACTOR.
+RENDER_BUDGET_ENFORCE = os.environ.get('RENDER_BUDGET_ENFORCE', '') == '1'
+RENDER_BUDGET_FACTOR = float(os.environ.get('RENDER_BUDGET_FACTOR', '1'))
+
+
+@override_settings(PERIODIC_JOBS={})
+class QueryBudgetTests(TestCase):
+    """
+    Cada rota e cada lista do admin, com dados de volume realista (equipa
+    grande, histórico longo de tarefas, muitos níveis), fica dentro do
+    orçamento de consultas e de tempo das tabelas acima (o de tempo só
+    com RENDER_BUDGET_ENFORCE).
+    """
+    TEAM_SIZE = 150
+    HISTORY_SIZE = 300
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        PlatformSettings.objects.create(
+            whatsapp_link='https://wa.me/1', history_text='Histórico',
+            deposit_instruction='Deposite', withdrawal_instruction='Levante',
+        )
+        PlatformBankDetails.objects.bulk_create(
+            PlatformBankDetails(bank_name=f'Banco {i}', IBAN=f'AO06{i:021d}', account_holder_name='DDB') for i in range(3)
+        )
+        RouletteSettings.objects.create(prizes='100,200,500,1000,5000')
+        level_rows = Level.objects.bulk_create(
+            Level(
+                name=f'VIP {i}', deposit_value=5000 * i, daily_gain=200 * i, monthly_gain=6000 * i,
+                cycle_days=90, image='x.jpg',
+            )
+            for i in range(1, 13)
+        )
+
+        cls.user = CustomUser.objects.create_user('923500000', 'senha-forte-123', available_balance=100000, roulette_spins=5)
+        cls.staff = CustomUser.objects.create_superuser('923500001', 'senha-forte-123')
+        BankDetails.objects.create(user=cls.user, bank_name='BAI', IBAN='AO06000000000000000000000', account_holder_name='Teste')
+        UserLevel.objects.create(user=cls.user, level=level_rows[0])
+
+        team = CustomUser.objects.bulk_create(
+            CustomUser(phone_number=f'9236{i:05d}', invite_code=f'eq{i:06d}', invited_by=cls.user, password='!')
+            for i in range(cls.TEAM_SIZE)
+        )
+        purchases = UserLevel.objects.bulk_create(
+            UserLevel(user=member, level=level_rows[i % len(level_rows)]) for i, member in enumerate(team) if i % 2 == 0
+        )
+        # bulk_create não envia sinais: nível atual como depois do backfill
+        levels.refresh_current_levels([member.pk for member in team])
+        ReferralCommission.objects.bulk_create(
+            ReferralCommission(user_level=purchase, beneficiary=cls.user, tier=1, amount=750) for purchase in purchases
+        )
+
+        Task.objects.bulk_create(Task(user=cls.user, earnings=200) for _ in range(cls.HISTORY_SIZE))
+        Roulette.objects.bulk_create(Roulette(user=cls.user, prize=100, is_approved=True) for _ in range(cls.HISTORY_SIZE))
+        old = now - timedelta(days=400)
+        TaskArchive.objects.bulk_create(
+            TaskArchive(id=10**6 + i, user=team[i % 10], earnings=200, completed_at=old) for i in range(cls.HISTORY_SIZE)
+        )
+        RouletteArchive.objects.bulk_create(
+            RouletteArchive(id=10**6 + i, user=team[i % 10], prize=100, spin_date=old) for i in range(cls.HISTORY_SIZE)
+        )
+        UserMonthlyActivity.objects.bulk_create(
+            UserMonthlyActivity(user=member, month=old.date().replace(day=1), task_count=30, task_earnings=6000)
+            for member in team
+        )
+        Deposit.objects.bulk_create(
+            Deposit(user=cls.user, amount=5000, is_approved=i % 2 == 0, proof_of_payment=f'deposit_proofs/{i}.jpg')
+            for i in range(cls.HISTORY_SIZE)
+        )
+        Withdrawal.objects.bulk_create(
+            Withdrawal(user=cls.user, amount=3000, status='Aprovado' if i % 2 else 'Pending') for i in range(cls.HISTORY_SIZE)
+        )
+        today = timezone.localdate()
+        codes = DailyRewardCode.objects.bulk_create(
+            DailyRewardCode(code=f'C{i}', reward_amount=100, created_date=today - timedelta(days=i + 1), is_active=False)
+            for i in range(30)
+        )
+        DailyRewardCode.objects.create(code='HOJE', reward_amount=100)
+        UserRewardClaim.objects.bulk_create(
+            UserRewardClaim(user=cls.user, reward_code=code, claim_date=code.created_date) for code in codes
+        )
+        Job.objects.bulk_create(Job(name='purge_finished_jobs', run_at=now) for _ in range(50))
+        Announcement.objects.bulk_create(
+            Announcement(title=f'Aviso {i}', message='Texto', audience=Announcement.AUDIENCE_CHOICES[i % 3][0])
+            for i in range(cls.HISTORY_SIZE)
+        )
+        cls.upload = ProofUpload.objects.create(user=cls.user, amount=5000, total_size=1000)
+        # Carimbos já existentes, como em produção (os pedidos medidos são desfeitos)
+        versions.get_versions(
+            versions.PLATFORM_SETTINGS, versions.PLATFORM_BANK_DETAILS, versions.LEVEL_CATALOG,
+            versions.user_version_name(cls.user.pk), versions.user_version_name(cls.staff.pk),
+        )
+
+    def request_kwargs(self, name):
+        if name in ('proof_upload_chunk', 'proof_upload_finalise'):
+            return {'upload_id': self.upload.pk}
+        return {}
+
+    def measure(self, method, url, data):
+        """Executa o pedido num savepoint desfeito no fim, para não alterar os dados das rotas seguintes."""
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = getattr(self.client, method)(url, data)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+            transaction.set_rollback(True)
+        self.assertLess(response.status_code, 500)
+        return len(queries), elapsed_ms
+
+    def assert_within_budget(self, label, user, url, method, data, max_queries, max_ms):
+        # Primeiro pedido aquece templates e caches; o segundo é o medido.
+        # A sessão é refeita antes de cada pedido (logout termina-a).
+        self.client.force_login(user)
+        self.measure(method, url, data)
+        self.client.force_login(user)
+        query_count, elapsed_ms = self.measure(method, url, data)
+        with self.subTest(label):
+            self.assertLessEqual(
+                query_count, max_queries,
+                f'{label}: {query_count} consultas (orçamento {max_queries})',
+            )
+            message = f'{label}: {elapsed_ms:.0f} ms (orçamento {max_ms} ms)'
+            if RENDER_BUDGET_ENFORCE:
+                self.assertLessEqual(elapsed_ms, max_ms * RENDER_BUDGET_FACTOR, message)
+            elif elapsed_ms > max_ms * RENDER_BUDGET_FACTOR:
+                sys.stderr.write(f'\nAcima do orçamento de tempo: {message}\n')
+
+    def test_every_route_has_a_budget(self):
+        routes = {pattern.name for pattern in core_urls.urlpatterns if pattern.name}
+        self.assertEqual(routes, set(VIEW_BUDGETS))
+        changelists = {model._meta.label_lower for model in admin.site._registry}
+        self.assertEqual(changelists, set(ADMIN_CHANGELIST_BUDGETS))
+
+    def test_view_budgets(self):
+        for name, (method, data, max_queries, max_ms) in VIEW_BUDGETS.items():
+            # Rotas de staff (metrics) com o superusuário, as restantes com o usuário comum
+            user = self.staff if name == 'metrics' else self.user
+            url = reverse(name, kwargs=self.request_kwargs(name))
+            self.assert_within_budget(name, user, url, method, data, max_queries, max_ms)
+
+    def test_admin_changelist_budgets(self):
+        for label, (max_queries, max_ms) in ADMIN_CHANGELIST_BUDGETS.items():
+            app_label, model_name = label.split('.')
+            url = reverse(f'admin:{app_label}_{model_name}_changelist')
+            self.assert_within_budget(label, self.staff, url, 'get', {}, max_queries, max_ms)
+
+
+class SyntheticDataTests(TestCase):
+    def test_generator_builds_invite_tree_and_histories(self):
+        counts = synthetic.SyntheticDataGenerator(400, chunk_size=150, seed=7).run()
+
+        users = synthetic.synthetic_users()
+        self.assertEqual(users.count(), 400)
+        self.assertEqual(counts['users'], 400)
+        # Convidantes são sempre usuários anteriores (árvore sem ciclos)
+        self.assertFalse(users.filter(invited_by_id__gte=models.F('pk')).exists())
+        self.assertGreater(users.filter(invited_by__isnull=False).count(), 200)
+        self.assertEqual(UserLevel.objects.filter(user__in=users).count(), counts['user_levels'])
+        self.assertEqual(Task.objects.count(), counts['tasks'])
+        # As datas geradas são gravadas (e não a hora da inserção)
+        self.assertLess(Task.objects.earliest('completed_at').completed_at, timezone.now() - timedelta(days=30))
+        self.assertEqual(
+            users.filter(level_active=True).count(),
+            UserLevel.objects.filter(user__in=users, is_active=True).values('user').distinct().count(),
+        )
+
+        # Uma segunda execução continua a numeração
+        synthetic.SyntheticDataGenerator(10, seed=8).run()
+        self.assertEqual(users.count(), 410)
+        synthetic.delete_synthetic()
+        self.assertFalse(users.exists())
+
+    @override_settings(ALLOWED_HOSTS=[benchmark.BENCHMARK_HOST])
+    def test_benchmark_reports_percentiles(self):
+        synthetic.SyntheticDataGenerator(30, seed=9).run()
+        runner = benchmark.BenchmarkRunner(synthetic.synthetic_users()[:3], concurrency=1, requests=12, warmup=1)
+        [summary] = runner.run(['menu'])
+        self.assertEqual(summary['requests'], 12)
+        self.assertEqual(summary['statuses'], {200: 12})
+        self.assertLessEqual(summary['p50_ms'], summary['p95_ms'])
+        self.assertLessEqual(summary['p95_ms'], summary['p99_ms'])
+        self.assertGreater(summary['rps'], 0)
+
+    def test_sqlite_contention_benchmark(self):
+        with tempfile.TemporaryDirectory() as directory:
+            runner = benchmark.SQLiteContentionBenchmark(
+                os.path.join(directory, 'bench.sqlite3'), threads=2, operations=30, write_ratio=0.5,
+            )
+            connection = runner.connect('tuned')
+            self.assertEqual(connection.execute('PRAGMA journal_mode').fetchone(), ('wal',))
+            connection.close()
+            summaries = [runner.run(mode) for mode in ('default', 'tuned')]
+
+        for summary in summaries:
+            self.assertEqual(summary['read']['operations'] + summary['write']['operations'], 60)
+        # Com BEGIN IMMEDIATE as escritas esperam pelo bloqueio em vez de falhar
+        self.assertEqual(summaries[1]['write']['lock_errors'], 0)
+        self.assertIn('tuned', benchmark.format_sqlite_report(summaries))
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 0.50), 50)
+        self.assertEqual(benchmark.percentile(values, 0.99), 99)
+        self.assertEqual(benchmark.percentile([], 0.5), 0.0)
+
+
+class HistoryArchiveTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('923600001', 'senha-forte-123', subsidy_balance=500)
+        self.other = CustomUser.objects.create_user('923600002', 'senha-forte-123')
+        self.now = timezone.now()
+        # 10 meses de tarefas (3 por mês) e roletas (1 por mês)
+        for months_ago in range(10):
+            day = self.now - timedelta(days=30 * months_ago + 1)
+            for user in (self.user, self.other):
+                tasks_created = Task.objects.bulk_create(Task(user=user, earnings=200) for _ in range(3))
+                Task.objects.filter(pk__in=[task.pk for task in tasks_created]).update(completed_at=day)
+                spin = Roulette.objects.create(user=user, prize=100 + months_ago, is_approved=True)
+                Roulette.objects.filter(pk=spin.pk).update(spin_date=day)
+
+    def renda_total(self):
+        self.client.force_login(self.user)
+        return self.client.get(reverse('renda')).context['total_income']
+
+    def test_archive_moves_old_months_and_keeps_totals(self):
+        total_before = self.renda_total()
+        cutoff = archive.archive_cutoff(self.now)
+        old_tasks = Task.objects.filter(completed_at__lt=cutoff).count()
+        old_prizes = Roulette.objects.filter(user=self.user, spin_date__lt=cutoff).aggregate(total=models.Sum('prize'))['total']
+
+        moved = archive.archive_history('task', now=self.now, chunk_size=7)
+        archive.archive_history('roulette', now=self.now, chunk_size=7)
+
+        self.assertEqual(moved, old_tasks)
+        self.assertFalse(Task.objects.filter(completed_at__lt=cutoff).exists())
+        self.assertTrue(Task.objects.filter(completed_at__gte=cutoff).exists())
+        self.assertEqual(TaskArchive.objects.count(), old_tasks)
+        self.assertEqual(self.renda_total(), total_before)
+
+        rollups = UserMonthlyActivity.objects.filter(user=self.user)
+        self.assertEqual(sum(rollup.task_count for rollup in rollups), old_tasks // 2)
+        self.assertEqual(sum(rollup.roulette_prizes for rollup in rollups), old_prizes)
+        self.assertEqual(RouletteArchive.objects.filter(user=self.user).count(), rollups.count())
+        # Nada mais a mover
+        self.assertEqual(archive.archive_history('task', now=self.now), 0)
+
+    def test_interrupted_run_resumes_without_double_counting(self):
+        spec = archive.ARCHIVES['task']
+        cutoff = archive.archive_cutoff(self.now)
+        archive.archive_chunk(spec, cutoff, chunk_size=5)
+        with mock.patch.object(archive.UserMonthlyActivity.objects, 'bulk_create', side_effect=RuntimeError('falha')):
+            with self.assertRaises(RuntimeError):
+                archive.archive_chunk(spec, cutoff, chunk_size=5)
+        # O lote falhado foi desfeito por inteiro
+        self.assertEqual(TaskArchive.objects.count(), 5)
+
+        archive.archive_history('task', now=self.now, chunk_size=5)
+        archived = UserMonthlyActivity.objects.aggregate(total=models.Sum('task_count'))['total']
+        self.assertEqual(archived, TaskArchive.objects.count())
+        self.assertEqual(Task.objects.count() + TaskArchive.objects.count(), 60)
+
+    def test_command_dry_run(self):
+        out = io.StringIO()
+        call_command('archive_history', 'task', '--dry-run', stdout=out)
+        self.assertIn('linhas por arquivar', out.getvalue())
+        self.assertFalse(TaskArchive.objects.exists())
+
+
+class KPITests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('923700001', 'senha-forte-123')
+        self.staff = CustomUser.objects.create_superuser('923700002', 'senha-forte-123')
+        level = synthetic.ensure_levels()[0]
+        UserLevel.objects.create(user=self.user, level=level)
+        Task.objects.create(user=self.user, earnings=200)
+        Roulette.objects.create(user=self.user, prize=500, is_approved=True)
+        self.deposit = Deposit.objects.create(user=self.user, amount=5000)
+        Deposit.objects.create(user=self.user, amount=15000, is_approved=True)
+        self.withdrawal = Withdrawal.objects.create(user=self.user, amount=3000)
+
+    def test_incremental_totals_match_rebuild(self):
+        today = kpis.daily_kpis(1)[0]
+        self.assertEqual(today['new_users'], 2)
+        self.assertEqual(today['deposits_count'], 2)
+        self.assertEqual(today['deposits_approved_amount'], 15000)
+        self.assertEqual(today['level_purchases_amount'], 5000)
+        self.assertEqual(today['tasks_earnings'], 200)
+        self.assertEqual(today['roulette_prizes'], 500)
+
+        incremental = (kpis.daily_kpis(), kpis.pending_counters())
+        call_command('rebuild_kpis', stdout=io.StringIO())
+        self.assertEqual((kpis.daily_kpis(), kpis.pending_counters()), incremental)
+
+    def test_approvals_and_deletes_move_the_counters(self):
+        pending = kpis.pending_counters()
+        self.assertEqual(pending[kpis.PENDING_DEPOSITS], {'count': 1, 'amount': 5000})
+        self.assertEqual(pending[kpis.PENDING_WITHDRAWALS], {'count': 1, 'amount': 3000})
+
+        self.deposit.is_approved = True
+        self.deposit.save()
+        self.withdrawal.status = kpis.WITHDRAWAL_APPROVED_STATUS
+        self.withdrawal.save()
+        pending = kpis.pending_counters()
+        self.assertEqual(pending[kpis.PENDING_DEPOSITS]['count'], 0)
+        self.assertEqual(pending[kpis.PENDING_WITHDRAWALS]['count'], 0)
+        today = kpis.daily_kpis(1)[0]
+        self.assertEqual(today['deposits_approved_amount'], 20000)
+        self.assertEqual(today['withdrawals_approved_amount'], 3000)
+
+        self.withdrawal.delete()
+        self.assertEqual(kpis.daily_kpis(1)[0]['withdrawals_count'], 0)
+
+    def test_deleted_user_leaves_new_users(self):
+        CustomUser.objects.create_user('923700003', 'senha-forte-123').delete()
+        self.assertEqual(kpis.daily_kpis(1)[0]['new_users'], 2)
+
+        new_users = kpis.daily_kpis(1)[0]['new_users']
+        call_command('rebuild_kpis', stdout=io.StringIO())
+        self.assertEqual(kpis.daily_kpis(1)[0]['new_users'], new_users)
+
+    def test_archival_and_bulk_deletes_keep_kpis(self):
+        Task.objects.filter(user=self.user).update(completed_at=timezone.now() - timedelta(days=200))
+        call_command('rebuild_kpis', stdout=io.StringIO())
+        before = kpis.daily_kpis(400)
+        archive.archive_history('task')
+        self.assertEqual(kpis.daily_kpis(400), before)
+        # Sem receptores genéricos de post_delete, o Django apaga numa só instrução
+        with CaptureQueriesContext(connection) as queries:
+            Roulette.objects.filter(user=self.user).delete()
+        self.assertEqual(len(queries), 1)
+
+    def test_dashboard_is_staff_only_and_reads_only_kpi_tables(self):
+        url = reverse('kpi_dashboard')
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(self.staff)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['pending'][kpis.PENDING_DEPOSITS]['count'], 1)
+        tables = {kpis.DailyKPI._meta.db_table, kpis.KPICounter._meta.db_table}
+        source_tables = {model._meta.db_table for model in (Deposit, Withdrawal, Task, Roulette, UserLevel)}
+        for query in queries.captured_queries:
+            self.assertFalse(any(f'"{table}"' in query['sql'] for table in source_tables), query['sql'])
+        self.assertEqual(sum(any(table in query['sql'] for table in tables) for query in queries.captured_queries), 2)
+
+
+class TimelineTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('923800001', 'senha-forte-123')
+        other = CustomUser.objects.create_user('923800002', 'senha-forte-123')
+        code = DailyRewardCode.objects.create(code='HIST', reward_amount=300)
+        now = timezone.now()
+        # Vários tipos com datas iguais (desempate por tipo e id) e linhas arquivadas
+        for offset in range(12):
+            at = now - timedelta(hours=offset // 3)
+            for model, date_field, values in (
+                (Deposit, 'created_at', {'amount': 5000, 'is_approved': offset % 2 == 0}),
+                (Withdrawal, 'created_at', {'amount': 3000}),
+                (Task, 'completed_at', {'earnings': 200}),
+                (Roulette, 'spin_date', {'prize': 100}),
+            ):
+                row = model.objects.create(user=self.user, **values)
+                model.objects.filter(pk=row.pk).update(**{date_field: at})
+            Task.objects.create(user=other, earnings=200)
+        claim = UserRewardClaim.objects.create(user=self.user, reward_code=code)
+        UserRewardClaim.objects.filter(pk=claim.pk).update(claimed_at=now - timedelta(days=1))
+        old = Task.objects.create(user=self.user, earnings=150)
+        Task.objects.filter(pk=old.pk).update(completed_at=now - timedelta(days=200))
+        archive.archive_history('task', now=now)
+        self.total = 12 * 4 + 2
+
+    def walk(self, limit, **kwargs):
+        entries, cursor, pages = [], None, 0
+        while True:
+            page, cursor = timeline.user_timeline(self.user, cursor=cursor, limit=limit, **kwargs)
+            entries.extend(page)
+            pages += 1
+            if not cursor:
+                return entries, pages
+
+    def test_pages_cover_every_row_once_in_order(self):
+        entries, pages = self.walk(limit=7)
+        self.assertEqual(len(entries), self.total)
+        self.assertEqual(pages, 8)
+        self.assertEqual(len({(entry['kind'], entry['id']) for entry in entries}), self.total)
+        keys = [(entry['at'], timeline.KINDS.index(entry['kind']), entry['id']) for entry in entries]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+        # A tarefa arquivada aparece no fim; os saques saem do saldo
+        self.assertEqual(entries[-1]['amount'], 150)
+        self.assertTrue(all(entry['amount'] < 0 for entry in entries if entry['kind'] == 'withdrawal'))
+
+    def test_withdrawal_status_labels(self):
+        withdrawals = list(Withdrawal.objects.filter(user=self.user).order_by('pk')[:3])
+        for withdrawal, status in zip(withdrawals, ['Aprovado', 'Rejeitado']):
+            withdrawal.status = status
+            withdrawal.save()
+        entries, _ = self.walk(limit=50, kinds=['withdrawal'])
+        statuses = {entry['id']: entry['status'] for entry in entries}
+        self.assertEqual([statuses[withdrawal.pk] for withdrawal in withdrawals], ['Aprovado', 'Rejeitado', 'Pendente'])
+
+    def test_kind_filter(self):
+        entries, _ = self.walk(limit=5, kinds=['withdrawal', 'reward'])
+        self.assertEqual({entry['kind'] for entry in entries}, {'withdrawal', 'reward'})
+        self.assertEqual(len(entries), 13)
+
+    def test_later_pages_cost_the_same_queries(self):
+        self.client.force_login(self.user)
+        url = reverse('historico_api')
+        with CaptureQueriesContext(connection) as first:
+            response = self.client.get(url, {'limite': 5})
+        with CaptureQueriesContext(connection) as later:
+            self.client.get(url, {'limite': 5, 'cursor': response.json()['next_cursor']})
+        self.assertEqual(len(later), len(first))
+        self.assertEqual(len(response.json()['results']), 5)
+
+    def test_invalid_cursor(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('historico_api'), {'cursor': 'x.y'}).status_code, 400)
+        self.assertRedirects(self.client.get(reverse('historico'), {'cursor': '1.nada.2'}), reverse('historico'))
+        response = self.client.get(reverse('historico'))
+        self.assertEqual(len(response.context['entries']), timeline.PAGE_SIZE)
+
+
+class SnapshotTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('923900001', 'senha-forte-123', roulette_spins=2, subsidy_balance=750)
+        levels = synthetic.ensure_levels()
+        UserLevel.objects.create(user=self.user, level=levels[0])
+        UserLevel.objects.create(user=self.user, level=levels[1])
+        self.client.force_login(self.user)
+        self.url = reverse('snapshot')
+
+    def test_snapshot_reads_only_the_user_row(self):
+        # A sessão e o usuário (autenticação) e o carimbo do usuário; o estado está na linha do usuário
+        levels.level_catalog()  # catálogo de níveis já em memória, como num processo aquecido
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertEqual(response.json(), {
+            'available_balance': '0.00',
+            'subsidy_balance': '750.00',
+            'roulette_spins': 2,
+            'active_level': {'name': 'VIP 2', 'daily_gain': '650.00'},
+            'task_done_today': False,
+            'reward_claimed_today': False,
+        })
+
+    def test_etag_until_task_is_done(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(3):
+            repeat = self.client.get(self.url, headers={'if-none-match': first['ETag']})
+        self.assertEqual(repeat.status_code, 304)
+
+        # O carimbo do usuário é renovado depois do commit (core/balances.py)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('process_task'))
+        response = self.client.get(self.url, headers={'if-none-match': first['ETag']})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['task_done_today'])
+
+    def test_etag_and_daily_flags_change_at_midnight(self):
+        self.client.post(reverse('process_task'))
+        first = self.client.get(self.url)
+        self.assertTrue(first.json()['task_done_today'])
+        # O ETag diário e as quotas do dia usam o mesmo "hoje" (timezone.localdate)
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        with mock.patch('django.utils.timezone.localdate', return_value=tomorrow):
+            response = self.client.get(self.url, headers={'if-none-match': first['ETag']})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['task_done_today'])
+
+
+@override_settings(
+    RATE_LIMIT_ENABLED=True,
+    RATE_LIMITS={
+        'process_task': {
+            'rate': '6/m', 'burst': 2, 'key': 'user', 'ip_rate': '30/m', 'ip_burst': 3, 'concurrency': 2,
+        },
+        'login': {'rate': '6/m', 'burst': 2, 'key': 'ip'},
+    },
+)
+class RateLimitTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('924000001', 'senha-forte-123')
+        self.client.force_login(self.user)
+        ratelimit.ratelimit_cache.clear()
+        # Todos os pedidos do teste na mesma janela
+        patcher = mock.patch.object(ratelimit, 'time')
+        patcher.start().time.return_value = 1000.0
+        self.addCleanup(patcher.stop)
+
+    def post_task(self, client=None):
+        return (client or self.client).post(reverse('process_task'), {}, content_type='application/json')
+
+    def client_from(self, ip, user=None):
+        client = self.client_class(REMOTE_ADDR=ip)
+        if user:
+            client.force_login(user)
+        return client
+
+    def test_user_limit_follows_the_user_not_the_session(self):
+        self.assertEqual(self.post_task().status_code, 200)
+        # Outra sessão do mesmo usuário, noutro IP, gasta o mesmo limite
+        second_session = self.client_from('10.0.0.2', self.user)
+        self.assertEqual(self.post_task(second_session).status_code, 200)
+        response = self.post_task(second_session)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '20')
+        self.assertFalse(response.json()['success'])
+
+        # Outro usuário tem o seu próprio limite
+        other = self.client_from('10.0.0.3', CustomUser.objects.create_user('924000002', 'senha-forte-123'))
+        self.assertEqual(self.post_task(other).status_code, 200)
+
+    def test_ip_limit_ignores_forged_session_cookies(self):
+        client = self.client_from('10.0.0.9')
+        for _ in range(3):
+            client.cookies[settings.SESSION_COOKIE_NAME] = uuid.uuid4().hex
+            self.assertEqual(self.post_task(client).status_code, 302)
+        client.cookies[settings.SESSION_COOKIE_NAME] = uuid.uuid4().hex
+        with self.assertNumQueries(0):
+            response = self.post_task(client)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '2')
+
+    def test_fixed_window(self):
+        key = 'ratelimit:test'
+        self.assertEqual(ratelimit.count_request(key, 0.1, 1, now=1000), 0)
+        self.assertAlmostEqual(ratelimit.count_request(key, 0.1, 1, now=1005), 5)
+        self.assertEqual(ratelimit.count_request(key, 0.1, 1, now=1010), 0)
+
+    def test_login_limited_by_ip_for_post_only(self):
+        data = {'username': '924000001', 'password': 'errada'}
+        statuses = [self.client.post(reverse('login'), data).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertEqual(self.client.get(reverse('login')).status_code, 200)
+
+    def test_concurrency_cap_returns_503(self):
+        slots = [ratelimit.acquire_slot('process_task', 2) for _ in range(2)]
+        self.assertNotIn(None, slots)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.post_task().status_code, 503)
+        ratelimit.release_slot(slots[0])
+        self.assertEqual(self.post_task().status_code, 200)
+
+    @override_settings(RATE_LIMIT_ENABLED=False)
+    def test_disabled(self):
+        self.assertEqual({self.post_task().status_code for _ in range(4)}, {200})
+
+
+class CurrentLevelTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('924100001', 'senha-forte-123', available_balance=100000)
+        self.cheap, self.expensive = synthetic.ensure_levels()[:2]
+        self.client.force_login(self.user)
+
+    def buy(self, level):
+        self.client.post(reverse('nivel'), {'level_id': level.pk})
+        self.user.refresh_from_db()
+
+    def test_purchase_and_expiry_keep_pointer(self):
+        self.buy(self.expensive)
+        self.buy(self.cheap)
+        self.assertEqual(self.user.current_level, self.expensive)
+        self.assertEqual(self.user.active_level_count, 2)
+        self.assertTrue(self.user.level_active)
+        self.assertEqual(self.user.available_balance, 100000 - 15000 - 5000)
+        self.assertEqual(self.client.get(reverse('renda')).context['active_level'], self.expensive)
+
+        UserLevel.objects.filter(level=self.expensive).update(purchase_date=timezone.now() - timedelta(days=91))
+        tasks.expire_level_cycles()
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.current_level, self.user.active_level_count), (self.cheap, 1))
+
+        UserLevel.objects.update(purchase_date=timezone.now() - timedelta(days=91))
+        tasks.expire_level_cycles()
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.current_level, self.user.active_level_count, self.user.level_active), (None, 0, False))
+
+    def test_views_read_level_from_user_row(self):
+        self.buy(self.cheap)
+        levels.level_catalog()
+        self.client.get(reverse('tarefa'))  # aquece a sessão
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('process_task'))
+        self.assertEqual(response.json()['daily_gain'], '200.00')
+        self.assertFalse(any(UserLevel._meta.db_table in query['sql'] for query in queries.captured_queries))
+
+    def test_backfill_command(self):
+        UserLevel.objects.bulk_create([UserLevel(user=self.user, level=self.cheap)])
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.current_level)
+        call_command('backfill_current_levels', '--chunk-size', '1', stdout=io.StringIO())
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.current_level, self.user.active_level_count), (self.cheap, 1))
+
+
+class QuotaTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('924200001', 'senha-forte-123', available_balance=10000)
+        self.today = timezone.localdate()
+
+    def test_second_task_of_the_day_is_refused(self):
+        level = synthetic.ensure_levels()[0]
+        UserLevel.objects.create(user=self.user, level=level)
+        self.client.force_login(self.user)
+        self.assertTrue(self.client.post(reverse('process_task')).json()['success'])
+        self.assertFalse(self.client.post(reverse('process_task')).json()['success'])
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.last_task_date, self.user.tasks_today), (self.today, 1))
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 1)
+
+    def test_stale_copy_cannot_consume_twice(self):
+        # Dois pedidos simultâneos: ambos leram a linha antes de qualquer um gravar
+        first, second = CustomUser.objects.get(pk=self.user.pk), CustomUser.objects.get(pk=self.user.pk)
+        self.assertTrue(quotas.consume_quota(first, 'claim', self.today))
+        self.assertEqual(quotas.used_today(second, 'claim', self.today), 0)
+        self.assertFalse(quotas.consume_quota(second, 'claim', self.today))
+        self.assertEqual(quotas.used_today(first, 'claim', self.today), 1)
+
+    def test_task_counter_limit_and_next_day_reset(self):
+        for _ in range(2):
+            self.assertTrue(quotas.consume_quota(self.user, 'task', self.today, limit=2))
+        self.assertFalse(quotas.consume_quota(self.user, 'task', self.today, limit=2))
+        self.assertEqual(quotas.used_today(self.user, 'task', self.today), 2)
+
+        tomorrow = self.today + timedelta(days=1)
+        self.assertEqual(quotas.used_today(self.user, 'task', tomorrow), 0)
+        self.assertTrue(quotas.consume_quota(self.user, 'task', tomorrow, limit=2))
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.last_task_date, self.user.tasks_today), (tomorrow, 1))
+
+    def test_withdrawal_once_per_day(self):
+        self.assertTrue(quotas.consume_quota(self.user, 'withdrawal', self.today))
+        self.assertFalse(quotas.consume_quota(self.user, 'withdrawal', self.today))
+        with self.assertRaises(ValueError):
+            quotas.consume_quota(self.user, 'withdrawal', self.today, limit=2)
+
+    def spin(self, user):
+        request = RequestFactory().post(reverse('spin_roulette'))
+        request.user = user
+        return json.loads(views.spin_roulette(request).content)
+
+    def test_spin_keeps_writes_made_during_the_request(self):
+        RouletteSettings.objects.create()
+        CustomUser.objects.filter(pk=self.user.pk).update(roulette_spins=1)
+        # Os dois pedidos carregaram o usuário antes de uma campanha o creditar e de ele ler os avisos
+        first, second = CustomUser.objects.get(pk=self.user.pk), CustomUser.objects.get(pk=self.user.pk)
+        balances.credit_balances({self.user.pk: Decimal('500')}, fields=('available_balance',))
+        CustomUser.objects.filter(pk=self.user.pk).update(last_read_announcement_id=7)
+
+        prize = self.spin(first)['prize']
+        self.assertFalse(self.spin(second)['success'])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.roulette_spins, 0)
+        self.assertEqual(self.user.available_balance, 10500 + prize)
+        self.assertEqual(self.user.subsidy_balance, prize)
+        self.assertEqual(self.user.last_read_announcement_id, 7)
+
+    def test_debit_checks_the_stored_balance(self):
+        stale = CustomUser.objects.get(pk=self.user.pk)
+        self.assertTrue(balances.debit_user(self.user, Decimal('8000')))
+        self.assertFalse(balances.debit_user(stale, Decimal('8000')))
+        self.assertEqual(stale.available_balance, 10000)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.available_balance, 2000)
+
+
+@override_settings(DATABASE_REPLICA='replica')
+class ReplicaRoutingTests(SimpleTestCase):
+    router = routers.ReplicaRouter()
+
+    def run_middleware(self, path, method='get', write=False, cookies=None):
+        """Corre o ReplicaMiddleware à volta de uma view falsa; devolve (resposta, leu da réplica)."""
+        seen = {}
+
+        def view(request):
+            seen['replica'] = routers.reading_from_replica()
+            if write:
+                self.router.db_for_write(CustomUser)
+            return HttpResponse()
+
+        request = getattr(RequestFactory(), method)(path)
+        request.COOKIES.update(cookies or {})
+        return ReplicaMiddleware(view)(request), seen['replica']
+
+    def test_router_reads_replica_until_write(self):
+        self.assertEqual(self.router.db_for_read(CustomUser), 'default')
+        with routers.read_from_replica():
+            self.assertEqual(self.router.db_for_read(CustomUser), 'replica')
+            with mock.patch.object(connections['default'], 'in_atomic_block', True):
+                self.assertEqual(self.router.db_for_read(CustomUser), 'default')
+            self.assertEqual(self.router.db_for_write(CustomUser), 'default')
+            self.assertEqual(self.router.db_for_read(CustomUser), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'core'))
+
+    def test_middleware_routes_listed_safe_views(self):
+        self.assertTrue(self.run_middleware(reverse('equipa'))[1])
+        self.assertTrue(self.run_middleware(reverse('admin:core_deposit_changelist'))[1])
+        self.assertFalse(self.run_middleware(reverse('equipa'), method='post')[1])
+        self.assertFalse(self.run_middleware(reverse('menu'))[1])
+        with override_settings(DATABASE_REPLICA=''):
+            self.assertFalse(self.run_middleware(reverse('equipa'))[1])
+
+    def test_write_makes_client_sticky(self):
+        response, _ = self.run_middleware(reverse('process_task'), method='post', write=True)
+        cookie = response.cookies[settings.REPLICA_STICKY_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_STICKY_SECONDS)
+        self.assertNotIn(settings.REPLICA_STICKY_COOKIE, self.run_middleware(reverse('equipa'))[0].cookies)
+        self.assertFalse(self.run_middleware(reverse('equipa'), cookies={cookie.key: '1'})[1])
+
+    def test_version_stamps_stay_on_primary(self):
+        with routers.read_from_replica():
+            self.assertEqual(self.router.db_for_read(VersionStamp), 'default')
+            self.assertEqual(self.router.db_for_write(VersionStamp), 'default')
+            # Criar um carimbo não conta como escrita do usuário
+            self.assertTrue(routers.reading_from_replica())
+
+    def test_recent_version_stamp_pins_to_primary(self):
+        with routers.read_from_replica():
+            routers.pin_if_recent(stamp_ns=0, now_ns=time.time_ns())
+            self.assertTrue(routers.reading_from_replica())
+            routers.pin_if_recent(stamp_ns=time.time_ns(), now_ns=time.time_ns())
+            self.assertFalse(routers.reading_from_replica())
+
+
+@skipUnless('replica' in settings.DATABASES, 'Sem DATABASE_REPLICA_URL.')
+class ReplicaDatabaseTests(TransactionTestCase):
+    """
+    Com duas bases de dados locais: DATABASE_REPLICA_URL=sqlite:///... manage.py test.
+    TransactionTestCase: a ligação da réplica só vê dados gravados com commit.
+    """
+    databases = '__all__'
+
+    def test_read_only_page_uses_replica_and_writes_stick_to_primary(self):
+        user = CustomUser.objects.create_user('924300001', 'senha-forte-123')
+        UserLevel.objects.create(user=user, level=synthetic.ensure_levels()[0])
+        self.client.force_login(user)
+        # Sem janela: o carimbo do usuário acabado de criar não fixa o primário
+        with override_settings(REPLICA_STICKY_SECONDS=0):
+            with CaptureQueriesContext(connections['replica']) as replica_queries:
+                self.client.get(reverse('equipa'))
+            self.assertTrue(replica_queries.captured_queries)
+
+        self.assertTrue(self.client.post(reverse('process_task')).json()['success'])
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            self.client.get(reverse('equipa'))
+        self.assertFalse(replica_queries.captured_queries)
+
+
+class PhoneSearchTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('+244 923-456-789', 'senha-forte-123')
+        self.other = CustomUser.objects.create_user('923999001', 'senha-forte-123')
+        self.staff = CustomUser.objects.create_user('923999002', 'senha-forte-123', is_staff=True)
+        self.request = RequestFactory().get('/')
+        self.request.user = self.staff
+
+    def search(self, model, term):
+        model_admin = admin.site._registry[model]
+        queryset, may_have_duplicates = model_admin.get_search_results(
+            self.request, model._default_manager.all(), term,
+        )
+        self.assertFalse(may_have_duplicates)
+        return queryset
+
+    def test_normalize_phone(self):
+        self.assertEqual(phones.normalize_phone(' 00244 923 456 789 '), '923456789')
+        self.assertEqual(phones.normalize_phone('244923456789'), '923456789')
+        self.assertEqual(phones.normalize_phone('(923) 456.789'), '923456789')
+        self.assertEqual(phones.normalize_phone('+244 92'), '92')
+        self.assertEqual(phones.normalize_phone('24492'), '24492')
+        self.assertEqual(phones.normalize_phone('admin'), 'admin')
+        self.assertEqual(self.user.phone_number, '923456789')
+
+    def test_login_and_signup_accept_any_format(self):
+        response = self.client.post(reverse('login'), {'username': '+244 923 456 789', 'password': 'senha-forte-123'})
+        self.assertRedirects(response, reverse('menu'), fetch_redirect_response=False)
+        response = self.client.post(reverse('cadastro'), {
+            'phone_number': '00244 923 999 001', 'password': 'senha-forte-123', 'confirm_password': 'senha-forte-123',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors)
+        self.assertEqual(CustomUser.objects.filter(phone_number='923999001').count(), 1)
+
+    def test_strategy_follows_the_input(self):
+        self.assertEqual(phones.search_strategy('+244 923 456 789'), ('exact', '923456789'))
+        self.assertEqual(phones.search_strategy('9234'), ('prefix', '9234'))
+        self.assertEqual(phones.search_strategy('*6789'), ('substring', '6789'))
+        self.assertEqual(phones.search_strategy('Banco BFA'), (None, 'Banco BFA'))
+
+        exact = self.search(CustomUser, '923 456 789')
+        self.assertEqual(list(exact), [self.user])
+        self.assertNotIn('LIKE', str(exact.query))
+        prefix = self.search(CustomUser, '9239')
+        self.assertEqual(set(prefix), {self.other, self.staff})
+        self.assertIn("LIKE 9239%", str(prefix.query).replace("'", ''))
+        self.assertEqual(list(self.search(CustomUser, '*6789')), [self.user])
+        self.assertEqual(list(self.search(CustomUser, self.other.invite_code)), [self.other])
+
+    def test_related_admins_search_user_phone_or_text_fields(self):
+        details = BankDetails.objects.create(user=self.user, bank_name='BFA', account_holder_name='Ana', IBAN='AO06')
+        BankDetails.objects.create(user=self.other, bank_name='BAI', account_holder_name='Rui', IBAN='AO07')
+        self.assertEqual(list(self.search(BankDetails, '923456789')), [details])
+        self.assertEqual(list(self.search(BankDetails, 'bfa')), [details])
+        self.assertFalse(self.search(Withdrawal, 'nome'))
+
+
+class ReconcileTests(TestCase):
+    def setUp(self):
+        self.inviter = CustomUser.objects.create_user('923500001', 'senha-forte-123', available_balance=750)
+        self.user = CustomUser.objects.create_user(
+            '923500002', 'senha-forte-123', available_balance=750, invited_by=self.inviter,
+        )
+        CustomUser.objects.create_user('923500003', 'senha-forte-123', is_staff=True)
+        self.level = synthetic.ensure_levels()[0]
+        DailyRewardCode.objects.create(code='HOJE', reward_amount=100)
+        self.client.force_login(self.user)
+
+    def run_flows(self):
+        """Movimentos pelas views e pela liquidação, como em produção."""
+        # Depósito aprovado pelo staff, com o saldo creditado (como em views.approve_deposit)
+        Deposit.objects.create(user=self.user, amount=5000, proof_of_payment='x.jpg', is_approved=True)
+        CustomUser.objects.filter(pk=self.user.pk).update(available_balance=F('available_balance') + 5000)
+        self.client.post(reverse('nivel'), {'level_id': self.level.pk})
+        self.assertTrue(self.client.post(reverse('process_task')).json()['success'])
+        self.client.post(reverse('claim_daily_reward'), {'reward_code': 'HOJE'})
+        commissions.settle_all(now=timezone.now() + timedelta(minutes=1))
+
+    def test_consistent_balances_have_no_mismatch(self):
+        self.run_flows()
+        checked, mismatches = reconcile.reconcile_balances(workers=1, chunk_size=1)
+        self.assertEqual((checked, mismatches), (2, []))
+
+    def test_report_lists_only_persistent_differences(self):
+        self.run_flows()
+        CustomUser.objects.filter(pk=self.user.pk).update(available_balance=F('available_balance') + 10)
+        Withdrawal.objects.create(user=self.inviter, amount=300)
+
+        checked, mismatches = reconcile.reconcile_balances(workers=1, chunk_size=2)
+        self.assertEqual(checked, 2)
+        self.assertEqual(
+            [(m.user_id, m.available_diff, m.subsidy_diff) for m in mismatches],
+            [(self.inviter.pk, Decimal('300.00'), Decimal('0.00')), (self.user.pk, Decimal('10.00'), Decimal('0.00'))],
+        )
+
+        out = io.StringIO()
+        call_command('reconcile_balances', '--workers', '1', stdout=out, stderr=io.StringIO())
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        self.assertEqual([row['user_id'] for row in rows], [str(self.inviter.pk), str(self.user.pk)])
+        self.assertEqual(rows[1]['expected_available'], str(mismatches[1].expected_available))
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.inviter = CustomUser.objects.create_user('923600001', 'senha-forte-123')
+        self.level = synthetic.ensure_levels()[0]
+
+    def invite(self, phone_number):
+        return CustomUser.objects.create_user(phone_number, 'senha-forte-123', invited_by=self.inviter)
+
+    def scores(self, board):
+        return dict(LeaderboardScore.objects.filter(board=board, user=self.inviter).values_list('period', 'score'))
+
+    def test_events_update_every_period_incrementally(self):
+        first, second = self.invite('923600002'), self.invite('923600003')
+        UserLevel.objects.create(user=first, level=self.level)
+        UserLevel.objects.create(user=first, level=self.level)  # segunda compra não conta
+        Task.objects.create(user=first, earnings=200)
+        Task.objects.create(user=first, earnings=50)
+
+        today = timezone.localdate()
+        periods = {leaderboards.period_key(period, today) for period in leaderboards.PERIODS}
+        self.assertEqual(self.scores('team_size'), dict.fromkeys(periods, Decimal('2.00')))
+        self.assertEqual(self.scores('invested_invitees'), dict.fromkeys(periods, Decimal('1.00')))
+        earnings = dict(LeaderboardScore.objects.filter(board='earnings', user=first).values_list('period', 'score'))
+        self.assertEqual(earnings, dict.fromkeys(periods, Decimal('250.00')))
+        self.assertFalse(LeaderboardScore.objects.filter(user=second).exists())
+
+        # A reconstrução a partir das tabelas de origem chega aos mesmos valores
+        before = set(LeaderboardScore.objects.values_list('board', 'period', 'user', 'score'))
+        leaderboards.rebuild_leaderboards()
+        self.assertEqual(set(LeaderboardScore.objects.values_list('board', 'period', 'user', 'score')), before)
+
+    def test_endpoint_reads_cached_top_entries(self):
+        other = CustomUser.objects.create_user('923600010', 'senha-forte-123')
+        for index in range(3):
+            CustomUser.objects.create_user(f'92360002{index}', 'senha-forte-123', invited_by=other)
+        self.invite('923600002')
+        self.client.force_login(self.inviter)
+
+        with override_settings(LEADERBOARD_SIZE=1):
+            response = self.client.get(reverse('leaderboard'), {'ranking': 'team_size', 'periodo': 'all'})
+        self.assertEqual(response.json()['results'], [{'position': 1, 'user': '923***010', 'score': '3.00'}])
+        with self.assertNumQueries(2):  # sessão e usuário
+            self.client.get(reverse('leaderboard'), {'ranking': 'team_size', 'periodo': 'all'})
+        self.assertEqual(self.client.get(reverse('leaderboard'), {'ranking': 'saldo'}).status_code, 400)
+
+    def test_old_days_and_weeks_are_purged(self):
+        today = timezone.localdate()
+        old_day = today - timedelta(days=leaderboards.LEADERBOARD_DAYS_KEPT + 1)
+        leaderboards.add_score('earnings', self.inviter.pk, 10, timezone.make_aware(datetime.combine(old_day, datetime.min.time())))
+        leaderboards.add_score('earnings', self.inviter.pk, 10)
+        self.assertEqual(leaderboards.purge_old_periods(today), 1)
+        self.assertEqual(LeaderboardScore.objects.get(period='all').score, Decimal('20.00'))
+        # A semana do dia apagado ainda está dentro de LEADERBOARD_WEEKS_KEPT
+        self.assertEqual(LeaderboardScore.objects.count(), 4)
+        self.assertEqual(leaderboards.purge_old_periods(today + timedelta(weeks=leaderboards.LEADERBOARD_WEEKS_KEPT + 2)), 3)
+
+    @override_settings(LEADERBOARD_SIZE=1, LEADERBOARD_TRIM_MARGIN=1)
+    def test_each_period_is_trimmed_to_the_kept_rows(self):
+        users = [self.inviter, *(CustomUser.objects.create_user(f'92360003{index}', 'senha-forte-123') for index in range(3))]
+        for user, amount in zip(users, [10, 30, 20, 20]):
+            Task.objects.create(user=user, earnings=amount)
+        top = [(users[1].pk, Decimal('30.00')), (users[2].pk, Decimal('20.00'))]
+
+        # Dois usuários mantidos em cada um dos três períodos; o empate desfaz-se pelo id
+        self.assertEqual(leaderboards.trim_periods(), 6)
+        for period in leaderboards.event_periods(timezone.now()):
+            rows = LeaderboardScore.objects.filter(board='earnings', period=period).order_by('-score', 'user')
+            self.assertEqual(list(rows.values_list('user', 'score')), top)
+        self.assertEqual(leaderboards.trim_periods(), 0)
+
+        leaderboards.rebuild_leaderboards()
+        self.assertEqual(LeaderboardScore.objects.filter(board='earnings').count(), 6)
+        self.assertEqual(leaderboards.top_scores('earnings', 'all')[0]['score'], '30.00')
+
+
+class GrantCampaignTests(TestCase):
+    def setUp(self):
+        self.level = synthetic.ensure_levels()[0]
+        self.users = [
+            CustomUser.objects.create_user(f'92370000{index}', 'senha-forte-123', available_balance=750)
+            for index in range(4)
+        ]
+        for user in self.users[:3]:
+            UserLevel.objects.create(user=user, level=self.level)
+        for index, user in enumerate(self.users[:2]):
+            CustomUser.objects.create_user(f'92370010{index}', 'senha-forte-123', invited_by=user)
+        Deposit.objects.create(user=self.users[0], amount=5000, proof_of_payment='x.jpg', is_approved=True)
+        Deposit.objects.create(user=self.users[1], amount=5000, proof_of_payment='x.jpg')
+        Deposit.objects.create(user=self.users[2], amount=3000, proof_of_payment='x.jpg', is_approved=True)
+        CustomUser.objects.create_user('923700009', 'senha-forte-123', is_staff=True)
+
+    def campaign(self, **fields):
+        return GrantCampaign.objects.create(**{'name': 'Promo', 'amount': 3, 'level': self.level, **fields})
+
+    def test_segment_filters(self):
+        self.assertEqual(campaigns.preview_count(self.campaign()), 3)
+        self.assertEqual(campaigns.preview_count(self.campaign(min_team_size=1)), 2)
+        self.assertEqual(campaigns.preview_count(self.campaign(min_deposit_total=4000)), 1)
+        self.assertEqual(campaigns.preview_count(self.campaign(deposits_from=timezone.localdate())), 2)
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        self.assertEqual(campaigns.preview_count(self.campaign(joined_from=tomorrow)), 0)
+
+    def test_chunked_run_is_resumable_and_grants_once(self):
+        campaign = self.campaign()
+        self.assertTrue(campaigns.start_campaign(campaign))
+        self.assertFalse(campaigns.start_campaign(campaign))
+        # Cadastros depois do início ficam fora da campanha
+        late = CustomUser.objects.create_user('923700020', 'senha-forte-123')
+        UserLevel.objects.create(user=late, level=self.level)
+
+        self.assertEqual(campaigns.grant_next_chunk(campaign.pk, chunk_size=2), 2)
+        campaigns.pause_campaign(campaign)
+        self.assertEqual(campaigns.run_grant_campaign(campaign.pk, chunk_size=2), 0)
+
+        self.assertTrue(campaigns.start_campaign(campaign))
+        self.assertEqual(Job.objects.filter(name='run_grant_campaign').count(), 2)
+        self.assertEqual(campaigns.run_grant_campaign(campaign.pk, chunk_size=2), 1)
+        self.assertEqual(campaigns.run_grant_campaign(campaign.pk, chunk_size=2), 0)
+
+        campaign.refresh_from_db()
+        self.assertEqual(
+            (campaign.status, campaign.target_count, campaign.granted_count),
+            (GrantCampaign.STATUS_DONE, 3, 3),
+        )
+        spins = dict(CustomUser.objects.values_list('phone_number', 'roulette_spins'))
+        self.assertEqual([spins[user.phone_number] for user in self.users], [3, 3, 3, 0])
+        self.assertEqual(spins[late.phone_number], 0)
+        self.assertEqual(CampaignGrant.objects.filter(campaign=campaign).count(), 3)
+
+    def test_bonus_grants_reconcile(self):
+        campaign = self.campaign(grant_type=GrantCampaign.GRANT_BONUS, amount=500)
+        # Os depósitos aprovados do setUp entram no saldo, como em views.approve_deposit
+        for deposit in Deposit.objects.filter(is_approved=True):
+            CustomUser.objects.filter(pk=deposit.user_id).update(available_balance=F('available_balance') + deposit.amount)
+        CustomUser.objects.filter(is_staff=False, available_balance=0).update(available_balance=750)
+        # As compras de nível do setUp não descontaram o saldo
+        CustomUser.objects.filter(pk__in=[user.pk for user in self.users[:3]]).update(
+            available_balance=F('available_balance') - self.level.deposit_value,
+        )
+        campaigns.start_campaign(campaign)
+        campaigns.run_grant_campaign(campaign.pk)
+
+        self.assertEqual(
+            CustomUser.objects.get(pk=self.users[2].pk).available_balance,
+            750 + 3000 - self.level.deposit_value + 500,
+        )
+        self.assertEqual(reconcile.reconcile_balances(workers=1)[1], [])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Só no SQLite.')
+class SQLiteTuningTests(TransactionTestCase):
+    def test_django_connection_is_tuned(self):
+        # As mesmas ligações que as views usam, não as do benchmark_sqlite
+        expected = {
+            'busy_timeout': settings.SQLITE_PRAGMAS['busy_timeout'], 'synchronous': 1, 'temp_store': 2,
+            'cache_size': settings.SQLITE_PRAGMAS['cache_size'],
+        }
+        with connection.cursor() as cursor:
+            for pragma, value in expected.items():
+                cursor.execute(f'PRAGMA {pragma}')
+                self.assertEqual(cursor.fetchone()[0], value, pragma)
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+    def test_sqlite_replica_is_tuned(self):
+        with mock.patch.dict(os.environ, {'DATABASE_REPLICA_URL': 'sqlite:///replica.sqlite3'}):
+            databases = runpy.run_path(str(settings.BASE_DIR / 'ddb' / 'settings.py'))['DATABASES']
+        self.assertEqual(databases['replica']['OPTIONS'], databases['default']['OPTIONS'])
+
+    def test_read_only_transaction_is_deferred(self):
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                CustomUser.objects.exists()
+            with reconcile.read_only_transaction():
+                CustomUser.objects.exists()
+        self.assertEqual([query['sql'] for query in queries if query['sql'].startswith('BEGIN')], ['BEGIN IMMEDIATE', 'BEGIN'])
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+class AnnouncementTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('923800001', 'senha-forte-123')
+        self.client.force_login(self.user)
+
+    def announce(self, audience=Announcement.AUDIENCE_ALL, **fields):
+        return Announcement.objects.create(title='Manutenção', message='Texto', audience=audience, **fields)
+
+    def badge(self):
+        response = self.client.get(reverse('menu'))
+        return response.context['unread_announcements'], response.context['unread_badge']
+
+    def test_publishing_is_one_insert_and_badge_is_one_query(self):
+        for _ in range(3):
+            CustomUser.objects.create_user(f'92380010{_}', 'senha-forte-123')
+        with self.assertNumQueries(1):
+            self.announce()
+        self.announce(Announcement.AUDIENCE_NOT_INVESTED)
+        self.announce(Announcement.AUDIENCE_INVESTED)
+        self.announce(is_active=False)
+        with self.assertNumQueries(1):
+            self.assertEqual(announcements.unread_count(self.user), 2)
+
+        for _ in range(announcements.UNREAD_BADGE_MAX):
+            self.announce()
+        self.assertEqual(self.badge(), (announcements.UNREAD_BADGE_MAX + 1, '9+'))
+
+    def test_opening_the_page_advances_the_watermark(self):
+        first = self.announce()
+        hidden = self.announce(Announcement.AUDIENCE_INVESTED)
+        self.assertEqual(self.badge()[0], 1)
+
+        response = self.client.get(reverse('avisos'))
+        self.assertEqual(list(response.context['announcements']), [first])
+        self.assertContains(response, 'Novo')
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_read_announcement_id, first.pk)
+        self.assertEqual(self.badge()[0], 0)
+
+        # Um aviso novo volta a acender o contador; a marca nunca recua
+        second = self.announce()
+        self.assertEqual(self.badge()[0], 1)
+        self.client.get(reverse('avisos'))
+        announcements.mark_read(self.user, hidden.pk)  # objeto antigo, como um pedido simultâneo
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_read_announcement_id, second.pk)
+        self.assertNotContains(self.client.get(reverse('avisos')), 'Novo')
+
+
+@override_settings(ALLOWED_HOSTS=[benchmark.BENCHMARK_HOST], RATE_LIMIT_ENABLED=False)
+class ContentionBenchmarkTests(TestCase):
+    def test_sequential_run_has_no_lost_updates(self):
+        [report] = contention.ContentionBenchmark(clients=1, requests=20).run(['shared'])
+
+        self.assertEqual(report['requests'], 20)
+        self.assertEqual(sum(row['errors'] for row in report['endpoints']), 0)
+        self.assertEqual(report['users_with_lost_updates'], 0)
+        self.assertEqual((report['available_drift'], report['subsidy_drift'], report['spin_drift']), (0, 0, 0))
+        self.assertIsNone(report['lock_wait_s'])
+        self.assertIn('shared', contention.format_contention_report([report]))
+        # Os usuários e a configuração da roleta criados pelo benchmark são apagados
+        self.assertFalse(contention.contention_users().exists())
+        self.assertFalse(RouletteSettings.objects.exists())
+
+    def test_drift_detects_overwritten_rows(self):
+        runner = contention.ContentionBenchmark(clients=1)
+        user = runner.create_user(1)
+        before = runner.balance_drift([user.pk])
+        # Um giro gravado sobre uma linha antiga: o giro volta e o prémio fica sem saldo
+        Roulette.objects.create(user=user, prize=100, is_approved=True)
+        after = runner.balance_drift([user.pk])
+        self.assertEqual(after[user.pk][0] - before[user.pk][0], -100)
+        self.assertEqual(runner.spin_drift([user.pk]), {user.pk: 1})
@@ -0,0 +1,152 @@
+"""
+Histórico unificado do usuário: depósitos, saques, tarefas, roletas e
+resgates de subsídio, do mais recente para o mais antigo.
+
+Cada fonte é lida da sua tabela pelo índice (user, data), a partir do
+cursor e com no máximo 'limit' + 1 linhas; as listas, já ordenadas, são
+fundidas com heapq.merge. A paginação é por cursor (keyset) e não por
+OFFSET, por isso a página N custa o mesmo que a primeira, qualquer que
+seja o tamanho do histórico.
+
+As tarefas e roletas arquivadas (core/archive.py) são fontes próprias com o
+mesmo tipo das tabelas quentes: cada linha está sempre numa só delas e
+mantém o id, por isso o cursor serve para as duas.
+"""
+import heapq
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+
+from .kpis import WITHDRAWAL_APPROVED_STATUS, WITHDRAWAL_PENDING_STATUS
+from .models import Deposit, Roulette, RouletteArchive, Task, TaskArchive, UserRewardClaim, Withdrawal
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# Ordem dos tipos: desempata movimentos com a mesma data/hora
+KINDS = ['deposit', 'withdrawal', 'task', 'roulette', 'reward']
+KIND_LABELS = {
+    'deposit': 'Depósito',
+    'withdrawal': 'Saque',
+    'task': 'Tarefa',
+    'roulette': 'Roleta',
+    'reward': 'Subsídio',
+}
+# Withdrawal.status é texto livre alterado no admin: guarda 'Pending' (o valor por
+# omissão), 'Aprovado' ou 'Rejeitado'; as outras grafias são as aceites em saque.html
+WITHDRAWAL_STATUS_LABELS = {
+    WITHDRAWAL_PENDING_STATUS: 'Pendente',
+    'Pendente': 'Pendente',
+    WITHDRAWAL_APPROVED_STATUS: 'Aprovado',
+    'Approved': 'Aprovado',
+    'Rejeitado': 'Rejeitado',
+    'Rejected': 'Rejeitado',
+}
+
+
+def _approval(row):
+    return 'Aprovado' if row['is_approved'] else 'Pendente'
+
+
+def _withdrawal_status(row):
+    return WITHDRAWAL_STATUS_LABELS.get(row['status'], row['status'])
+
+
+@dataclass(frozen=True)
+class TimelineSource:
+    kind: str
+    model: type
+    date_field: str
+    amount_field: str
+    # Saques saem do saldo; os restantes entram
+    sign: int = 1
+    extra_fields: tuple = ()
+    status: object = None
+
+    @property
+    def rank(self):
+        return KINDS.index(self.kind)
+
+
+SOURCES = [
+    TimelineSource('deposit', Deposit, 'created_at', 'amount', extra_fields=('is_approved',), status=_approval),
+    TimelineSource('withdrawal', Withdrawal, 'created_at', 'amount', sign=-1, extra_fields=('status',), status=_withdrawal_status),
+    TimelineSource('task', Task, 'completed_at', 'earnings'),
+    TimelineSource('task', TaskArchive, 'completed_at', 'earnings'),
+    TimelineSource('roulette', Roulette, 'spin_date', 'prize', extra_fields=('is_approved',), status=_approval),
+    TimelineSource('roulette', RouletteArchive, 'spin_date', 'prize', extra_fields=('is_approved',), status=_approval),
+    TimelineSource('reward', UserRewardClaim, 'claimed_at', 'reward_code__reward_amount'),
+]
+
+
+# --- CURSOR ---
+# "<microssegundos desde 1970>.<tipo>.<id>" da última linha mostrada
+
+def encode_cursor(entry):
+    return f"{(entry['at'] - EPOCH) // timedelta(microseconds=1)}.{entry['kind']}.{entry['id']}"
+
+
+def decode_cursor(cursor):
+    """(data, posição do tipo, id); ValueError se o cursor for inválido."""
+    try:
+        micros, kind, pk = cursor.split('.')
+        return EPOCH + timedelta(microseconds=int(micros)), KINDS.index(kind), int(pk)
+    except (OverflowError, ValueError):
+        raise ValueError(f'Cursor inválido: {cursor!r}')
+
+
+# --- LEITURA ---
+
+def _after_cursor(queryset, source, cursor):
+    """Linhas que vêm depois do cursor na ordem (data, tipo, id) decrescente."""
+    at, rank, pk = cursor
+    date_field = source.date_field
+    if source.rank < rank:
+        return queryset.filter(**{f'{date_field}__lte': at})
+    if source.rank > rank:
+        return queryset.filter(**{f'{date_field}__lt': at})
+    # O limite '<=' mantém a procura no índice; o exclude desempata pelo id
+    return queryset.filter(**{f'{date_field}__lte': at}).exclude(**{date_field: at, 'id__gte': pk})
+
+
+def _read_source(source, user, cursor, limit):
+    queryset = source.model.objects.filter(user_id=user.pk)
+    if cursor:
+        queryset = _after_cursor(queryset, source, cursor)
+    fields = ['id', source.date_field, source.amount_field, *source.extra_fields]
+    rows = queryset.order_by(f'-{source.date_field}', '-id').values(*fields)[:limit]
+    return [
+        {
+            'kind': source.kind,
+            'label': KIND_LABELS[source.kind],
+            'id': row['id'],
+            'at': row[source.date_field],
+            'amount': row[source.amount_field] * source.sign,
+            'status': source.status(row) if source.status else None,
+        }
+        for row in rows
+    ]
+
+
+def _sort_key(entry):
+    return entry['at'], KINDS.index(entry['kind']), entry['id']
+
+
+def user_timeline(user, cursor=None, limit=PAGE_SIZE, kinds=None):
+    """
+    Uma página do histórico: (movimentos, cursor da página seguinte ou None).
+    'cursor' é o valor devolvido pela página anterior; 'kinds' restringe os tipos.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    position = decode_cursor(cursor) if cursor else None
+    # Uma linha a mais por fonte indica se há página seguinte
+    streams = [
+        _read_source(source, user, position, limit + 1)
+        for source in SOURCES if not kinds or source.kind in kinds
+    ]
+    entries = list(islice(heapq.merge(*streams, key=_sort_key, reverse=True), limit + 1))
+    if len(entries) > limit:
+        entries = entries[:limit]
+        return entries, encode_cursor(entries[-1])
+    return entries, None
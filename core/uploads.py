@@ -0,0 +1,288 @@
+"""
+Processamento dos comprovativos de depósito.
+
+O comprovativo enviado pelo telemóvel (muitas vezes 4–8 MB) é normalizado
+(orientação EXIF), reduzido e recomprimido com Pillow e gravado num
+armazenamento de staging. O envio para o storage definitivo (Cloudinary em
+produção) e a geração da miniatura do admin correm na fila de tarefas,
+para que o POST de 'deposito' responda rapidamente.
+"""
+import io
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .images import encode, open_normalized, resize_to_width
+from .jobs import enqueue, task
+
+logger = logging.getLogger(__name__)
+
+# Maior dimensão (px) guardada do comprovativo e largura da miniatura do admin
+PROOF_MAX_DIMENSION = getattr(settings, 'PROOF_MAX_DIMENSION', 1600)
+PROOF_THUMBNAIL_WIDTH = getattr(settings, 'PROOF_THUMBNAIL_WIDTH', 300)
+PROOF_JPEG_QUALITY = getattr(settings, 'PROOF_JPEG_QUALITY', 80)
+
+# Disco local do processo web: partes dos envios retomáveis e, quando o envio
+# definitivo corre no próprio pedido, o comprovativo comprimido
+local_staging_storage = FileSystemStorage(
+    location=getattr(settings, 'PROOF_STAGING_ROOT', os.path.join(settings.BASE_DIR, 'proof_staging'))
+)
+# Prefixo dos comprovativos comprimidos à espera do envio definitivo
+PROOF_STAGING_PREFIX = 'proof_staging/'
+
+
+def proof_staging_storage():
+    """
+    Storage onde o comprovativo comprimido espera pelo envio definitivo.
+    Com PROOF_UPLOAD_ASYNC o envio corre no worker, um serviço à parte com
+    outro disco: o staging fica no storage definitivo (default_storage), que
+    os dois veem. Sem ele o envio corre no processo web e basta o disco local.
+    """
+    if getattr(settings, 'PROOF_UPLOAD_ASYNC', False):
+        return default_storage
+    return local_staging_storage
+
+
+def compress_proof(fileobj, max_dimension=PROOF_MAX_DIMENSION):
+    """Devolve o comprovativo em JPEG, com a maior dimensão limitada a max_dimension."""
+    with open_normalized(fileobj) as image:
+        image.thumbnail((max_dimension, max_dimension))
+        return encode(image, 'jpeg', quality=PROOF_JPEG_QUALITY)
+
+
+def make_thumbnail(fileobj, width=PROOF_THUMBNAIL_WIDTH):
+    with open_normalized(fileobj) as image:
+        return encode(resize_to_width(image, width), 'jpeg')
+
+
+def stage_deposit_proof(deposit, uploaded_file):
+    """
+    Comprime o ficheiro enviado e grava-o no staging (proof_staging_storage()).
+    O campo proof_of_payment fica vazio até o envio definitivo terminar.
+    """
+    content = compress_proof(uploaded_file)
+    deposit.proof_of_payment = ''
+    deposit.proof_staged_name = proof_staging_storage().save(
+        f'{PROOF_STAGING_PREFIX}{uuid.uuid4().hex}.jpg', ContentFile(content),
+    )
+
+
+@task
+def upload_deposit_proof(deposit_id):
+    """
+    Envia o comprovativo em staging para o storage definitivo e gera a miniatura.
+    É idempotente: se já não houver nada em staging, não faz nada.
+    """
+    from .models import Deposit
+
+    deposit = Deposit.objects.filter(pk=deposit_id).exclude(proof_staged_name='').first()
+    if deposit is None:
+        return
+
+    staged_name = deposit.proof_staged_name
+    staging = proof_staging_storage()
+    with staging.open(staged_name) as staged:
+        content = staged.read()
+
+    base_name = f'deposit_{deposit.pk}_{os.path.basename(staged_name)}'
+    deposit.proof_of_payment.save(base_name, ContentFile(content), save=False)
+    deposit.proof_thumbnail.save(base_name, ContentFile(make_thumbnail(io.BytesIO(content))), save=False)
+    deposit.proof_staged_name = ''
+    deposit.save(update_fields=['proof_of_payment', 'proof_thumbnail', 'proof_staged_name'])
+
+    staging.delete(staged_name)
+
+
+def schedule_proof_upload(deposit):
+    """
+    Enfileira o envio na fila de tarefas (core/jobs.py); falhas do storage
+    remoto são repetidas com backoff pelo worker.
+    Com PROOF_UPLOAD_ASYNC=False (desenvolvimento e testes) corre no próprio
+    pedido, depois do commit do depósito.
+    """
+    if getattr(settings, 'PROOF_UPLOAD_ASYNC', False):
+        enqueue(upload_deposit_proof, deposit.pk)
+    else:
+        transaction.on_commit(lambda: upload_deposit_proof(deposit.pk))
+
+
+# ---
+# ENVIO EM PARTES (RETOMÁVEL) DO COMPROVATIVO
+# ---
+
+# Tamanho máximo aceite para um comprovativo enviado em partes e tamanho
+# de leitura do corpo do pedido (a memória usada não depende do tamanho da parte)
+CHUNKED_UPLOAD_MAX_SIZE = getattr(settings, 'CHUNKED_UPLOAD_MAX_SIZE', 15 * 1024 * 1024)
+CHUNKED_UPLOAD_CHUNK_SIZE = getattr(settings, 'CHUNKED_UPLOAD_CHUNK_SIZE', 256 * 1024)
+STREAM_READ_SIZE = 64 * 1024
+# Sessões de envio em partes (ProofUpload) mais antigas do que isto são apagadas,
+# com o ficheiro parcial das que ficaram por concluir
+CHUNKED_UPLOAD_EXPIRY = getattr(settings, 'CHUNKED_UPLOAD_EXPIRY', timedelta(hours=24))
+# Segundos entre limpezas dos ficheiros parciais feitas por cada processo web
+CHUNK_PURGE_INTERVAL = 3600
+_last_chunk_purge = 0.0
+
+
+class ChunkedUploadError(Exception):
+    """Erro de protocolo no envio em partes; 'offset' é a posição que o cliente deve retomar."""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.offset = offset
+
+
+def chunk_path(upload):
+    return local_staging_storage.path(f'chunks/{upload.pk}.part')
+
+
+def spool_chunk(upload, offset, stream):
+    """
+    Lê o corpo do pedido para um ficheiro temporário (em memória até
+    CHUNKED_UPLOAD_CHUNK_SIZE) e devolve-o posicionado no início, com o
+    número de bytes lidos. Corre sem bloqueios na base de dados: a leitura
+    depende da rede do cliente. Lê no máximo um byte além do tamanho
+    declarado, o suficiente para recusar um envio grande demais.
+
+    Se a ligação cair a meio, devolve os bytes que chegaram: ficam gravados
+    e o envio é retomado a partir de upload.received_size.
+    """
+    spooled = tempfile.SpooledTemporaryFile(max_size=CHUNKED_UPLOAD_CHUNK_SIZE)
+    size = 0
+    limit = upload.total_size - offset + 1
+    while size < limit:
+        try:
+            data = stream.read(min(STREAM_READ_SIZE, limit - size))
+        except OSError:
+            # Ligação interrompida (UnreadablePostError): mantém o que chegou
+            logger.info('Envio %s interrompido em %s bytes', upload.pk, offset + size)
+            break
+        if not data:
+            break
+        spooled.write(data)
+        size += len(data)
+    spooled.seek(0)
+    return spooled, size
+
+
+def write_chunk(upload, offset, spooled, size):
+    """
+    Grava a parte lida por spool_chunk() a partir de 'offset' no ficheiro
+    parcial do envio. Chamado com a sessão bloqueada (select_for_update),
+    que só cobre esta cópia local e o avanço de received_size.
+
+    Um 'offset' menor do que o já recebido é aceite (o cliente perdeu a
+    resposta e reenvia a parte) e reescreve a partir daí.
+    """
+    if offset > upload.received_size:
+        raise ChunkedUploadError('Offset inválido.', status=409, offset=upload.received_size)
+    if offset + size > upload.total_size:
+        raise ChunkedUploadError('O envio excede o tamanho declarado.', status=413, offset=upload.received_size)
+
+    path = chunk_path(upload)
+    if offset and not os.path.exists(path):
+        # Ficheiro parcial apagado por purge_stale_chunks(): o envio recomeça do início
+        upload.received_size = 0
+        upload.save(update_fields=['received_size'])
+        raise ChunkedUploadError('O envio expirou. Recomece do início.', status=409, offset=0)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as part:
+        part.seek(offset)
+        part.truncate()
+        shutil.copyfileobj(spooled, part, STREAM_READ_SIZE)
+
+    upload.received_size = offset + size
+    upload.save(update_fields=['received_size'])
+    return upload.received_size
+
+
+def finalise_chunked_upload(upload):
+    """
+    Junta o envio completo a um novo Deposit pelo mesmo caminho do formulário
+    (compressão, staging e envio definitivo agendado).
+    """
+    from PIL import UnidentifiedImageError
+    from .models import Deposit
+
+    if upload.deposit_id:
+        return upload.deposit
+    if upload.received_size != upload.total_size:
+        raise ChunkedUploadError('O envio ainda não está completo.', status=409, offset=upload.received_size)
+
+    path = chunk_path(upload)
+    deposit = Deposit(user=upload.user, amount=upload.amount)
+    try:
+        with open(path, 'rb') as assembled:
+            stage_deposit_proof(deposit, assembled)
+    except (UnidentifiedImageError, OSError):
+        raise ChunkedUploadError('O ficheiro enviado não é uma imagem válida.')
+
+    deposit.save()
+    upload.deposit = deposit
+    upload.save(update_fields=['deposit'])
+    schedule_proof_upload(deposit)
+    os.remove(path)
+    return deposit
+
+
+# ---
+# LIMPEZA DOS ENVIOS ABANDONADOS
+# ---
+
+@task
+def purge_abandoned_uploads(expiry=CHUNKED_UPLOAD_EXPIRY):
+    """
+    Apaga as sessões de envio em partes iniciadas há mais de 'expiry' (as
+    concluídas já não servem para retomar nada; as outras foram abandonadas).
+    Os ficheiros parciais ficam no disco do processo web, que o worker pode
+    não ver: apaga-os purge_stale_chunks(), chamada em proof_upload_init.
+    """
+    from .models import ProofUpload
+
+    expired = ProofUpload.objects.filter(created_at__lt=timezone.now() - expiry)
+    for upload_id in expired.filter(deposit__isnull=True).values_list('pk', flat=True).iterator():
+        try:
+            os.remove(local_staging_storage.path(f'chunks/{upload_id}.part'))
+        except FileNotFoundError:
+            pass
+    return expired.delete()[0]
+
+
+def purge_stale_chunks(expiry=CHUNKED_UPLOAD_EXPIRY, force=False):
+    """
+    Apaga os ficheiros parciais sem escritas há mais de 'expiry' no disco
+    deste processo. Sem 'force', corre no máximo uma vez a cada
+    CHUNK_PURGE_INTERVAL segundos por processo. Devolve os ficheiros apagados.
+    """
+    global _last_chunk_purge
+    now = time.time()
+    if not force and now - _last_chunk_purge < CHUNK_PURGE_INTERVAL:
+        return 0
+    _last_chunk_purge = now
+
+    directory = local_staging_storage.path('chunks')
+    removed = 0
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.name.endswith('.part') and entry.stat().st_mtime < now - expiry.total_seconds():
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
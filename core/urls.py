@@ -15,6 +15,11 @@ urlpatterns = [
     path('login/', views.user_login, name='login'),
     path('logout/', views.user_logout, name='logout'),
     path('deposito/', views.deposito, name='deposito'),
+
+    # API de envio em partes (retomável) do comprovativo de depósito
+    path('deposito/upload/', views.proof_upload_init, name='proof_upload_init'),
+    path('deposito/upload/<uuid:upload_id>/', views.proof_upload_chunk, name='proof_upload_chunk'),
+    path('deposito/upload/<uuid:upload_id>/finalise/', views.proof_upload_finalise, name='proof_upload_finalise'),
     path('saque/', views.saque, name='saque'),
     path('tarefa/', views.tarefa, name='tarefa'),
     path('premios-subsidios/', views.premios_subsidios, name='premios_subsidios'), 
@@ -30,7 +35,25 @@ urlpatterns = [
     path('sobre/', views.sobre, name='sobre'),
     path('perfil/', views.perfil, name='perfil'),
     path('renda/', views.renda, name='renda'),
+
+    # Histórico unificado de movimentos (página e JSON), paginado por cursor
+    path('historico/', views.historico, name='historico'),
+    path('api/historico/', views.historico_api, name='historico_api'),
+
+    # Estado resumido do usuário (JSON com ETag) para o front end móvel
+    path('api/snapshot/', views.snapshot, name='snapshot'),
+
+    # Rankings de convidantes e ganhos (JSON em cache, ver core/leaderboards.py)
+    path('api/ranking/', views.leaderboard, name='leaderboard'),
+
+    # Avisos do staff (lidos por marca de leitura, ver core/announcements.py)
+    path('avisos/', views.avisos, name='avisos'),
     
+    # Monitorização: métricas Prometheus (staff), vida e prontidão
+    path('metrics', views.metrics, name='metrics'),
+    path('health/', views.health, name='health'),
+    path('ready/', views.ready, name='ready'),
+
     # URLs para alteração de senha
     path('change_password/', auth_views.PasswordChangeView.as_view(
         template_name='registration/password_change_form.html',
@@ -0,0 +1,111 @@
+"""
+Carimbos de versão baratos para respostas condicionais (ETag / Last-Modified).
+
+Cada carimbo é o instante (em nanossegundos) da última alteração de um
+conjunto de dados, numa linha de VersionStamp: a base de dados é partilhada
+pelo processo web e pelo worker da fila, que também os renova (comissões,
+campanhas). Os sinais em core/signals.py renovam os carimbos quando os
+modelos mudam, por isso calcular o ETag de uma página custa uma consulta
+pela chave primária, sem consultar os dados da página. As escritas são um
+INSERT ... ON CONFLICT por lote de nomes; as leituras não escrevem, exceto
+na primeira vez que um nome é pedido.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from . import routers
+from .models import VersionStamp
+
+# Conjuntos de dados com carimbo global
+PLATFORM_SETTINGS = 'platform_settings'
+PLATFORM_BANK_DETAILS = 'platform_bank_details'
+LEVEL_CATALOG = 'level_catalog'
+
+# Linhas por INSERT ao renovar muitos usuários de uma vez
+STAMP_BATCH_SIZE = 1000
+
+
+def user_version_name(user_id):
+    """Carimbo do saldo/estado de um usuário (saldo, níveis, giros...)."""
+    return f'user:{user_id}'
+
+
+def bump_version(*names):
+    """
+    Renova os carimbos com o instante atual, criando os que faltam. Corre na
+    transação de quem chama: se ela for desfeita, o carimbo também é.
+    """
+    now = time.time_ns()
+    VersionStamp.objects.bulk_create(
+        [VersionStamp(name=name, stamp=now) for name in dict.fromkeys(names)], batch_size=STAMP_BATCH_SIZE,
+        update_conflicts=True, unique_fields=['name'], update_fields=['stamp'],
+    )
+
+
+def get_versions(*names):
+    """
+    Lê os carimbos pedidos. Um carimbo que ainda não existe é criado com o
+    instante atual, o que invalida as cópias antigas dos clientes.
+    """
+    found = dict(VersionStamp.objects.filter(name__in=names).values_list('name', 'stamp'))
+    missing = [name for name in dict.fromkeys(names) if name not in found]
+    if missing:
+        now = time.time_ns()
+        VersionStamp.objects.bulk_create([VersionStamp(name=name, stamp=now) for name in missing], ignore_conflicts=True)
+        found.update(dict.fromkeys(missing, now))
+    return [found[name] for name in names]
+
+
+def _local_midnight():
+    return timezone.make_aware(datetime.combine(timezone.localdate(), datetime.min.time()))
+
+
+def versioned_page(*names, per_user=False, daily=False):
+    """
+    Decorador de views que responde 304 enquanto os carimbos indicados
+    não mudarem, sem executar a view nem renderizar o template.
+
+    Com per_user=True o ETag inclui também o usuário, o seu carimbo e o
+    cookie CSRF (os formulários da página levam o token). Com daily=True a
+    resposta muda também à meia-noite (páginas com o estado "de hoje").
+    """
+    def stamps(request):
+        # Lidos uma única vez por pedido (ETag e Last-Modified usam os mesmos)
+        if not hasattr(request, '_page_versions'):
+            version_names = list(names)
+            if per_user:
+                version_names.append(user_version_name(request.user.pk))
+            request._page_versions = get_versions(*version_names)
+            # Dados alterados há pouco podem ainda não estar na réplica
+            routers.pin_if_recent(max(request._page_versions), time.time_ns())
+        return request._page_versions
+
+    def etag_func(request, *args, **kwargs):
+        parts = [request.resolver_match.url_name if request.resolver_match else '', *map(str, stamps(request))]
+        if per_user:
+            parts += [str(request.user.pk), request.META.get('CSRF_COOKIE', '')]
+        if daily:
+            parts.append(timezone.localdate().isoformat())
+        return hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+    def last_modified_func(request, *args, **kwargs):
+        modified = datetime.fromtimestamp(max(stamps(request)) / 1e9, tz=dt_timezone.utc)
+        return max(modified, _local_midnight()) if daily else modified
+
+    def decorator(view_func):
+        conditional_view = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view_func)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            # Obriga o navegador a revalidar sempre (e nunca partilhar a página)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
@@ -2,21 +2,45 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate, logout, update_session_auth_hash
 from django.contrib.auth.forms import AuthenticationForm, PasswordChangeForm
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404
 from django.contrib import messages
-from django.db.models import Sum
+from django.contrib import admin
+from django.db.models import F, Sum
 from django.urls import reverse
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.http import JsonResponse, HttpResponse, HttpResponseForbidden
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_POST, require_http_methods
+from django.db import transaction
+from django.utils import timezone
+import logging
 import random
 # Importação necessária para lidar com a hora atual
 from datetime import date, time, datetime 
 
-from .forms import RegisterForm, DepositForm, WithdrawalForm, BankDetailsForm
+from .forms import RegisterForm, DepositForm, WithdrawalForm, BankDetailsForm, ProofUploadInitForm
 from .models import (
     PlatformSettings, CustomUser, Level, UserLevel, BankDetails, Deposit, 
     Withdrawal, Task, PlatformBankDetails, Roulette, RouletteSettings,
-    DailyRewardCode, UserRewardClaim 
+    DailyRewardCode, UserRewardClaim, ProofUpload
 )
+from .archive import user_task_earnings
+from .balances import WELCOME_BONUS, credit_user, debit_user
+from .levels import current_level
+from . import quotas
+from . import announcements, kpis, leaderboards, timeline
+from .metrics import render_prometheus
+from . import profiler
+from .versions import versioned_page, PLATFORM_SETTINGS, PLATFORM_BANK_DETAILS, LEVEL_CATALOG
+from .uploads import (
+    stage_deposit_proof, schedule_proof_upload, spool_chunk, write_chunk, finalise_chunked_upload, purge_stale_chunks,
+    ChunkedUploadError, CHUNKED_UPLOAD_MAX_SIZE, CHUNKED_UPLOAD_CHUNK_SIZE,
+)
+
+logger = logging.getLogger(__name__)
 
 # --- FUNÇÕES DE NAVEGAÇÃO BÁSICAS ---
 
@@ -36,11 +60,9 @@ def menu(request):
     >>> Alteração aqui: Passa o objeto PlatformSettings como 'config'
     para permitir que o template acesse link_grupo_whatsapp e link_grupo_telegram.
     """
-    user_level = None
     levels = Level.objects.all().order_by('deposit_value')
-
-    if request.user.is_authenticated:
-        user_level = UserLevel.objects.filter(user=request.user, is_active=True).first()
+    # Nível atual a partir do usuário já carregado (core/levels.py); None para anónimos
+    user_level = current_level(request.user)
 
     # Tenta obter as configurações da plataforma e passa como 'config'
     try:
@@ -48,11 +70,16 @@ def menu(request):
     except PlatformSettings.DoesNotExist:
         config = None # Define como None se não existir
 
+    # Avisos por ler: uma comparação com a marca de leitura (core/announcements.py)
+    unread_announcements = announcements.unread_count(request.user) if request.user.is_authenticated else 0
+
     context = {
         'user_level': user_level,
         'levels': levels,
         'config': config, # Passa o objeto completo 'config'
         # 'whatsapp_link': whatsapp_link, # Removido, pois está acessível via config.link_grupo_whatsapp
+        'unread_announcements': unread_announcements,
+        'unread_badge': announcements.badge_label(unread_announcements),
     }
     return render(request, 'menu.html', context)
 
@@ -61,9 +88,6 @@ def cadastro(request):
     Lida com o registro de novos usuários.
     """
     invite_code_from_url = request.GET.get('invite', None)
-    
-    # Constante para o bônus de boas-vindas
-    WELCOME_BONUS = 750 
 
     if request.method == 'POST':
         form = RegisterForm(request.POST)
@@ -138,6 +162,7 @@ def user_logout(request):
 # --- FUNÇÕES DE TRANSAÇÃO E FINANÇAS ---
 
 @login_required
+@versioned_page(PLATFORM_SETTINGS, PLATFORM_BANK_DETAILS, LEVEL_CATALOG, per_user=True)
 def deposito(request):
     """
     Lida com o envio de comprovativo de depósito pelo usuário.
@@ -158,7 +183,10 @@ def deposito(request):
         if form.is_valid():
             deposit = form.save(commit=False)
             deposit.user = request.user
+            # Comprime o comprovativo e adia o envio para o storage definitivo
+            stage_deposit_proof(deposit, form.cleaned_data['proof_of_payment'])
             deposit.save()
+            schedule_proof_upload(deposit)
             
             # Retorna a tela de sucesso
             return render(request, 'deposito.html', {
@@ -182,6 +210,90 @@ def deposito(request):
     }
     return render(request, 'deposito.html', context)
 
+# --- ENVIO EM PARTES DO COMPROVATIVO (API RETOMÁVEL) ---
+
+def _upload_error(message, status=400, offset=None):
+    return JsonResponse({'success': False, 'message': message, 'offset': offset}, status=status)
+
+@login_required
+@require_POST
+def proof_upload_init(request):
+    """
+    Inicia um envio em partes. Recebe 'amount' e 'size' (bytes do ficheiro)
+    e devolve o identificador do envio e o tamanho de parte recomendado.
+    """
+    form = ProofUploadInitForm(request.POST)
+    if not form.is_valid():
+        return _upload_error('Verifique o valor e o tamanho do comprovativo.')
+    if form.cleaned_data['size'] > CHUNKED_UPLOAD_MAX_SIZE:
+        return _upload_error('O comprovativo é demasiado grande.', status=413)
+
+    # Os ficheiros parciais ficam no disco deste processo: limpa aqui os abandonados
+    purge_stale_chunks()
+    upload = ProofUpload.objects.create(
+        user=request.user,
+        amount=form.cleaned_data['amount'],
+        total_size=form.cleaned_data['size'],
+    )
+    return JsonResponse({
+        'success': True,
+        'upload_id': str(upload.pk),
+        'offset': 0,
+        'chunk_size': CHUNKED_UPLOAD_CHUNK_SIZE,
+    }, status=201)
+
+@login_required
+@require_http_methods(['GET', 'PUT', 'POST'])
+def proof_upload_chunk(request, upload_id):
+    """
+    GET: devolve quantos bytes já foram recebidos (para retomar o envio).
+    PUT/POST: grava o corpo do pedido a partir de ?offset=N.
+    """
+    if request.method == 'GET':
+        upload = get_object_or_404(ProofUpload, pk=upload_id, user=request.user)
+        return JsonResponse({'success': True, 'offset': upload.received_size, 'size': upload.total_size})
+
+    try:
+        offset = int(request.GET.get('offset', ''))
+    except ValueError:
+        return _upload_error('Offset em falta.')
+
+    upload = get_object_or_404(ProofUpload, pk=upload_id, user=request.user)
+    if upload.deposit_id:
+        return _upload_error('Este envio já foi concluído.', status=409, offset=upload.received_size)
+    if offset > upload.received_size:
+        return _upload_error('Offset inválido.', status=409, offset=upload.received_size)
+
+    # Lê o corpo antes de bloquear: a leitura demora o tempo da rede do cliente
+    spooled, size = spool_chunk(upload, offset, request)
+    with spooled, transaction.atomic():
+        # Bloqueia a sessão para que duas partes não sejam gravadas ao mesmo tempo
+        upload = get_object_or_404(ProofUpload.objects.select_for_update(), pk=upload_id, user=request.user)
+        if upload.deposit_id:
+            return _upload_error('Este envio já foi concluído.', status=409, offset=upload.received_size)
+        try:
+            received = write_chunk(upload, offset, spooled, size)
+        except ChunkedUploadError as error:
+            return _upload_error(error.message, status=error.status, offset=error.offset)
+
+    return JsonResponse({'success': True, 'offset': received, 'size': upload.total_size})
+
+@login_required
+@require_POST
+def proof_upload_finalise(request, upload_id):
+    """
+    Conclui o envio: cria o Deposit com o comprovativo montado e agenda o
+    envio para o storage definitivo, como no formulário de 'deposito'.
+    """
+    with transaction.atomic():
+        upload = get_object_or_404(ProofUpload.objects.select_for_update(), pk=upload_id, user=request.user)
+        try:
+            deposit = finalise_chunked_upload(upload)
+        except ChunkedUploadError as error:
+            return _upload_error(error.message, status=error.status, offset=error.offset)
+
+    return JsonResponse({'success': True, 'deposit_id': deposit.pk})
+
 @login_required
 def approve_deposit(request, deposit_id):
     """
@@ -191,13 +303,15 @@ def approve_deposit(request, deposit_id):
         messages.error(request, 'Você não tem permissão para realizar esta ação.')
         return redirect('menu')
 
-    deposit = get_object_or_404(Deposit, id=deposit_id)
-    if not deposit.is_approved:
+    with transaction.atomic():
+        # O bloqueio da linha impede que duas aprovações simultâneas creditem duas vezes
+        deposit = get_object_or_404(Deposit.objects.select_for_update(), id=deposit_id)
+        if deposit.is_approved:
+            return redirect('renda')
         deposit.is_approved = True
         deposit.save()
-        deposit.user.available_balance += deposit.amount
-        deposit.user.save()
-        messages.success(request, f'Depósito de {deposit.amount} Kz aprovado para {deposit.user.phone_number}. Saldo atualizado.')
+        credit_user(deposit.user, deposit.amount, fields=('available_balance',))
+    messages.success(request, f'Depósito de {deposit.amount} Kz aprovado para {deposit.user.phone_number}. Saldo atualizado.')
     
     return redirect('renda')
 
@@ -209,7 +323,8 @@ def saque(request):
     platform_settings = PlatformSettings.objects.first()
     withdrawal_instruction = platform_settings.withdrawal_instruction if platform_settings else 'Instruções de saque não disponíveis.'
     
-    withdrawal_records = Withdrawal.objects.filter(user=request.user).order_by('-created_at')
+    # Apenas os 10 mais recentes; o histórico completo está em 'historico'
+    withdrawal_records = Withdrawal.objects.filter(user=request.user).order_by('-created_at')[:10]
     
     has_bank_details = BankDetails.objects.filter(user=request.user).exists()
     
@@ -219,10 +334,10 @@ def saque(request):
     END_TIME = time(17, 0) # 17:00 horas
     
     current_time = datetime.now().time()
-    today = date.today()
+    today = timezone.localdate()
     
-    # 1. Verifica se já realizou saque hoje
-    has_withdrawn_today = Withdrawal.objects.filter(user=request.user, created_at__date=today).exists()
+    # 1. Verifica se já realizou saque hoje (campo do usuário, ver core/quotas.py)
+    has_withdrawn_today = quotas.used_today(request.user, 'withdrawal', today) > 0
     
     if request.method == 'POST':
         form = WithdrawalForm(request.POST)
@@ -249,12 +364,20 @@ def saque(request):
             elif request.user.available_balance < amount:
                 messages.error(request, 'Saldo insuficiente.')
             else:
-                # Cria o registro de saque
-                Withdrawal.objects.create(user=request.user, amount=amount)
-                
-                # Deduz o valor (será estornado se não for aprovado pelo staff)
-                request.user.available_balance -= amount
-                request.user.save()
+                with transaction.atomic():
+                    # Consome o saque do dia; falha se outro pedido simultâneo já o fez
+                    if not quotas.consume_quota(request.user, 'withdrawal', today):
+                        messages.error(request, 'Você só pode realizar 1 saque por dia.')
+                        return redirect('saque')
+
+                    # Cria o registro de saque
+                    Withdrawal.objects.create(user=request.user, amount=amount)
+                    
+                    # Deduz o valor (será estornado se não for aprovado pelo staff)
+                    if not debit_user(request.user, amount):
+                        transaction.set_rollback(True)
+                        messages.error(request, 'Saldo insuficiente.')
+                        return redirect('saque')
                 
                 messages.success(request, 'Saque solicitado com sucesso. Aguarde a aprovação.')
                 return redirect('saque')
@@ -279,8 +402,8 @@ def tarefa(request):
     """
     user = request.user
     
-    # Encontra o nível ativo do usuário
-    active_level = UserLevel.objects.filter(user=user, is_active=True).first()
+    # Nível ativo do usuário (sem consulta, ver core/levels.py)
+    active_level = current_level(user)
     has_active_level = active_level is not None
     
     # Define o número de tarefas (pode ser ajustado por settings, mas 1 é o padrão)
@@ -288,8 +411,8 @@ def tarefa(request):
     tasks_completed_today = 0
     
     if has_active_level:
-        today = date.today()
-        tasks_completed_today = Task.objects.filter(user=user, completed_at__date=today).count()
+        # Contador do dia na linha do usuário (core/quotas.py)
+        tasks_completed_today = quotas.used_today(user, 'task', timezone.localdate())
     
     context = {
         'has_active_level': has_active_level,
@@ -306,26 +429,30 @@ def process_task(request):
     Processa a conclusão de uma tarefa diária.
     """
     user = request.user
-    active_level = UserLevel.objects.filter(user=user, is_active=True).first()
+    active_level = current_level(user)
 
     if not active_level:
         return JsonResponse({'success': False, 'message': 'Você não tem um nível ativo para realizar tarefas.'})
 
-    today = date.today()
-    tasks_completed_today = Task.objects.filter(user=user, completed_at__date=today).count()
+    today = timezone.localdate()
     max_tasks = 1
+    already_done = JsonResponse({'success': False, 'message': 'Você já concluiu todas as tarefas diárias.'})
 
-    if tasks_completed_today >= max_tasks:
-        return JsonResponse({'success': False, 'message': 'Você já concluiu todas as tarefas diárias.'})
+    if quotas.used_today(user, 'task', today) >= max_tasks:
+        return already_done
 
-    earnings = active_level.level.daily_gain
-    Task.objects.create(user=user, earnings=earnings)
-    user.available_balance += earnings
-    user.save()
+    earnings = active_level.daily_gain
+    with transaction.atomic():
+        # Consome a tarefa do dia; falha se outro pedido simultâneo já a fez
+        if not quotas.consume_quota(user, 'task', today, limit=max_tasks):
+            return already_done
+        Task.objects.create(user=user, earnings=earnings)
+        credit_user(user, earnings, fields=('available_balance',))
 
     return JsonResponse({'success': True, 'daily_gain': earnings})
 
 @login_required
+@versioned_page(LEVEL_CATALOG, per_user=True)
 def nivel(request):
     """
     Página de níveis, lida com a compra de novos níveis.
@@ -344,49 +471,18 @@ def nivel(request):
             return redirect('nivel')
         
         # 2. Verifica se tem saldo suficiente
-        if request.user.available_balance >= level_to_buy.deposit_value:
-            # 2.1. Deduz o valor
-            request.user.available_balance -= level_to_buy.deposit_value
-            
-            # 2.2. Cria o novo nível ativo
-            UserLevel.objects.create(user=request.user, level=level_to_buy, is_active=True)
-            request.user.level_active = True
-            
-            # 2.3. Lógica de subsídio de convite (para o convidante)
-            invited_by_user = request.user.invited_by
-            
-            if invited_by_user:
-                # Verifica se o convidante JÁ recebeu o subsídio por este convidado
-                # Assumindo que a CustomUser tem um campo/mecanismo para rastrear se o subsídio já foi pago
-                # Se você não tiver um modelo específico de 'SubsidyRecord', vamos usar um flag simples no CustomUser
-                # NO ENTANTO, para garantir que seja pago APENAS UMA VEZ por convidado, é preciso
-                # de um campo no modelo do convidado que indique se o bônus de PRIMEIRO investimento
-                # foi pago ao convidante.
-                
-                # Solução: Usei o campo 'first_level_invested_paid_to_inviter' no modelo do convidado (request.user)
-                # O campo precisa ser adicionado ao seu modelo CustomUser. Se não for adicionado, esta lógica falhará.
-                # ASSUMINDO que o campo existe ou que o 'UserLevel' é o primeiro (o código original não tem um rastreador dedicado)
-                
-                # Lógica de subsídio de 15% (APENAS UMA VEZ)
-                if not request.user.first_level_invested_paid_to_inviter:
-                    # Calcula o subsídio
-                    subsidy_percentage = 0.15 # 15%
-                    subsidy_amount = level_to_buy.deposit_value * subsidy_percentage
-                    
-                    # Adiciona ao saldo do convidante
-                    invited_by_user.subsidy_balance += subsidy_amount
-                    invited_by_user.available_balance += subsidy_amount
-                    invited_by_user.save()
-                    
-                    # Marca que o subsídio de primeiro investimento foi pago
-                    request.user.first_level_invested_paid_to_inviter = True 
-                    
-                    messages.success(request, f'Parabéns! Seu convidado investiu e você recebeu {subsidy_amount:.2f} Kz de subsídio (15%).')
-                else:
-                    # Se for um investimento subsequente do mesmo convidado
-                    messages.info(request, 'Subsídio de primeiro investimento já foi pago.')
-            
-            request.user.save()
+        with transaction.atomic():
+            # 2.1. Deduz o valor; falha se o saldo na base de dados não chega
+            bought = debit_user(request.user, level_to_buy.deposit_value)
+            if bought:
+                # 2.2. Cria o novo nível ativo (o sinal de UserLevel atualiza o nível
+                # atual e level_active do usuário, ver core/levels.py)
+                UserLevel.objects.create(user=request.user, level=level_to_buy, is_active=True)
+
+                # 2.3. O subsídio de convite (para o convidante e gerações acima) é
+                # liquidado em lote pela fila de tarefas (core/commissions.py)
+
+        if bought:
             messages.success(request, f'Você comprou o nível {level_to_buy.name} com sucesso!')
         else:
             messages.error(request, 'Saldo insuficiente. Por favor, faça um depósito.')
@@ -409,20 +505,24 @@ def equipa(request):
     """
     user = request.user
 
-    # 1. Encontra todos os membros da equipe (convidados diretos)
-    team_members = CustomUser.objects.filter(invited_by=user).order_by('-date_joined')
-    team_count = team_members.count()
+    # 1. Encontra todos os membros da equipe (convidados diretos); o nível atual
+    # vem da própria linha do membro (uma consulta, independente do tamanho da equipa)
+    team_members = list(
+        CustomUser.objects.filter(invited_by=user).order_by('-date_joined')
+        .only('phone_number', 'date_joined', 'current_level')
+    )
+    team_count = len(team_members)
 
     # 2. Processa cada membro para criar a lista unificada com os detalhes necessários
     all_team_members = []
     
     for member in team_members:
-        # Busca o nível ativo atual do membro
-        active_level = UserLevel.objects.filter(user=member, is_active=True).first()
+        # Nível ativo atual do membro
+        active_level = current_level(member)
         
         # Define o status de investimento
         if active_level:
-            investment_status = active_level.level.name # Nome do Nível
+            investment_status = active_level.name # Nome do Nível
         else:
             investment_status = "Não Investiu"
             
@@ -467,12 +567,11 @@ def spin_roulette(request):
     """
     user = request.user
 
+    no_spins = JsonResponse({'success': False, 'message': 'Você não tem giros disponíveis para a roleta.'})
+
     if not user.roulette_spins or user.roulette_spins <= 0:
-        return JsonResponse({'success': False, 'message': 'Você não tem giros disponíveis para a roleta.'})
+        return no_spins
 
-    user.roulette_spins -= 1
-    user.save()
-    
     try:
         roulette_settings = RouletteSettings.objects.first()
         
@@ -510,19 +609,24 @@ def spin_roulette(request):
         prize = random.choice(prizes)
 
 
-    # Cria o registro do prêmio da roleta
-    Roulette.objects.create(user=user, prize=prize, is_approved=True)
+    with transaction.atomic():
+        # Desconta o giro; falha se outro pedido simultâneo já gastou o último
+        if not CustomUser.objects.filter(pk=user.pk, roulette_spins__gt=0).update(roulette_spins=F('roulette_spins') - 1):
+            return no_spins
+        user.roulette_spins -= 1
+
+        # Cria o registro do prêmio da roleta
+        Roulette.objects.create(user=user, prize=prize, is_approved=True)
 
-    # Adiciona o prêmio ao saldo do usuário (subsídio e disponível)
-    user.subsidy_balance += prize
-    user.available_balance += prize
-    user.save()
+        # Adiciona o prêmio ao saldo do usuário (subsídio e disponível)
+        credit_user(user, prize)
 
     return JsonResponse({'success': True, 'prize': prize, 'roulette_spins': user.roulette_spins, 'message': f'Parabéns! Você ganhou {prize} Kz.'})
 
 # --- FUNÇÕES DE PERFIL E INFORMAÇÕES GERAIS ---
 
 @login_required
+@versioned_page(PLATFORM_SETTINGS)
 def sobre(request):
     """
     Exibe a página 'Sobre' com o histórico da plataforma.
@@ -541,7 +645,7 @@ def perfil(request):
     Página de perfil, lida com detalhes bancários e mudança de senha.
     """
     bank_details, created = BankDetails.objects.get_or_create(user=request.user)
-    user_levels = UserLevel.objects.filter(user=request.user, is_active=True)
+    user_level = current_level(request.user)
 
     if request.method == 'POST':
         form = BankDetailsForm(request.POST, instance=bank_details)
@@ -570,7 +674,7 @@ def perfil(request):
     context = {
         'form': form,
         'password_form': password_form,
-        'user_levels': user_levels,
+        'user_level': user_level,
     }
     return render(request, 'perfil.html', context)
 
@@ -581,18 +685,19 @@ def renda(request):
     """
     user = request.user
     
-    active_level = UserLevel.objects.filter(user=user, is_active=True).first()
+    active_level = current_level(user)
 
     approved_deposit_total = Deposit.objects.filter(user=user, is_approved=True).aggregate(Sum('amount'))['amount__sum'] or 0
     
-    today = date.today()
+    today = timezone.localdate()
     daily_income = Task.objects.filter(user=user, completed_at__date=today).aggregate(Sum('earnings'))['earnings__sum'] or 0
 
     # Saques aprovados
     total_withdrawals = Withdrawal.objects.filter(user=user, status='Aprovado').aggregate(Sum('amount'))['amount__sum'] or 0
 
     # Renda total = Tarefas (ganho de tarefas) + Subsídios (roleta + convites + prêmios diários)
-    total_income = (Task.objects.filter(user=user).aggregate(Sum('earnings'))['earnings__sum'] or 0) + user.subsidy_balance
+    # (inclui as tarefas de meses antigos já arquivadas, ver core/archive.py)
+    total_income = user_task_earnings(user) + user.subsidy_balance
     
     context = {
         'user': user,
@@ -604,6 +709,117 @@ def renda(request):
     }
     return render(request, 'renda.html', context)
 
+# --- ESTADO RESUMIDO PARA O FRONT END MÓVEL ---
+
+@login_required
+@versioned_page(per_user=True, daily=True)
+def snapshot(request):
+    """
+    Estado do usuário num único JSON (saldo, nível ativo, giros, tarefa e
+    subsídio de hoje), lido da linha do usuário já carregada pela
+    autenticação: o nível atual (core/levels.py) e as quotas do dia
+    (core/quotas.py) estão nela. Responde 304 enquanto o carimbo do usuário
+    não mudar: as tarefas e os resgates gravam o saldo do usuário, o que
+    renova o carimbo (ver core/signals.py).
+    """
+    user = request.user
+    today = timezone.localdate()
+    level = current_level(user)
+    return JsonResponse({
+        # Valores com duas casas decimais em todas as bases de dados
+        'available_balance': f'{user.available_balance:.2f}',
+        'subsidy_balance': f'{user.subsidy_balance:.2f}',
+        'roulette_spins': user.roulette_spins,
+        'active_level': level and {'name': level.name, 'daily_gain': f'{level.daily_gain:.2f}'},
+        'task_done_today': quotas.used_today(user, 'task', today) > 0,
+        'reward_claimed_today': quotas.used_today(user, 'claim', today) > 0,
+    })
+
+# --- RANKINGS (ver core/leaderboards.py) ---
+
+@login_required
+def leaderboard(request):
+    """
+    Os primeiros de um ranking (?ranking=team_size|invested_invitees|earnings)
+    num período (?periodo=day|week|all), em JSON. A lista fica na cache por
+    pouco tempo e sai do índice do ranking: o custo não depende do número
+    de usuários.
+    """
+    board = request.GET.get('ranking', leaderboards.BOARDS[0])
+    period = request.GET.get('periodo', 'week')
+    if board not in leaderboards.BOARDS or period not in leaderboards.PERIODS:
+        return JsonResponse({'success': False, 'message': 'Ranking ou período inválido.'}, status=400)
+    return JsonResponse({
+        'ranking': board,
+        'periodo': period,
+        'results': leaderboards.top_scores(board, period),
+    })
+
+# --- AVISOS (ver core/announcements.py) ---
+
+@login_required
+def avisos(request):
+    """
+    Lista os avisos mais recentes do público do usuário e marca-os como
+    lidos (avança a marca de leitura até ao mais recente).
+    """
+    user = request.user
+    latest = list(
+        announcements.visible_announcements(user).order_by('-pk')[:announcements.ANNOUNCEMENTS_PAGE_SIZE]
+    )
+    last_read_id = user.last_read_announcement_id
+    if latest:
+        announcements.mark_read(user, latest[0].pk)
+    return render(request, 'avisos.html', {'announcements': latest, 'last_read_id': last_read_id})
+
+# --- HISTÓRICO UNIFICADO (ver core/timeline.py) ---
+
+def _timeline_page(request):
+    """Lê os parâmetros (cursor, tipo, limite) e devolve a página pedida."""
+    kinds = [kind for kind in request.GET.get('tipo', '').split(',') if kind in timeline.KINDS]
+    try:
+        limit = int(request.GET.get('limite', timeline.PAGE_SIZE))
+    except ValueError:
+        limit = timeline.PAGE_SIZE
+    entries, next_cursor = timeline.user_timeline(
+        request.user, cursor=request.GET.get('cursor') or None, limit=limit, kinds=kinds,
+    )
+    return entries, next_cursor, kinds
+
+@login_required
+def historico(request):
+    """
+    Histórico de todos os movimentos do usuário, paginado por cursor.
+    """
+    try:
+        entries, next_cursor, kinds = _timeline_page(request)
+    except ValueError:
+        return redirect('historico')
+    context = {
+        'entries': entries,
+        'next_cursor': next_cursor,
+        'kinds': kinds,
+        'kind_labels': timeline.KIND_LABELS,
+    }
+    return render(request, 'historico.html', context)
+
+@login_required
+def historico_api(request):
+    """
+    Mesmo histórico em JSON, para carregar as páginas seguintes sem recarregar.
+    """
+    try:
+        entries, next_cursor, _ = _timeline_page(request)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    return JsonResponse({
+        'results': [
+            {**entry, 'at': entry['at'].isoformat(), 'amount': str(entry['amount'])}
+            for entry in entries
+        ],
+        'next_cursor': next_cursor,
+    })
+
 # --- FUNÇÕES DE PRÊMIOS E SUBSÍDIOS ---
 
 @login_required
@@ -613,7 +829,7 @@ def premios_subsidios(request):
     verificando o status de resgate diário do usuário.
     """
     user = request.user
-    today = date.today()
+    today = timezone.localdate()
     
     # 1. Tenta encontrar o código ativo para o dia
     # Procura um código ativo criado HOJE (assumindo que o código diário é criado diariamente)
@@ -621,7 +837,7 @@ def premios_subsidios(request):
     
     # 2. Verifica se o usuário já resgatou hoje (independente do código, se a regra é um resgate por dia)
     # Se a regra for UM resgate por dia, podemos usar o filtro abaixo para verificar se QUALQUER resgate foi feito hoje.
-    has_claimed_today = UserRewardClaim.objects.filter(user=user, claim_date=today).exists()
+    has_claimed_today = quotas.used_today(user, 'claim', today) > 0
     
     # 3. Obtém o histórico dos 10 resgates mais recentes do usuário
     claim_history = UserRewardClaim.objects.filter(user=user).order_by('-claimed_at')[:10]
@@ -643,12 +859,12 @@ def claim_daily_reward(request):
     Esta é a lógica do prêmio diário.
     """
     user = request.user
-    today = date.today()
+    today = timezone.localdate()
     
     submitted_code = request.POST.get('reward_code', '').strip()
     
-    # 1. Verifica se já resgatou hoje 
-    if UserRewardClaim.objects.filter(user=user, claim_date=today).exists():
+    # 1. Verifica se já resgatou hoje (campo do usuário, ver core/quotas.py)
+    if quotas.used_today(user, 'claim', today):
         messages.error(request, 'Você já resgatou seu prêmio diário hoje.')
         return redirect('premios_subsidios')
     
@@ -667,18 +883,134 @@ def claim_daily_reward(request):
     # 3. Processa o resgate
     reward_amount = active_code.reward_amount
     
-    # Cria o registro de resgate
-    UserRewardClaim.objects.create(
-        user=user, 
-        reward_code=active_code, 
-        claim_date=today
-    )
-    
-    # Atualiza o saldo do usuário (subsídio e disponível)
-    user.subsidy_balance += reward_amount
-    user.available_balance += reward_amount # Adicionando também ao saldo disponível
-    user.save()
+    with transaction.atomic():
+        # Consome o resgate do dia; falha se outro pedido simultâneo já o fez
+        if not quotas.consume_quota(user, 'claim', today):
+            messages.error(request, 'Você já resgatou seu prêmio diário hoje.')
+            return redirect('premios_subsidios')
+
+        # Cria o registro de resgate
+        UserRewardClaim.objects.create(
+            user=user, 
+            reward_code=active_code, 
+            claim_date=today
+        )
+        
+        # Atualiza o saldo do usuário (subsídio e disponível)
+        credit_user(user, reward_amount)
     
     messages.success(request, f'Parabéns! Você resgatou {reward_amount} Kz no seu Saldo de Subsídios.')
     return redirect('premios_subsidios')
-    
\ No newline at end of file
+    
+
+# --- MONITORIZAÇÃO ---
+
+def metrics(request):
+    """
+    Métricas no formato de texto do Prometheus (core/metrics.py).
+    Apenas para staff ou com o token METRICS_TOKEN no cabeçalho Authorization.
+    """
+    token = settings.METRICS_TOKEN
+    has_token = bool(token) and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not (has_token or (request.user.is_authenticated and request.user.is_staff)):
+        return HttpResponseForbidden()
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def health(request):
+    """Verificação de vida: o processo responde (não toca na base de dados)."""
+    return JsonResponse({'status': 'ok'})
+
+def ready(request):
+    """Verificação de prontidão: base de dados e cache acessíveis."""
+    checks = {}
+    # O endpoint é público: o erro fica no log, a resposta diz apenas 'indisponível'
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        checks['database'] = 'ok'
+    except Exception:
+        logger.exception('Verificação de prontidão: base de dados indisponível')
+        checks['database'] = 'indisponível'
+    try:
+        cache.set('ready-check', 1, 5)
+        checks['cache'] = 'ok' if cache.get('ready-check') == 1 else 'indisponível'
+    except Exception:
+        logger.exception('Verificação de prontidão: cache indisponível')
+        checks['cache'] = 'indisponível'
+
+    is_ready = all(value == 'ok' for value in checks.values())
+    return JsonResponse({'status': 'ok' if is_ready else 'erro', 'checks': checks}, status=200 if is_ready else 503)
+
+
+# --- INDICADORES DA PLATAFORMA (STAFF) ---
+
+@staff_member_required
+def kpi_dashboard(request):
+    """
+    Painel de indicadores: lê apenas as tabelas de indicadores (core/kpis.py),
+    nunca as tabelas de depósitos, saques ou usuários.
+    """
+    try:
+        days = min(max(int(request.GET.get('days', 30)), 1), 366)
+    except ValueError:
+        days = 30
+    daily = kpis.daily_kpis(days)
+    context = {
+        **admin.site.each_context(request),
+        'title': 'Indicadores da plataforma',
+        'today': daily[0],
+        'daily': daily,
+        'days': days,
+        'pending': kpis.pending_counters(),
+    }
+    return render(request, 'admin/kpis/dashboard.html', context)
+
+# --- PERFIL DE PEDIDOS (STAFF) ---
+
+@staff_member_required
+def profile_list(request):
+    """
+    Perfis recentes (core/profiler.py). ?cookie=1 ativa o perfil de todos os
+    pedidos deste navegador; ?cookie=0 desativa.
+    """
+    toggle = request.GET.get('cookie')
+    if toggle is not None:
+        response = redirect('profile_list')
+        if toggle == '1':
+            response.set_cookie(profiler.PROFILE_COOKIE, '1', httponly=True, samesite='Lax')
+        else:
+            response.delete_cookie(profiler.PROFILE_COOKIE)
+        return response
+
+    context = {
+        **admin.site.each_context(request),
+        'title': 'Perfis de pedidos',
+        'profiles': profiler.list_profiles(),
+        'cookie_active': bool(request.COOKIES.get(profiler.PROFILE_COOKIE)),
+    }
+    return render(request, 'admin/profiles/list.html', context)
+
+@staff_member_required
+def profile_detail(request, profile_id):
+    """Funções mais lentas e consultas SQL (com EXPLAIN) de um perfil."""
+    profile = profiler.load_profile(profile_id)
+    if profile is None:
+        raise Http404('Perfil não encontrado.')
+    context = {**admin.site.each_context(request), 'title': f'Perfil {profile_id}', 'profile': profile}
+    return render(request, 'admin/profiles/detail.html', context)
+
+@staff_member_required
+def profile_diff(request):
+    """Compara dois perfis (?a=<id>&b=<id>): totais e tempo por função."""
+    before = profiler.load_profile(request.GET.get('a', ''))
+    after = profiler.load_profile(request.GET.get('b', ''))
+    if before is None or after is None:
+        raise Http404('Perfil não encontrado.')
+    context = {
+        **admin.site.each_context(request),
+        'title': 'Comparação de perfis',
+        'before': before,
+        'after': after,
+        'diff': profiler.diff_profiles(before, after),
+    }
+    return render(request, 'admin/profiles/diff.html', context)
@@ -50,13 +50,21 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Métricas por view (core/metrics.py); primeiro para medir o pedido completo
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     # WhiteNoise deve vir logo abaixo do SecurityMiddleware
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    # Limites de pedidos (core/ratelimit.py); antes da sessão para recusar sem consultas
+    'core.middleware.RateLimitMiddleware',
+    # Leituras na réplica (core/routers.py); antes da sessão para a sessão e o usuário também
+    'core.middleware.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Perfil a pedido para staff (core/profiler.py); precisa de request.user
+    'core.middleware.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -89,6 +97,78 @@ DATABASES = {
     )
 }
 
+# --- SQLite em produção (instalações num só servidor) ---
+# Aplicado a cada ligação SQLite. Com WAL as leituras não esperam pelas
+# escritas; BEGIN IMMEDIATE pede o bloqueio de escrita no início de cada
+# transação (esperando até busy_timeout) em vez de falhar com
+# 'database is locked' quando uma transação que já leu tenta escrever.
+# Um transaction.atomic() só de leitura também fica com o bloqueio de
+# escrita até ao fim: as leituras longas usam read_only_transaction
+# (core/reconcile.py), que abre com BEGIN DEFERRED.
+# Comparação com o modo por omissão: manage.py benchmark_sqlite.
+SQLITE_TUNED = config('SQLITE_TUNED', default=True, cast=bool)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',  # seguro com WAL: um corte de energia só perde os últimos commits
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT_MS', default=5000, cast=int),
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # em KiB quando negativo (64 MiB)
+    'temp_store': 'MEMORY',
+}
+
+# --- Réplica de leitura (core/routers.py) ---
+# Com DATABASE_REPLICA_URL as views de DATABASE_REPLICA_VIEWS (GET/HEAD) leem da réplica.
+# Para testar localmente basta outra URL para a mesma base de dados, ex.:
+# DATABASE_REPLICA_URL=sqlite:///db.sqlite3 (nos testes a réplica espelha a 'default').
+DATABASE_REPLICA_URL = config('DATABASE_REPLICA_URL', default='')
+DATABASE_REPLICA = 'replica' if DATABASE_REPLICA_URL else ''
+if DATABASE_REPLICA:
+    DATABASES[DATABASE_REPLICA] = dj_database_url.parse(DATABASE_REPLICA_URL)
+    DATABASES[DATABASE_REPLICA]['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Nomes de view (com namespace; aceita padrões fnmatch) servidos pela réplica
+DATABASE_REPLICA_VIEWS = [
+    'equipa', 'renda', 'nivel', 'sobre', 'historico', 'historico_api', 'leaderboard', 'kpi_dashboard',
+    'admin:*_changelist',
+]
+# Depois de escrever, o cliente lê do primário durante esta janela (segundos)
+REPLICA_STICKY_SECONDS = 10
+REPLICA_STICKY_COOKIE = 'ddb_primary'
+
+# Depois da réplica, para que uma réplica SQLite também seja afinada
+if SQLITE_TUNED:
+    for database in DATABASES.values():
+        if database['ENGINE'] == 'django.db.backends.sqlite3':
+            database.setdefault('OPTIONS', {}).update({
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': '; '.join(f'PRAGMA {name} = {value}' for name, value in SQLITE_PRAGMAS.items()),
+            })
+
+# --- Cache ---
+# Cache em ficheiros, partilhada por todos os workers do gunicorn no mesmo servidor
+# (rankings em core/leaderboards.py).
+RATELIMIT_CACHE_BACKEND = config('RATELIMIT_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / '.cache')),
+    },
+    # Contadores dos limites de pedidos (core/ratelimit.py), alterados com add/incr atómicos.
+    # A LocMemCache por omissão conta por processo (cada worker do gunicorn com os seus
+    # contadores); com um Redis partilhado os limites valem para todos os workers:
+    # RATELIMIT_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache e
+    # RATELIMIT_CACHE_LOCATION=redis://...
+    'ratelimit': {
+        'BACKEND': RATELIMIT_CACHE_BACKEND,
+        'LOCATION': config('RATELIMIT_CACHE_LOCATION', default='ratelimit'),
+        # Só a LocMemCache descarta entradas (a partir de 300 por omissão)
+        **({'OPTIONS': {'MAX_ENTRIES': 100000}} if RATELIMIT_CACHE_BACKEND.endswith('LocMemCache') else {}),
+    },
+}
+
+# Os testes trocam a cache por uma em memória (ver core/runner.py)
+TEST_RUNNER = 'core.runner.TestRunner'
+
 # --- Password validation ---
 # (Manter o padrão para brevidade)
 AUTH_PASSWORD_VALIDATORS = [
@@ -128,9 +208,15 @@ STATICFILES_DIRS = [
     )
 ] 
 
-# Use WhiteNoise para servir arquivos estáticos de forma comprimida e manifestada em Produção
+# Use WhiteNoise para servir arquivos estáticos de forma comprimida e manifestada em Produção.
+# O storage do core acrescenta variantes WebP/AVIF responsivas das imagens (ver core/images.py).
 if not DEBUG:
-    STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+    STATICFILES_BACKEND = 'core.storage.ResponsiveStaticFilesStorage'
+else:
+    STATICFILES_BACKEND = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+
+# Larguras (px) geradas para <picture>/srcset
+RESPONSIVE_IMAGE_WIDTHS = (320, 480, 640, 800)
 
 
 # --- Media files (Arquivos do Usuário - Imagens, Documentos) ---
@@ -155,6 +241,89 @@ else:
     MEDIA_ROOT = BASE_DIR / 'media'
     MEDIA_URL = '/media/'
 
+# Comprovativos de depósito (ver core/uploads.py). Em produção o envio definitivo corre no
+# worker e o comprovativo espera no storage definitivo, sob 'proof_staging/'; em
+# desenvolvimento/testes corre no próprio pedido e espera no disco local.
+# PROOF_STAGING_ROOT (disco do processo web) guarda também as partes dos envios retomáveis.
+PROOF_STAGING_ROOT = BASE_DIR / 'proof_staging'
+PROOF_UPLOAD_ASYNC = not DEBUG
+
+# --- Fila de tarefas em segundo plano (core/jobs.py, manage.py run_jobs) ---
+# Tarefas periódicas: nome da tarefa -> expressão cron (hora de Luanda)
+PERIODIC_JOBS = {
+    'settle_referral_commissions': '* * * * *',
+    'expire_level_cycles': '0 * * * *',
+    'purge_finished_jobs': '30 3 * * *',
+    'archive_old_history': '0 4 * * *',
+    'purge_leaderboards': '15 4 * * *',
+    'purge_abandoned_uploads': '45 4 * * *',
+}
+
+# --- Comissões de convite (core/commissions.py) ---
+# Percentagem por geração: o primeiro valor é o convidante direto, o segundo
+# o convidante do convidante, etc. Por omissão: 15% apenas ao convidante direto.
+REFERRAL_COMMISSION_RATES = ['0.15']
+# Paga apenas sobre a primeira compra de nível de cada convidado
+REFERRAL_COMMISSION_FIRST_PURCHASE_ONLY = True
+
+# --- Arquivo do histórico (core/archive.py) ---
+# Meses completos mantidos em Task e Roulette; os anteriores vão para o arquivo.
+ARCHIVE_AFTER_MONTHS = 3
+
+# --- Limites de pedidos (core/ratelimit.py) ---
+# Por nome de rota: 'rate' ('N/s', 'N/m' ou 'N/h') e 'burst' por cliente, 'key' ('user' =
+# usuário autenticado, mais um limite por IP de 'ip_rate'/'ip_burst', por omissão
+# IP_RATE_FACTOR vezes o do usuário; 'ip' = só o IP), 'methods' limitados (por omissão
+# só POST) e 'concurrency', o máximo de pedidos simultâneos (acima dele: 503). Acima do
+# limite a resposta é 429 com Retry-After.
+RATE_LIMIT_ENABLED = config('RATE_LIMIT_ENABLED', default=True, cast=bool)
+RATE_LIMITS = {
+    'process_task': {'rate': '10/m', 'burst': 5, 'key': 'user', 'concurrency': 32},
+    'spin_roulette': {'rate': '30/m', 'burst': 10, 'key': 'user', 'concurrency': 32},
+    'claim_daily_reward': {'rate': '10/m', 'burst': 5, 'key': 'user', 'concurrency': 32},
+    'login': {'rate': '10/m', 'burst': 10, 'key': 'ip', 'concurrency': 16},
+    'cadastro': {'rate': '10/h', 'burst': 5, 'key': 'ip', 'concurrency': 16},
+}
+# Cabeçalho com o IP real atrás de um proxy (ex.: 'HTTP_X_FORWARDED_FOR'); vazio usa REMOTE_ADDR
+RATE_LIMIT_IP_HEADER = config('RATE_LIMIT_IP_HEADER', default='')
+
+# --- Telefones (core/phones.py) ---
+# Indicativo retirado dos números guardados e tamanho de um número nacional completo.
+PHONE_COUNTRY_CODE = '244'
+PHONE_NATIONAL_LENGTH = 9
+# Índice de trigramas (pg_trgm) para a pesquisa '*dígitos' no admin; só no PostgreSQL
+PHONE_TRIGRAM_INDEX = config('PHONE_TRIGRAM_INDEX', default=True, cast=bool)
+
+# --- Indicadores diários (core/kpis.py) ---
+# Linhas por dia/contador: as escritas concorrentes repartem-se entre elas.
+KPI_SLOTS = 8
+
+# --- Rankings (core/leaderboards.py) ---
+# Entradas por ranking e segundos que a lista fica na cache
+LEADERBOARD_SIZE = 10
+LEADERBOARD_CACHE_SECONDS = 60
+# Linhas mantidas por ranking e período além de LEADERBOARD_SIZE (o resto é cortado
+# por purge_leaderboards): quem sai da margem recomeça do zero nesse período
+LEADERBOARD_TRIM_MARGIN = 1000
+
+# --- Métricas (core/metrics.py) ---
+# Diretório partilhado pelos workers do gunicorn; /metrics soma os ficheiros de todos.
+METRICS_DIR = config('METRICS_DIR', default=str(BASE_DIR / '.metrics'))
+# Token opcional para o Prometheus ler /metrics sem sessão de staff (Authorization: Bearer ...)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# --- Perfil de pedidos (core/profiler.py) ---
+# Ativado por staff com o cabeçalho 'X-Profile: 1' ou pelo cookie em /admin/profiles/.
+PROFILES_DIR = config('PROFILES_DIR', default=str(BASE_DIR / '.profiles'))
+PROFILES_KEPT = 50
+
+# Django 5.x lê apenas o dicionário STORAGES (DEFAULT_FILE_STORAGE e
+# STATICFILES_STORAGE foram removidos), por isso os backends acima são aplicados aqui.
+STORAGES = {
+    'default': {'BACKEND': DEFAULT_FILE_STORAGE},
+    'staticfiles': {'BACKEND': STATICFILES_BACKEND},
+}
+
 
 # --- Modelos e Redirecionamentos ---
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -2,8 +2,14 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings # Importar settings
 from django.conf.urls.static import static # Importar static
+from core import views as core_views
 
 urlpatterns = [
+    # Páginas de staff fora do admin; antes do admin, que responde a todo o admin/*
+    path('admin/kpis/', core_views.kpi_dashboard, name='kpi_dashboard'),
+    path('admin/profiles/', core_views.profile_list, name='profile_list'),
+    path('admin/profiles/diff/', core_views.profile_diff, name='profile_diff'),
+    path('admin/profiles/<str:profile_id>/', core_views.profile_detail, name='profile_detail'),
     path('admin/', admin.site.urls),
     path('', include('core.urls')),
 ]